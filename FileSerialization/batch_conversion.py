@@ -0,0 +1,211 @@
+#!/usr/bin/python3
+import glob
+import hashlib
+import json
+import logging
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from compression import strip_compression_extension
+from data_conversion import FileTypes
+from data_validator import PersonSchema
+from serialization_tool import MANIFEST_NAME, convert_file
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# the PersonSchema of a batch worker process, built once for all its files
+_worker_schema: Optional[PersonSchema] = None
+
+
+def find_source_files(pattern: str, source_formats: List[str], exclude: Iterable[str] = ()) -> List[str]:
+    """Lists the files of a directory or matching a glob
+    Args:
+        pattern: a directory or a glob, ** matches subdirectories
+        source_formats: the converted formats, by file extension
+        exclude: the paths of files that are not sources, the outputs of a previous batch
+    Returns:
+        the sorted file paths
+    """
+    if os.path.isdir(pattern):
+        paths = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+    else:
+        paths = glob.glob(pattern, recursive=True)
+    exclude = {os.path.abspath(path) for path in exclude}
+    return sorted(
+        path for path in paths
+        if os.path.isfile(path) and _file_format(path) in source_formats and os.path.basename(path) != MANIFEST_NAME
+        and os.path.abspath(path) not in exclude
+    )
+
+
+def convert_batch(
+        pattern: str,
+        target_format: str,
+        source_format: Optional[str] = None,
+        output_dir: Optional[str] = None,
+        workers: int = 0,
+        manifest_path: Optional[str] = None,
+        error_report_dir: Optional[str] = None,
+) -> Dict[str, int]:
+    """Converts many files across a worker pool, skipping the files converted by a previous run
+    whose content did not change since. Sources that would write the same output file
+    (persons.json and persons.xml to persons.csv) are not converted and count as failed
+    Args:
+        pattern: a directory or a glob of source files
+        target_format: the output file format
+        source_format: the converted format, all but the target format if None
+        output_dir: the output directory, next to each source if None
+        workers: the worker processes, all CPUs if 0
+        manifest_path: the manifest of the converted files, MANIFEST_NAME in the output directory if None,
+            in the source directory if there is no output directory either
+        error_report_dir: the directory of the NDJSON validation errors of each file, logged if None
+    Returns:
+        the counts of converted, skipped and failed files and of converted records
+    """
+    source_formats = [source_format] if source_format else [t.value for t in FileTypes if t != target_format]
+    manifest_path = manifest_path or os.path.join(output_dir or _source_dir(pattern), MANIFEST_NAME)
+    manifest = _load_manifest(manifest_path)
+    # persons.csv written next to persons.json by a json to csv batch is not a source of a later csv to xml one
+    sources = find_source_files(pattern, source_formats, (entry['output'] for entry in manifest.values()))
+    for directory in (output_dir, error_report_dir):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    stats = {'converted': 0, 'skipped': 0, 'failed': 0, 'records': 0}
+    outputs = defaultdict(list)
+    for source in sources:
+        source = os.path.abspath(source)
+        outputs[_output_path(source, target_format, output_dir)].append(source)
+    # persons.json, persons.xml and persons.json.gz would all write persons.csv: none of them is converted
+    for output, output_sources in list(outputs.items()):
+        if len(output_sources) > 1:
+            logger.error(f'{", ".join(output_sources)} failed: they would all be converted to {output}')
+            stats['failed'] += len(output_sources)
+            del outputs[output]
+
+    logger.info(f'Converting {len(outputs)} files to {target_format}...')
+    try:
+        with ProcessPoolExecutor(workers or None, initializer=_init_worker) as executor:
+            futures = {}
+            for output, (source,) in outputs.items():
+                name = os.path.splitext(os.path.basename(output))[0]
+                report = os.path.join(error_report_dir, f'{name}.errors.ndjson') if error_report_dir else None
+                future = executor.submit(
+                    _convert_source, source, _file_format(source), target_format, output, report,
+                    manifest.get(source),
+                )
+                futures[future] = source
+
+            for future in as_completed(futures):
+                source = futures[future]
+                try:
+                    status, entry, records = future.result()
+                except Exception as err:
+                    logger.error(f'{source} failed: {err!r}')
+                    stats['failed'] += 1
+                    continue
+                manifest[source] = entry
+                stats[status] += 1
+                stats['records'] += records
+    finally:
+        # the files converted so far are skipped next time even if the batch is interrupted
+        _save_manifest(manifest_path, manifest)
+
+    logger.info(f'Batch done: {stats}')
+    return stats
+
+
+def _source_dir(pattern: str) -> str:
+    # the directory, or the part of the glob before its first wildcard: data for data/**/*.json
+    if os.path.isdir(pattern):
+        return pattern
+    directory = os.path.dirname(pattern)
+    while any(char in directory for char in '*?['):
+        directory = os.path.dirname(directory)
+    return directory or '.'
+
+
+def _output_path(source: str, target_format: str, output_dir: Optional[str]) -> str:
+    # persons.json.gz is converted to persons.csv, next to the source if there is no output directory
+    name = os.path.splitext(os.path.basename(strip_compression_extension(source)))[0]
+    return os.path.abspath(os.path.join(output_dir or os.path.dirname(source), f'{name}.{target_format}'))
+
+
+def _init_worker() -> None:
+    global _worker_schema
+    _worker_schema = PersonSchema()
+
+
+def _convert_source(
+        source: str,
+        source_format: str,
+        target_format: str,
+        output: str,
+        error_report_path: Optional[str],
+        entry: Optional[dict],
+) -> Tuple[str, dict, int]:
+    # returns the status, the new manifest entry and the converted records count
+    if output == source:
+        raise ValueError('the output would overwrite the source, set an output directory')
+    stat = os.stat(source)
+    if entry and entry['size'] == stat.st_size and entry['mtimeNs'] == stat.st_mtime_ns:
+        # the same size and modification time, the content is not hashed again
+        digest = entry['sha256']
+    else:
+        digest = _hash_file(source)
+    new_entry = {
+        'sha256': digest, 'size': stat.st_size, 'mtimeNs': stat.st_mtime_ns,
+        'targetFormat': target_format, 'output': output,
+    }
+    unchanged = entry and all(entry.get(key) == new_entry[key] for key in ('sha256', 'targetFormat', 'output'))
+    if unchanged and os.path.exists(output):
+        return 'skipped', new_entry, 0
+
+    # converted to a temporary file, a failed conversion leaves no partial output behind
+    temporary_output = f'{output}.tmp'
+    try:
+        with ExitStack() as stack:
+            error_report = stack.enter_context(open(error_report_path, 'w')) if error_report_path else None
+            records = convert_file(source, source_format, target_format, temporary_output, _worker_schema, error_report)
+        os.replace(temporary_output, output)
+    finally:
+        if os.path.exists(temporary_output):
+            os.remove(temporary_output)
+    return 'converted', new_entry, records
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _file_format(path: str) -> str:
+    # persons.csv.gz is a csv file
+    return os.path.splitext(strip_compression_extension(path))[1][1:].lower()
+
+
+def _load_manifest(path: str) -> Dict[str, dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)['files']
+    except FileNotFoundError:
+        return {}
+    except (ValueError, KeyError) as err:
+        logger.warning(f'Ignoring the invalid manifest {path}: {err!r}')
+        return {}
+
+
+def _save_manifest(path: str, manifest: Dict[str, dict]) -> None:
+    # written to a temporary file first, an interrupted write never leaves a broken manifest
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'w') as f:
+        json.dump({'files': manifest}, f, indent=1, sort_keys=True)
+    os.replace(temporary_path, path)
@@ -0,0 +1,106 @@
+"""Converts generated datasets from every source to every target format with serialization_tool --profileOutput.
+
+Each conversion runs in its own process, so the peak RSS is the conversion's own. Datasets are
+generated once per size and format in --dir and reused by later runs.
+
+Usage (from FileSerialization/):
+    python -m benchmarks.bench_conversion --records 10000,100000 --output conversion.json
+    python -m benchmarks.bench_conversion --records 10000000 --formats json,bin --dir /data/fs-bench
+
+CSV is a target only by default: it keeps the first entity of a person in two columns under one
+header, which does not read back as a person (--source-formats csv times it anyway).
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+from argparse import ArgumentParser
+from typing import Dict, List
+
+from benchmarks.generate import generate_persons
+
+TOOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FORMATS = ['json', 'csv', 'xml', 'bin']
+
+
+def prepare_dataset(directory: str, records: int, file_format: str) -> str:
+    from data_conversion import FileConverterFactory
+
+    path = os.path.join(directory, f'persons-{records}.{file_format}')
+    if not os.path.exists(path):
+        FileConverterFactory.get_serializer(file_format).serialize(generate_persons(records), path)
+    return path
+
+
+def run_conversion(source_path: str, source_format: str, target_format: str, directory: str,
+                   workers: int, parallel: bool) -> Dict[str, float]:
+    output_path = os.path.join(directory, f'output.{target_format}')
+    profile_path = os.path.join(directory, 'profile.json')
+    errors_path = os.path.join(directory, 'errors.ndjson')
+    command = [
+        sys.executable, os.path.join(TOOL_DIR, 'serialization_tool.py'),
+        '-sf', source_format, '-tf', target_format, '-sp', source_path, '-op', output_path,
+        '-po', profile_path, '-er', errors_path, '-w', str(workers),
+    ]
+    if parallel:
+        command.append('-p')
+    subprocess.run(command, check=True, cwd=TOOL_DIR)
+
+    with open(profile_path) as f:
+        result = json.load(f)
+    with open(errors_path) as f:
+        result['invalid_records'] = sum(1 for _ in f)
+    result['source_bytes'] = os.path.getsize(source_path)
+    result['output_bytes'] = os.path.getsize(output_path)
+    for path in (output_path, profile_path, errors_path):
+        os.remove(path)
+    return result
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', default='10000,100000', help='comma separated dataset sizes')
+    parser.add_argument('--source-formats', default='json,xml,bin', help='comma separated')
+    parser.add_argument('--formats', default=','.join(FORMATS), help='comma separated target formats')
+    parser.add_argument('--dir', default='/tmp/file-serialization-bench', help='the datasets directory')
+    parser.add_argument('--workers', type=int, default=0, help='passed to serialization_tool --workers')
+    parser.add_argument('--parallel', action='store_true', help='converts CSV sources with --parallel')
+    parser.add_argument('--output', help='writes the results as JSON')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.records.split(',')]
+    source_formats: List[str] = args.source_formats.split(',')
+    formats: List[str] = args.formats.split(',')
+    os.makedirs(args.dir, exist_ok=True)
+    sys.path.insert(0, TOOL_DIR)
+
+    results = {}
+    print(f'{"records":>10} {"pair":<10} {"seconds":>8} {"records/s":>10} {"read":>6} {"deser":>6} '
+          f'{"valid":>6} {"ser":>6} {"peak MiB":>9}')
+    for size in sizes:
+        for source_format in source_formats:
+            source_path = prepare_dataset(args.dir, size, source_format)
+            for target_format in formats:
+                result = run_conversion(source_path, source_format, target_format, args.dir,
+                                        args.workers, args.parallel)
+                results[f'{size}:{source_format}->{target_format}'] = result
+                peak = result['peak_rss_bytes']
+                print(
+                    f'{size:>10} {source_format + "->" + target_format:<10} {result["total_seconds"]:>8.2f} '
+                    f'{result["records_per_sec"]:>10,.0f} {result["read_seconds"]:>6.2f} '
+                    f'{result["deserialize_seconds"]:>6.2f} {result["validate_seconds"]:>6.2f} '
+                    f'{result["serialize_seconds"]:>6.2f} {peak / 2 ** 20 if peak else 0:>9.1f}'
+                )
+
+    if args.output:
+        params = {
+            'records': sizes, 'source_formats': source_formats, 'formats': formats, 'workers': args.workers, 'parallel': args.parallel,
+            'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+        }
+        with open(args.output, 'w') as f:
+            json.dump({'params': params, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Synthetic PersonSchema-conformant datasets with nested entities.
+
+Usage (from FileSerialization/):
+    python -m benchmarks.generate --records 1000000 --output /tmp/persons-1m.json.gz
+"""
+import datetime
+import random
+import uuid
+from argparse import ArgumentParser
+from typing import Iterator
+
+FIRST_NAMES = ['Anna', 'Bohdan', 'Chloe', 'Dmytro', 'Emma', 'Felix', 'Galyna', 'Hugo', 'Iryna', 'Jonas']
+LAST_NAMES = ['Kovalenko', 'Lee', 'Muller', 'Nowak', 'Olsen', 'Petrenko', 'Quinn', 'Rossi', 'Smith', 'Tkachenko']
+STREETS = ['Main', 'Shevchenko', 'Oak', 'Khreshchatyk', 'Park', 'Lesya Ukrainka', 'Station', 'Mill']
+ENTITY_NAMES = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark', 'Wayne', 'Wonka', 'Tyrell', 'Cyberdyne']
+
+
+def generate_persons(count: int, seed: int = 42) -> Iterator[dict]:
+    # the same seed gives the same records, entities are 1 to 3 per person
+    rng = random.Random(seed)
+    first_day = datetime.date(1940, 1, 1).toordinal()
+    for index in range(count):
+        first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield {
+            'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'firstName': first_name,
+            'lastName': last_name,
+            'dateOfBirth': datetime.date.fromordinal(first_day + rng.randrange(60 * 365)).isoformat(),
+            'email': f'{first_name}.{last_name}{index}@example.com'.lower(),
+            'contactNumber': f'+380{rng.randrange(10 ** 9):09d}',
+            'age': rng.randint(18, 90),
+            'salary': f'{rng.randrange(50_000, 2_000_000) / 100:.2f}',
+            'address': f'{rng.randint(1, 200)} {rng.choice(STREETS)} st',
+            'entities': [
+                {'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)), 'name': rng.choice(ENTITY_NAMES)}
+                for _ in range(rng.randint(1, 3))
+            ],
+        }
+
+
+if __name__ == '__main__':
+    from data_conversion import FileConverterFactory
+
+    parser = ArgumentParser(description='Generate a synthetic persons dataset')
+    parser.add_argument('--records', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--format', default='json', help='json, csv, xml or bin')
+    parser.add_argument('--output', required=True, help='a .gz, .bz2 or .xz suffix compresses the output')
+    args = parser.parse_args()
+
+    written = FileConverterFactory.get_serializer(args.format).serialize(
+        generate_persons(args.records, args.seed), args.output,
+    )
+    print(f'{written:,} records written to {args.output}')
@@ -0,0 +1,241 @@
+#!/usr/bin/python3
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import IO, Any, Iterator, List, Mapping, Sequence, Tuple, Union
+
+# File layout, all integers little-endian:
+#   MAGIC
+#   header:  u32 length, JSON {"fields": [...]}, the names stored as one byte field ids in records
+#   records: u32 length, the encoded record
+#   index:   u64 offset of every record
+#   trailer: u64 index offset, u64 records count, END_MAGIC
+MAGIC = b'PSNREC1\n'
+END_MAGIC = b'PSNEND1\n'
+
+# the person and entity fields, a record key not listed in the header is stored with its name
+PERSON_FIELDS = [
+    'id', 'firstName', 'lastName', 'dateOfBirth', 'email', 'contactNumber',
+    'age', 'salary', 'address', 'entities', 'name',
+]
+
+_NONE, _STR, _INT, _FLOAT, _TRUE, _FALSE, _LIST, _DICT, _BIG_INT = range(9)
+# a key byte: field id, or NAMED_KEY followed by a u16 length and the name
+_NAMED_KEY = 255
+
+_U8 = struct.Struct('<B')
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+_TAG_U32 = struct.Struct('<BI')
+_TAG_I64 = struct.Struct('<Bq')
+_TAG_F64 = struct.Struct('<Bd')
+_TRAILER = struct.Struct('<QQ8s')
+
+_TAG_BYTES = {None: bytes([_NONE]), True: bytes([_TRUE]), False: bytes([_FALSE])}
+
+
+def encode_record(record: Mapping[str, Any], field_ids: Mapping[str, int]) -> bytes:
+    out = []
+    _encode(record, out, field_ids)
+    return b''.join(out)
+
+
+def decode_record(buffer: Union[bytes, mmap.mmap], position: int, fields: Sequence[str]) -> Any:
+    return _decode(buffer, position, fields)[0]
+
+
+class BinaryRecordWriter:
+    """Writes records one by one and the index of their offsets when closed."""
+
+    def __init__(self, output: IO[bytes], fields: Sequence[str] = PERSON_FIELDS) -> None:
+        if len(fields) >= _NAMED_KEY:
+            raise ValueError(f'At most {_NAMED_KEY - 1} header fields are supported')
+        self._output = output
+        self._field_ids = {name: index for index, name in enumerate(fields)}
+        self._offsets = array('Q')
+        header = json.dumps({'fields': list(fields)}).encode()
+        output.write(MAGIC + _U32.pack(len(header)) + header)
+        self._position = len(MAGIC) + _U32.size + len(header)
+
+    def write(self, record: Mapping[str, Any]) -> None:
+        data = encode_record(record, self._field_ids)
+        self._offsets.append(self._position)
+        self._output.write(_U32.pack(len(data)))
+        self._output.write(data)
+        self._position += _U32.size + len(data)
+
+    def close(self) -> int:
+        offsets = self._offsets
+        if sys.byteorder != 'little':
+            offsets = array('Q', offsets)
+            offsets.byteswap()
+        self._output.write(offsets.tobytes())
+        self._output.write(_TRAILER.pack(self._position, len(self._offsets), END_MAGIC))
+        return len(self._offsets)
+
+
+class BinaryRecordFile:
+    """Random access to the records of a binary file through a memory map.
+
+    records = BinaryRecordFile('persons.bin')
+    records[1_000_000], len(records), list(records[10:20])
+    """
+
+    def __init__(self, source: Union[str, IO[bytes]]) -> None:
+        self._file = open(source, 'rb') if isinstance(source, str) else None
+        file = self._file or source
+        raw = getattr(file, 'raw', file)
+        # an empty file can't be mapped, it is rejected by _read_layout() like any other short file
+        if isinstance(raw, io.FileIO) and os.fstat(raw.fileno()).st_size:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            # e.g. a decompressed stream, it can't be mapped and is read into memory
+            self._map = file.read()
+        try:
+            self._fields, self._index_offset, self._count = self._read_layout()
+        except (ValueError, struct.error) as err:
+            self.close()
+            raise ValueError(f'Not a binary records file: {err}') from err
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('record index out of range')
+        offset, = struct.unpack_from('<Q', self._map, self._index_offset + 8 * index)
+        return decode_record(self._map, offset + _U32.size, self._fields)
+
+    def __iter__(self) -> Iterator[Any]:
+        # sequential reads follow the length prefixes, the index is not needed
+        buffer, fields, position = self._map, self._fields, self._records_offset
+        for _ in range(self._count):
+            length, = _U32.unpack_from(buffer, position)
+            yield decode_record(buffer, position + _U32.size, fields)
+            position += _U32.size + length
+
+    def close(self) -> None:
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        if self._file:
+            self._file.close()
+
+    def __enter__(self) -> 'BinaryRecordFile':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _read_layout(self) -> Tuple[List[str], int, int]:
+        buffer = self._map
+        if len(buffer) < len(MAGIC) + _U32.size + _TRAILER.size:
+            raise ValueError('the file is too short')
+        if buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError('invalid magic')
+        index_offset, count, end_magic = _TRAILER.unpack_from(buffer, len(buffer) - _TRAILER.size)
+        if end_magic != END_MAGIC or index_offset + 8 * count + _TRAILER.size != len(buffer):
+            raise ValueError('invalid trailer, the file may be truncated')
+        header_length, = _U32.unpack_from(buffer, len(MAGIC))
+        header_offset = len(MAGIC) + _U32.size
+        header = json.loads(buffer[header_offset:header_offset + header_length])
+        self._records_offset = header_offset + header_length
+        return header['fields'], index_offset, count
+
+
+def _encode(value: Any, out: list, field_ids: Mapping[str, int]) -> None:
+    kind = type(value)
+    if kind is str:
+        data = value.encode()
+        out.append(_TAG_U32.pack(_STR, len(data)))
+        out.append(data)
+    elif value is None or kind is bool:
+        out.append(_TAG_BYTES[value])
+    elif kind is int:
+        if -2 ** 63 <= value < 2 ** 63:
+            out.append(_TAG_I64.pack(_INT, value))
+        else:
+            data = str(value).encode()
+            out.append(_TAG_U32.pack(_BIG_INT, len(data)))
+            out.append(data)
+    elif kind is float:
+        out.append(_TAG_F64.pack(_FLOAT, value))
+    elif isinstance(value, Mapping):
+        out.append(_TAG_U32.pack(_DICT, len(value)))
+        for key, item in value.items():
+            field_id = field_ids.get(key)
+            if field_id is not None:
+                out.append(_U8.pack(field_id))
+            else:
+                name = str(key).encode()
+                out.append(_U8.pack(_NAMED_KEY) + _U16.pack(len(name)))
+                out.append(name)
+            _encode(item, out, field_ids)
+    elif isinstance(value, (list, tuple)):
+        out.append(_TAG_U32.pack(_LIST, len(value)))
+        for item in value:
+            _encode(item, out, field_ids)
+    else:
+        raise TypeError(f'Object of type {kind.__name__} is not serializable')
+
+
+def _decode(buffer: Union[bytes, mmap.mmap], position: int, fields: Sequence[str]) -> Tuple[Any, int]:
+    tag = buffer[position]
+    position += 1
+    if tag == _STR:
+        length, = _U32.unpack_from(buffer, position)
+        position += _U32.size
+        return buffer[position:position + length].decode(), position + length
+    if tag == _DICT:
+        count, = _U32.unpack_from(buffer, position)
+        position += _U32.size
+        record = {}
+        for _ in range(count):
+            field_id = buffer[position]
+            position += 1
+            if field_id == _NAMED_KEY:
+                length, = _U16.unpack_from(buffer, position)
+                position += _U16.size
+                key = buffer[position:position + length].decode()
+                position += length
+            else:
+                key = fields[field_id]
+            # strings are most of the values, decoded inline without a call
+            if buffer[position] == _STR:
+                length, = _U32.unpack_from(buffer, position + 1)
+                position += 1 + _U32.size
+                record[key] = buffer[position:position + length].decode()
+                position += length
+            else:
+                record[key], position = _decode(buffer, position, fields)
+        return record, position
+    if tag == _INT:
+        return struct.unpack_from('<q', buffer, position)[0], position + 8
+    if tag == _NONE:
+        return None, position
+    if tag == _LIST:
+        count, = _U32.unpack_from(buffer, position)
+        position += _U32.size
+        items = []
+        for _ in range(count):
+            item, position = _decode(buffer, position, fields)
+            items.append(item)
+        return items, position
+    if tag == _FLOAT:
+        return struct.unpack_from('<d', buffer, position)[0], position + 8
+    if tag == _TRUE:
+        return True, position
+    if tag == _FALSE:
+        return False, position
+    if tag == _BIG_INT:
+        length, = _U32.unpack_from(buffer, position)
+        position += _U32.size
+        return int(buffer[position:position + length]), position + length
+    raise ValueError(f'Unknown value tag {tag} at {position - 1}')
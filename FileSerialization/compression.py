@@ -0,0 +1,168 @@
+#!/usr/bin/python3
+import bz2
+import gzip
+import io
+import lzma
+import os
+import queue
+import threading
+from typing import IO, Optional
+
+# compression by file extension, and the magic bytes a compressed source starts with
+EXTENSIONS = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz'}
+MAGIC_BYTES = {b'\x1f\x8b': 'gzip', b'BZh': 'bz2', b'\xfd7zXZ\x00': 'xz'}
+OPENERS = {'gzip': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+
+# blocks handed between the (de)compressing thread and the reader or writer
+BLOCK_SIZE = 1024 * 1024
+QUEUE_DEPTH = 4
+
+
+def detect_compression(path: str, reading: bool = True) -> Optional[str]:
+    """Detects the compression of a file by its extension, or by its first bytes when reading
+    Args:
+        path: the file path
+        reading: the file is read, its content can be sniffed
+    Returns:
+        'gzip', 'bz2', 'xz' or None if the file is not compressed
+    """
+    compression = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if compression or not reading:
+        return compression
+    with open(path, 'rb') as f:
+        head = f.read(max(len(magic) for magic in MAGIC_BYTES))
+    return next((name for magic, name in MAGIC_BYTES.items() if head.startswith(magic)), None)
+
+
+def strip_compression_extension(path: str) -> str:
+    root, extension = os.path.splitext(path)
+    return root if extension.lower() in EXTENSIONS else path
+
+
+def open_file(path: str, mode: str = 'r', **text_options) -> IO:
+    """Opens a file like open(), compressing or decompressing it transparently.
+
+    The (de)compression runs on a background thread a few blocks ahead of the reader or behind the
+    writer, zlib, bz2 and lzma release the GIL, so it overlaps with parsing and serializing.
+    Args:
+        path: the file path
+        mode: 'r', 'w', 'rb' or 'wb'
+        text_options: the encoding, errors and newline of a text mode file
+    Returns:
+        the opened file
+    """
+    reading = mode.startswith('r')
+    compression = detect_compression(path, reading)
+    if compression is None:
+        return open(path, mode, **text_options)
+
+    compressed = OPENERS[compression](path, 'rb' if reading else 'wb')
+    raw = _PrefetchReader(compressed) if reading else _BackgroundWriter(compressed)
+    buffered = io.BufferedReader(raw, BLOCK_SIZE) if reading else io.BufferedWriter(raw, BLOCK_SIZE)
+    if mode.endswith('b'):
+        return buffered
+    return io.TextIOWrapper(buffered, **text_options)
+
+
+class _PrefetchReader(io.RawIOBase):
+    # reads (and decompresses) the blocks of `source` on a thread, ahead of the consumer
+
+    def __init__(self, source: IO[bytes]) -> None:
+        super().__init__()
+        self._source = source
+        self._blocks = queue.Queue(QUEUE_DEPTH)
+        self._block = memoryview(b'')
+        self._stopped = threading.Event()
+        self._eof = False
+        self._thread = threading.Thread(target=self._read_blocks, name='prefetch-reader', daemon=True)
+        self._thread.start()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not self._block and not self._eof:
+            block = self._blocks.get()
+            if isinstance(block, BaseException):
+                self._eof = True
+                raise block
+            self._eof = not block
+            self._block = memoryview(block)
+        size = min(len(buffer), len(self._block))
+        buffer[:size] = self._block[:size]
+        self._block = self._block[size:]
+        return size
+
+    def close(self) -> None:
+        if not self.closed:
+            self._stopped.set()
+            while self._thread.is_alive():
+                # unblocks the thread waiting for room in the queue
+                try:
+                    self._blocks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self._source.close()
+        super().close()
+
+    def _read_blocks(self) -> None:
+        try:
+            while not self._stopped.is_set():
+                block = self._source.read(BLOCK_SIZE)
+                self._put(block)
+                if not block:
+                    return
+        except BaseException as err:
+            self._put(err)
+
+    def _put(self, item) -> None:
+        while not self._stopped.is_set():
+            try:
+                self._blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+
+class _BackgroundWriter(io.RawIOBase):
+    # writes (and compresses) the blocks to `target` on a thread, errors surface on the next write or close
+
+    def __init__(self, target: IO[bytes]) -> None:
+        super().__init__()
+        self._target = target
+        self._blocks = queue.Queue(QUEUE_DEPTH)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._write_blocks, name='background-writer', daemon=True)
+        self._thread.start()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._raise_error()
+        self._blocks.put(bytes(data))
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._blocks.put(None)
+            self._thread.join()
+            self._target.close()
+            super().close()
+            self._raise_error()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _write_blocks(self) -> None:
+        while True:
+            block = self._blocks.get()
+            if block is None:
+                return
+            if self._error is None:
+                try:
+                    self._target.write(block)
+                except BaseException as err:
+                    self._error = err
@@ -4,11 +4,20 @@ import json
 import logging
 from enum import Enum
 from abc import ABC, abstractmethod
-from typing import List
+from typing import IO, Iterable, Iterator, List, Optional
 from xml.etree import ElementTree as ET
+from xml.sax.saxutils import escape
+
+from binary_format import BinaryRecordFile, BinaryRecordWriter
+from compression import open_file
 
 logger = logging.getLogger(__name__)
 
+# characters read from a JSON source at a time
+JSON_CHUNK_SIZE = 64 * 1024
+# the characters that can follow an item of a JSON array
+ITEM_TERMINATORS = frozenset(' \t\r\n,]')
+
 
 class StrEnum(str, Enum):
     pass
@@ -18,96 +27,173 @@ class FileTypes(StrEnum):
     JSON = 'json'
     XML = 'xml'
     CSV = 'csv'
+    BINARY = 'bin'
 
 
 class FileSerializer(ABC):
+    # the output is written in binary mode
+    binary = False
+    # the keyword arguments of open() for the output file
+    open_options = {'newline': ''}
+
+    def serialize(self, data: Iterable[dict], output_path: str) -> int:
+        """Writes the records to the file as they are consumed from `data`, compressed if the path
+        ends with .gz, .bz2 or .xz
+        Returns:
+            the number of written records
+        """
+        with open_file(output_path, 'w', **self.open_options) as output:
+            return self.write(data, output)
 
     @abstractmethod
-    def serialize(self, data: List[dict], output_path: str):
+    def write(self, data: Iterable[dict], output: IO[str]) -> int:
         raise NotImplementedError()
 
 
-class JSONSerializer(FileSerializer):
+class FragmentSerializer(FileSerializer):
+    """A serializer whose output can be stitched from fragments of records written separately,
+    e.g. by parallel_conversion workers: prefix, the fragments joined by separator, then suffix
+    """
+    # written before and after the records, and between two non-empty fragments of records
+    prefix, suffix, separator = '', '', ''
 
-    def serialize(self, data: dict, output_path: str) -> None:
-        with open(output_path, 'w') as json_file:
-            json.dump(data, json_file)
+    def write(self, data: Iterable[dict], output: IO[str]) -> int:
+        output.write(self.prefix)
+        count = self.write_records(data, output)
+        output.write(self.suffix)
+        return count
 
+    @abstractmethod
+    def write_records(self, data: Iterable[dict], output: IO[str], first_fragment: bool = True) -> int:
+        """Writes the records only, a fragment of a file. The fragments after the first one of a file
+        stitched from several are written with `first_fragment=False`
+        """
+        raise NotImplementedError()
 
-class CSVSerializer(FileSerializer):
 
-    def serialize(self, data: List[dict], output_path: str):
-        csv_data, header = [], []
-        for item in data:
+class JSONSerializer(FragmentSerializer):
+    # the same output as json.dump() of the whole list
+    prefix, suffix, separator = '[', ']', ', '
+
+    def write_records(self, data: Iterable[dict], output: IO[str], first_fragment: bool = True) -> int:
+        count = 0
+        for count, item in enumerate(data, start=1):
+            if count > 1:
+                output.write(self.separator)
+            # one C-encoded write per record, json.dump() writes each token separately
+            output.write(json.dumps(item))
+        return count
+
+
+class CSVSerializer(FragmentSerializer):
+
+    def write_records(self, data: Iterable[dict], output: IO[str], first_fragment: bool = True) -> int:
+        writer = csv.writer(output)
+        header, count = [], 0
+        for count, item in enumerate(data, start=1):
             if not header:
                 header = list(item.keys())
-                csv_data.append(header)
+                if first_fragment:
+                    writer.writerow(header)
             row = []
             for key in header:
                 if key in item:
                     if isinstance(item[key], list):
-                        entities = item[key][0]
+                        entities = item[key][0] if item[key] else {'id': '', 'name': ''}
                         row.append(entities['id']), row.append(entities['name'])
                     else:
                         row.append(item[key])
                 else:
                     row.append('')
-            csv_data.append(row)
-        with open(output_path, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerows(csv_data)
+            writer.writerow(row)
+        return count
+
+
+class XMLSerializer(FragmentSerializer):
+    # the same encoding as ElementTree.write(): non-ASCII characters become character references
+    open_options = {'encoding': 'us-ascii', 'errors': 'xmlcharrefreplace'}
+    prefix, suffix = '<persons>', '</persons>'
+
+    def write_records(self, data: Iterable[dict], output: IO[str], first_fragment: bool = True) -> int:
+        # each person is written on its own, the document is never held in memory
+        count = 0
+        for count, item in enumerate(data, start=1):
+            output.write(self.__format_person(item))
+        return count
+
+    @classmethod
+    def __format_person(cls, item: dict) -> str:
+        # the same markup as ET.tostring() of the person element, without building the element
+        parts = []
+        for item_name, item_value in item.items():
+            if isinstance(item_value, list):
+                entities = []
+                for entity in item_value:
+                    entities.append(cls.__format_element('entity', ''.join(
+                        cls.__format_element(name, escape(str(value))) for name, value in entity.items()
+                    )))
+                parts.append(cls.__format_element(item_name, ''.join(entities)))
+            else:
+                parts.append(cls.__format_element(item_name, escape(str(item_value))))
+        return cls.__format_element('person', ''.join(parts))
 
+    @staticmethod
+    def __format_element(tag: str, content: str) -> str:
+        return f'<{tag}>{content}</{tag}>' if content else f'<{tag} />'
 
-class XMLSerializer(FileSerializer):
 
-    def serialize(self, data, output_path):
-        root = ET.Element('persons')
+class BinarySerializer(FileSerializer):
+    binary = True
+
+    def serialize(self, data: Iterable[dict], output_path: str) -> int:
+        with open_file(output_path, 'wb') as output:
+            return self.write(data, output)
+
+    def write(self, data: Iterable[dict], output: IO[bytes]) -> int:
+        writer = BinaryRecordWriter(output)
         for item in data:
-            row_el = ET.SubElement(root, 'person')
-            for item_name, item_value in item.items():
-                if isinstance(item_value, list):
-                    row_sub_el = ET.SubElement(row_el, item_name)
-                    for entity in item_value:
-                        entity_sub_el = ET.SubElement(row_sub_el, 'entity')
-                        for name, value in entity.items():
-                            item_sub_el = ET.SubElement(entity_sub_el, name)
-                            item_sub_el.text = str(value)
-                else:
-                    item_el = ET.SubElement(row_el, item_name)
-                    item_el.text = str(item_value)
-        tree = ET.ElementTree(root)
-        tree.write(output_path)
+            writer.write(item)
+        return writer.close()
 
 
 class FileDeserializer(ABC):
+    # the source is opened in binary mode
+    binary = False
 
     @abstractmethod
-    def deserialize(self, data):
+    def deserialize(self, source: IO[str]) -> Iterator[dict]:
         raise NotImplementedError
 
 
 class CSVDeserializer(FileDeserializer):
 
-    def deserialize(self, file_content: str) -> List[dict]:
+    def __init__(self, fieldnames: Optional[List[str]] = None) -> None:
+        # the header of a source without one, e.g. a byte range of a larger file
+        self.fieldnames = fieldnames
+
+    def deserialize(self, source: IO[str]) -> Iterator[dict]:
+        # the source should be opened with newline='' so quoted fields may hold line breaks
         try:
-            return [row for row in csv.DictReader(file_content.splitlines())]
-        except ValueError as err:
+            yield from csv.DictReader(source, fieldnames=self.fieldnames)
+        except (ValueError, csv.Error) as err:
             logger.error(err)
             raise err
 
 
 class XMLDeserializer(FileDeserializer):
 
-    def deserialize(self, file_content: str) -> List:
+    def deserialize(self, source: IO[str]) -> Iterator[dict]:
+        # persons are cleared from the tree once parsed, so only the current one is held in memory
         try:
-            root = ET.fromstring(file_content)
-            persons = []
-            for person in root.findall("./person"):
-                person_dict = self.__parse_person(person)
-                persons.append(person_dict)
-            return persons
-        except ValueError as err:
-            print(err)
+            context = ET.iterparse(source, events=('start', 'end'))
+            _, root = next(context)
+            for event, element in context:
+                if event == 'end' and element.tag == 'person':
+                    yield self.__parse_person(element)
+                    root.clear()
+        except ET.ParseError as err:
+            logger.error(err)
+            raise err
 
     @staticmethod
     def __parse_person(person: ET.Element) -> dict:
@@ -121,17 +207,70 @@ class XMLDeserializer(FileDeserializer):
                         entity_dict[sub_element.tag] = sub_element.text
                     entities.append(entity_dict)
                 person_dict[element.tag] = entities
-            person_dict[element.tag] = element.text
+            else:
+                person_dict[element.tag] = element.text
         return person_dict
 
 
 class JSONDeserializer(FileDeserializer):
 
-    def deserialize(self, file_content: str) -> dict:
+    def __init__(self, chunk_size: int = JSON_CHUNK_SIZE) -> None:
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+
+    def deserialize(self, source: IO[str]) -> Iterator[dict]:
+        """Yields the items of a top-level JSON array one by one, reading the source in chunks.
+        Any other top-level value is loaded whole and yielded as a single record.
+        """
         try:
-            return json.loads(file_content)
+            buffer = source.read(self.chunk_size).lstrip()
+            if not buffer.startswith('['):
+                data = json.loads(buffer + source.read())
+                yield from data if isinstance(data, list) else [data]
+                return
+
+            position, eof = 1, False
+            while True:
+                position = self.__skip_separators(buffer, position)
+                if position < len(buffer) and buffer[position] == ']':
+                    return
+                try:
+                    item, end = self.decoder.raw_decode(buffer, position)
+                    # a number cut by the end of the buffer (7|.5, 1.5e|-7) decodes to a shorter number:
+                    # an item is complete once a separator or the end of the array follows it
+                    complete = eof or (end < len(buffer) and buffer[end] in ITEM_TERMINATORS)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    complete = False
+
+                if complete:
+                    yield item
+                    position = end
+                    continue
+
+                chunk = source.read(self.chunk_size)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
         except ValueError as err:
-            print(err)
+            logger.error(err)
+            raise err
+
+    @staticmethod
+    def __skip_separators(buffer: str, position: int) -> int:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        return position
+
+
+class BinaryDeserializer(FileDeserializer):
+    binary = True
+
+    def deserialize(self, source: IO[bytes]) -> Iterator[dict]:
+        # use BinaryRecordFile directly to read records by index
+        with BinaryRecordFile(source) as records:
+            yield from records
 
 
 class FileConverterFactory:
@@ -144,6 +283,8 @@ class FileConverterFactory:
             return CSVSerializer()
         elif file_format == FileTypes.XML:
             return XMLSerializer()
+        elif file_format == FileTypes.BINARY:
+            return BinarySerializer()
 
         raise ValueError(f'Incorrect file format: {file_format}.')
 
@@ -155,5 +296,7 @@ class FileConverterFactory:
             return CSVDeserializer()
         elif file_format == FileTypes.XML:
             return XMLDeserializer()
+        elif file_format == FileTypes.BINARY:
+            return BinaryDeserializer()
 
         raise ValueError(f'Incorrect file format: {file_format}.')
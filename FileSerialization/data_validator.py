@@ -1,5 +1,19 @@
 #!/usr/bin/python3
-from marshmallow import Schema, fields, validate
+import datetime
+import decimal
+import functools
+import itertools
+import json
+import logging
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from marshmallow import RAISE, Schema, ValidationError, fields, missing, validate
+
+# the canonical form only, other spellings uuid.UUID accepts go through marshmallow
+_UUID_RE = re.compile(r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\Z')
 
 
 class EntitySchema(Schema):
@@ -18,3 +32,209 @@ class PersonSchema(Schema):
     salary = fields.Decimal(required=True)
     address = fields.String(validate=validate.Length(min=3, max=50))
     entities = fields.Nested(EntitySchema(), many=True)
+
+
+# records sent to a validation worker at a time
+VALIDATION_CHUNK_SIZE = 2000
+
+Validator = Callable[[Any], Dict[str, Any]]
+
+logger = logging.getLogger(__name__)
+# the compiled schema of a validation worker process
+_worker_validator: Optional[Validator] = None
+
+
+def compile_schema(schema: Schema) -> Validator:
+    """Builds a function returning the same errors as `schema.validate(data)` with less overhead per record.
+
+    Each field is checked by a fast path accepting the common valid values, anything else goes to the
+    marshmallow field itself, which produces the exact error messages. Nested schemas are compiled too.
+    Schemas with hooks (e.g. @validates_schema) or INCLUDE/EXCLUDE unknown handling use schema.validate.
+    """
+    if schema.many or schema.unknown != RAISE or any(schema._hooks.values()):
+        return schema.validate
+
+    checks = {}
+    for name, field in schema.load_fields.items():
+        checks[field.data_key or name] = (field, _compile_field(field))
+    invalid_input = {'_schema': [schema.error_messages['type']]}
+    unknown_field = schema.error_messages['unknown']
+
+    def validate(data: Any) -> Dict[str, Any]:
+        if not isinstance(data, Mapping):
+            return dict(invalid_input)
+
+        errors = {}
+        for key, (field, check) in checks.items():
+            value = data.get(key, missing)
+            if value is missing:
+                if field.required:
+                    errors[key] = [field.error_messages['required']]
+                continue
+            field_errors = check(value)
+            if field_errors:
+                errors[key] = field_errors
+        if any(key not in checks for key in data):
+            for key in data:
+                if key not in checks:
+                    errors[key] = [unknown_field]
+        return errors
+
+    return validate
+
+
+def _compile_field(field: fields.Field) -> Callable[[Any], Any]:
+    # returns the field's error messages for a present value, None if it is valid
+    def deserialize(value: Any) -> Any:
+        try:
+            field.deserialize(value)
+        except ValidationError as err:
+            return err.messages
+        return None
+
+    if isinstance(field, fields.Nested) and field.many and not (field.only or field.exclude):
+        validate_item = compile_schema(field.schema.__class__())
+
+        def check_nested(value: Any) -> Any:
+            if type(value) is not list:
+                return deserialize(value)
+            errors = {}
+            for index, item in enumerate(value):
+                item_errors = validate_item(item)
+                if item_errors:
+                    errors[index] = item_errors
+            return errors or None
+        return check_nested
+
+    validators = list(field.validators)
+    if isinstance(field, fields.UUID) and not validators:
+        fast = _is_uuid
+    elif type(field) in (fields.String, fields.Email):
+        fast = _is_str
+    elif type(field) is fields.Integer and not field.strict:
+        fast = _is_int
+    elif type(field) is fields.Decimal and field.places is None and not field.allow_nan and not validators:
+        fast = _is_finite_decimal
+    elif (type(field) is fields.DateTime and not validators
+          and field.format not in (None, 'iso', 'rfc', 'timestamp', 'timestamp_ms')):
+        fast = functools.partial(_is_formatted_datetime, field.format)
+    else:
+        return deserialize
+
+    def check(value: Any) -> Any:
+        # strings and ints deserialize to themselves, so the validators see what marshmallow passes them
+        if fast(value):
+            try:
+                for validator in validators:
+                    validator(value)
+                return None
+            except ValidationError:
+                pass
+        return deserialize(value)
+    return check
+
+
+def _is_uuid(value: Any) -> bool:
+    return type(value) is str and _UUID_RE.match(value) is not None
+
+
+def _is_str(value: Any) -> bool:
+    return type(value) is str
+
+
+def _is_int(value: Any) -> bool:
+    return type(value) is int
+
+
+def _is_finite_decimal(value: Any) -> bool:
+    if type(value) not in (str, int):
+        return False
+    try:
+        return decimal.Decimal(value).is_finite()
+    except decimal.InvalidOperation:
+        return False
+
+
+def _is_formatted_datetime(date_format: str, value: Any) -> bool:
+    if type(value) is not str:
+        return False
+    try:
+        datetime.datetime.strptime(value, date_format)
+        return True
+    except ValueError:
+        return False
+
+
+def validate_records(
+        records: Iterable[dict],
+        schema: Schema,
+        report: Optional[IO[str]] = None,
+        workers: int = 0,
+        chunk_size: int = VALIDATION_CHUNK_SIZE,
+) -> Iterator[dict]:
+    """Validates the records with the compiled schema and yields them back in their order.
+
+    With `workers`, chunks of records are validated by a process pool (each worker compiles its own
+    `type(schema)()`), at most two chunks per worker are in flight so memory stays bounded.
+    Errors are written to `report` as NDJSON lines {"record": index, "id": ..., "errors": {...}}
+    as they are found, or logged if there is no report.
+    """
+    invalid, count = 0, 0
+
+    def handle(chunk_start: int, chunk: List[dict], errors: List[Tuple[int, dict]]) -> Iterator[dict]:
+        nonlocal invalid, count
+        for offset, record_errors in errors:
+            record = chunk[offset]
+            record_id = record.get('id') if isinstance(record, Mapping) else None
+            report_errors(report, chunk_start + offset, record_id, record_errors)
+        invalid += len(errors)
+        count += len(chunk)
+        yield from chunk
+
+    records = iter(records)
+    chunks = iter(lambda: list(itertools.islice(records, chunk_size)), [])
+    if workers:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(type(schema),)) as executor:
+            pending, submitted = deque(), 0
+            for chunk in chunks:
+                pending.append((submitted, chunk, executor.submit(_validate_chunk, chunk)))
+                submitted += len(chunk)
+                if len(pending) >= 2 * workers:
+                    chunk_start, chunk, future = pending.popleft()
+                    yield from handle(chunk_start, chunk, future.result())
+            while pending:
+                chunk_start, chunk, future = pending.popleft()
+                yield from handle(chunk_start, chunk, future.result())
+    else:
+        validator = compile_schema(schema)
+        for chunk in chunks:
+            yield from handle(count, chunk, _collect_errors(validator, chunk))
+
+    if invalid:
+        logger.warning(f'{invalid} of {count} records are invalid')
+
+
+def report_errors(report: Optional[IO[str]], index: int, record_id: Any, errors: dict) -> None:
+    # one NDJSON line of the error report, or a log line without a report
+    if report is None:
+        logger.error(errors)
+        return
+    report.write(json.dumps({'record': index, 'id': record_id, 'errors': errors}, default=str) + '\n')
+
+
+def _collect_errors(validator: Validator, chunk: List[dict]) -> List[Tuple[int, dict]]:
+    errors = []
+    for offset, record in enumerate(chunk):
+        record_errors = validator(record)
+        if record_errors:
+            errors.append((offset, record_errors))
+    return errors
+
+
+def _init_worker(schema_class: type) -> None:
+    global _worker_validator
+    _worker_validator = compile_schema(schema_class())
+
+
+def _validate_chunk(chunk: List[dict]) -> List[Tuple[int, dict]]:
+    return _collect_errors(_worker_validator, chunk)
@@ -0,0 +1,179 @@
+#!/usr/bin/python3
+import csv
+import io
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, List, Optional, Tuple
+
+from compression import detect_compression, open_file
+from data_conversion import CSVDeserializer, FileConverterFactory, FragmentSerializer
+from data_validator import PersonSchema, Validator, compile_schema, report_errors
+
+logger = logging.getLogger(__name__)
+
+# ranges are at least this large, a smaller file is converted by a single worker
+MIN_RANGE_SIZE = 8 * 1024 * 1024
+# more, smaller ranges than workers even out the ranges that convert slower
+RANGES_PER_WORKER = 4
+SCAN_BLOCK_SIZE = 1024 * 1024
+
+# the compiled PersonSchema of a conversion worker process
+_worker_validator: Optional[Validator] = None
+
+
+def split_csv(source_path: str, ranges: int) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """Splits a CSV file into at most `ranges` byte ranges of whole rows
+    Args:
+        source_path: the CSV file path
+        ranges: the wanted number of ranges
+    Returns:
+        the header fields and the (start, end) offsets of the ranges following the header
+    """
+    size = os.path.getsize(source_path)
+    # the header ends at the first row boundary, each range at the first one after its target offset
+    targets = [0] + [size * index // ranges for index in range(1, ranges)]
+    boundaries = []
+    with open(source_path, 'rb') as source:
+        position, quotes = 0, 0
+        while targets:
+            block = source.read(SCAN_BLOCK_SIZE)
+            if not block:
+                break
+            index = 0
+            while targets:
+                newline = block.find(b'\n', max(targets[0] - position, index))
+                if newline < 0:
+                    break
+                index = newline + 1
+                # a line break is a row boundary when it is not quoted: escaped quotes come in pairs,
+                # so the quotes before it are even
+                if (quotes + block.count(b'"', 0, newline)) % 2 == 0:
+                    boundaries.append(position + index)
+                    while targets and targets[0] < position + index:
+                        targets.pop(0)
+            quotes += block.count(b'"')
+            position += len(block)
+
+        if not boundaries:
+            if not size:
+                return [], []
+            # a header without a line break after it: the end of the file ends the header
+            boundaries.append(size)
+        source.seek(0)
+        header = io.TextIOWrapper(io.BytesIO(source.read(boundaries[0])), newline='')
+        fieldnames = next(csv.reader(header))
+
+    ends = boundaries[1:] + [size]
+    return fieldnames, [(start, end) for start, end in zip(boundaries, ends) if start < end]
+
+
+def convert_csv_parallel(
+        source_path: str,
+        target_format: str,
+        output_path: str,
+        workers: int = 0,
+        error_report: Optional[IO[str]] = None,
+) -> int:
+    """Converts a CSV file by row-aligned byte ranges, each one deserialized, validated and
+    serialized by a worker process, then stitches the converted ranges in order
+    Args:
+        source_path: the CSV file path
+        target_format: the output file format
+        output_path: the output file path
+        workers: the worker processes, all CPUs if 0
+        error_report: the file for NDJSON validation errors, errors are logged if None
+    Returns:
+        the number of converted records
+    """
+    serializer = FileConverterFactory.get_serializer(target_format)
+    if not isinstance(serializer, FragmentSerializer):
+        raise ValueError(f'{target_format} output can\'t be stitched from ranges')
+    if detect_compression(source_path):
+        raise ValueError(f'{source_path} is compressed, it can\'t be split into byte ranges')
+
+    workers = workers or os.cpu_count() or 1
+    ranges = max(1, min(workers * RANGES_PER_WORKER, os.path.getsize(source_path) // MIN_RANGE_SIZE))
+    fieldnames, byte_ranges = split_csv(source_path, ranges)
+    logger.info(f'Converting {source_path} in {len(byte_ranges)} ranges with {workers} workers')
+
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    with tempfile.TemporaryDirectory(dir=output_dir) as parts_dir, \
+            ProcessPoolExecutor(workers, initializer=_init_worker) as executor:
+        part_paths = [os.path.join(parts_dir, f'{index}.part') for index in range(len(byte_ranges))]
+        futures = [
+            executor.submit(_convert_range, source_path, fieldnames, start, end, target_format, part_path, index == 0)
+            for index, ((start, end), part_path) in enumerate(zip(byte_ranges, part_paths))
+        ]
+
+        count, fragments = 0, 0
+        with open_file(output_path, 'w', **serializer.open_options) as output:
+            output.write(serializer.prefix)
+            for future, part_path in zip(futures, part_paths):
+                part_count, errors = future.result()
+                for offset, record_id, record_errors in errors:
+                    report_errors(error_report, count + offset, record_id, record_errors)
+                if part_count:
+                    if fragments:
+                        output.write(serializer.separator)
+                    with open(part_path, **serializer.open_options) as part:
+                        shutil.copyfileobj(part, output)
+                    fragments += 1
+                os.remove(part_path)
+                count += part_count
+            output.write(serializer.suffix)
+    return count
+
+
+class _RangeReader(io.RawIOBase):
+    # reads `size` bytes of the file from its current position
+
+    def __init__(self, file: IO[bytes], size: int) -> None:
+        super().__init__()
+        self._file = file
+        self._remaining = size
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._file.read(min(len(buffer), self._remaining))
+        self._remaining -= len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _init_worker() -> None:
+    global _worker_validator
+    _worker_validator = compile_schema(PersonSchema())
+
+
+def _convert_range(
+        source_path: str,
+        fieldnames: List[str],
+        start: int,
+        end: int,
+        target_format: str,
+        part_path: str,
+        first_fragment: bool,
+) -> Tuple[int, List[Tuple[int, object, dict]]]:
+    # returns the converted records count and the (offset in range, id, errors) of the invalid ones
+    errors = []
+
+    def validate(records):
+        for offset, record in enumerate(records):
+            record_errors = _worker_validator(record)
+            if record_errors:
+                errors.append((offset, record.get('id'), record_errors))
+            yield record
+
+    serializer = FileConverterFactory.get_serializer(target_format)
+    with open(source_path, 'rb', buffering=0) as source:
+        source.seek(start)
+        reader = io.TextIOWrapper(io.BufferedReader(_RangeReader(source, end - start), SCAN_BLOCK_SIZE), newline='')
+        records = CSVDeserializer(fieldnames).deserialize(reader)
+        with open(part_path, 'w', **serializer.open_options) as part:
+            count = serializer.write_records(validate(records), part, first_fragment)
+    return count, errors
@@ -0,0 +1,126 @@
+#!/usr/bin/python3
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+STAGES = ('read', 'deserialize', 'validate', 'serialize')
+
+
+class StageProfiler:
+    """Wall time of the stages of a streaming conversion.
+
+    The stages run interleaved (the serializer pulls a validated record, which pulls a deserialized one,
+    which reads the file), so each stage is timed exclusive of the stages it calls.
+    """
+
+    def __init__(self) -> None:
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.records = 0
+        self._stack: List[str] = []
+        self._started = time.perf_counter()
+        self._created = self._started
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def wrap_iterator(self, name: str, iterator: Iterator[Any], count: bool = False) -> Iterator[Any]:
+        iterator = iter(iterator)
+        while True:
+            self._enter(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._exit()
+            if count:
+                self.records += 1
+            yield item
+
+    def wrap_file(self, name: str, file: IO) -> IO:
+        return _TimedFile(self, name, file)
+
+    def results(self) -> Dict[str, Any]:
+        total = time.perf_counter() - self._created
+        results = {f'{stage}_seconds': self.seconds.get(stage, 0.0) for stage in STAGES}
+        results.update({
+            'total_seconds': total,
+            'records': self.records,
+            'records_per_sec': self.records / total if total else 0.0,
+            'peak_rss_bytes': peak_rss_bytes(),
+        })
+        return results
+
+    def report(self) -> str:
+        results = self.results()
+        total = results['total_seconds']
+        lines = [f'{"stage":<12} {"seconds":>9} {"share":>6}']
+        for stage in STAGES:
+            seconds = results[f'{stage}_seconds']
+            lines.append(f'{stage:<12} {seconds:>9.3f} {seconds / total if total else 0:>6.1%}')
+        lines.append(f'{"total":<12} {total:>9.3f}')
+        peak = results['peak_rss_bytes']
+        peak_rss = f'{peak / 2 ** 20:,.1f} MiB' if peak is not None else 'n/a'
+        lines.append(f'{results["records"]:,} records, {results["records_per_sec"]:,.0f} records/sec, '
+                     f'peak RSS {peak_rss}')
+        return '\n'.join(lines)
+
+    def _enter(self, name: str) -> None:
+        now = time.perf_counter()
+        if self._stack:
+            self.seconds[self._stack[-1]] += now - self._started
+        self._stack.append(name)
+        self._started = now
+
+    def _exit(self) -> None:
+        now = time.perf_counter()
+        self.seconds[self._stack.pop()] += now - self._started
+        self._started = now
+
+
+def peak_rss_bytes() -> Optional[int]:
+    # the peak resident memory of this process, None where the resource module is missing
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class _TimedFile:
+    # times the reads of a file, everything else is delegated to it
+
+    def __init__(self, profiler: StageProfiler, name: str, file: IO) -> None:
+        self._profiler = profiler
+        self._name = name
+        self._file = file
+
+    def read(self, *args) -> Any:
+        with self._profiler.stage(self._name):
+            return self._file.read(*args)
+
+    def readline(self, *args) -> Any:
+        with self._profiler.stage(self._name):
+            return self._file.readline(*args)
+
+    def __iter__(self) -> '_TimedFile':
+        return self
+
+    def __next__(self) -> Any:
+        with self._profiler.stage(self._name):
+            return next(self._file)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._file, name)
@@ -1,12 +1,20 @@
 #!/usr/bin/python3
 
+import json
 import logging
-from argparse import ArgumentParser
+import sys
+from argparse import ArgumentParser, Namespace
+from contextlib import ExitStack
 from datetime import datetime
-from typing import Tuple
+from typing import IO, Iterable, Iterator, Optional
 
-from data_conversion import FileConverterFactory
-from data_validator import PersonSchema
+from compression import detect_compression, open_file
+from data_conversion import FileConverterFactory, FileTypes, FragmentSerializer
+from data_validator import PersonSchema, validate_records
+from parallel_conversion import convert_csv_parallel
+from profiling import StageProfiler
+
+MANIFEST_NAME = '.conversion-manifest.json'
 
 logger = logging.getLogger(__name__)
 
@@ -15,28 +23,52 @@ class MyCustomerException(Exception):
     pass
 
 
-def parse_arguments() -> Tuple[str, str, str, str]:
+def parse_arguments() -> Namespace:
     parser = ArgumentParser(description="Mapping: for the File serialization")
-    parser.add_argument("-sf", "--sourceFormat", help="the input file format", required=True, type=str)
-    parser.add_argument("-tf", "--targetFormat", help="the output file format", required=True, type=str)
-    parser.add_argument("-sp", "--sourceFilePath", help="the source file path", required=True, type=str)
+    parser.add_argument("-sf", "--sourceFormat", help="the input file format, in batch mode the format "
+                        "of the converted files (by extension, all but the target format if not set)",
+                        required=False, type=str.lower)
+    parser.add_argument("-tf", "--targetFormat", help="the output file format", required=True, type=str.lower)
+    parser.add_argument("-sp", "--sourceFilePath", help="the source file path", required=False, type=str)
     parser.add_argument("-op", "--outputFilePath", help="the output file path", required=False, type=str)
+    parser.add_argument("-b", "--batch", help="a directory or glob of source files converted by a worker pool, "
+                        "unchanged files are skipped", required=False, type=str)
+    parser.add_argument("-od", "--outputDir", help="the batch output directory, next to each source if not set",
+                        required=False, type=str)
+    parser.add_argument("-m", "--manifest", help="the batch manifest of converted files content hashes, "
+                        f"{MANIFEST_NAME} in the output directory (or the source directory) if not set",
+                        required=False, type=str)
+    parser.add_argument("-w", "--workers", help="the validation processes, 0 validates in-process; "
+                        "the conversion processes with --batch or --parallel, all CPUs if 0",
+                        required=False, type=int, default=0)
+    parser.add_argument("-p", "--parallel", help="converts a CSV source by byte ranges across the workers, "
+                        "all CPUs if --workers is 0", action="store_true")
+    parser.add_argument("-pr", "--profile", help="prints the time of each stage, records/sec and peak memory",
+                        action="store_true")
+    parser.add_argument("-po", "--profileOutput", help="writes the profile as JSON to this file",
+                        required=False, type=str)
+    parser.add_argument("-er", "--errorReport", help="the NDJSON file for validation errors, in batch mode "
+                        "the directory of one report per file, logged if not set", required=False, type=str)
     args = parser.parse_args()
-    return args.sourceFormat.lower(), args.targetFormat.lower(), args.sourceFilePath, args.outputFilePath
+    if not args.batch and not (args.sourceFormat and args.sourceFilePath):
+        parser.error("--sourceFormat and --sourceFilePath are required without --batch")
+    return args
 
 
-def read_source_file(file_path: str) -> str:
-    """Reads the file
+def read_source_file(file_path: str, binary: bool = False) -> IO:
+    """Opens the file for streaming reads by a deserializer, decompressing gzip, bz2 and xz files
+    (detected by extension or content) on the fly
     Args:
         file_path: the file path
+        binary: opens the file in binary mode
     Returns:
-        the file content
+        the opened file, to be closed by the caller
     """
     try:
-        with open(file_path) as file:
-            return file.read()
+        return open_file(file_path, 'rb') if binary else open_file(file_path, 'r', newline='')
     except FileNotFoundError as err:
         logger.error(err)
+        raise err
 
 
 def generate_output_filename(file_extension: str) -> str:
@@ -50,39 +82,98 @@ def generate_output_filename(file_extension: str) -> str:
     return f"result-{current_datetime.strftime('%Y-%m-%d-%H:%M:%S')}.{file_extension}"
 
 
-def validate_input_data(data: list, person_schema: PersonSchema) -> None:
-    """Validates the input data data
+def validate_input_data(
+        data: Iterable[dict],
+        person_schema: PersonSchema,
+        error_report: Optional[IO[str]] = None,
+        workers: int = 0,
+) -> Iterator[dict]:
+    """Validates the input data as it streams through
     Args:
         data: the input data
         person_schema: the instance of PersonSchema class
+        error_report: the file for NDJSON validation errors, errors are logged if None
+        workers: the validation processes, 0 validates in-process
+    Returns:
+        the same records in the same order
+    """
+    return validate_records(data, person_schema, error_report, workers)
+
+
+def convert_file(
+        source_path: str,
+        source_format: str,
+        target_format: str,
+        output_path: str,
+        person_schema: PersonSchema,
+        error_report: Optional[IO[str]] = None,
+        workers: int = 0,
+        profiler: Optional[StageProfiler] = None,
+) -> int:
+    """Reads, validates and writes one record at a time, the whole file is never held in memory
+    Args:
+        source_path: the source file path
+        source_format: the input file format
+        target_format: the output file format
+        output_path: the output file path
+        person_schema: the instance of PersonSchema class
+        error_report: the file for NDJSON validation errors, errors are logged if None
+        workers: the validation processes, 0 validates in-process
+        profiler: times the read, deserialize, validate and serialize stages
     Returns:
-        None
+        the number of converted records
     """
-    for person in data:
-        errors = person_schema.validate(person)
-        if errors:
-            logger.error(errors)
+    file_deserializer = FileConverterFactory.get_deserializer(source_format)
+    file_serializer = FileConverterFactory.get_serializer(target_format)
+    with read_source_file(source_path, file_deserializer.binary) as source_file:
+        if profiler is None:
+            file_content = file_deserializer.deserialize(source_file)
+            persons = validate_input_data(file_content, person_schema, error_report, workers)
+            return file_serializer.serialize(persons, output_path)
 
+        source_file = profiler.wrap_file('read', source_file)
+        file_content = profiler.wrap_iterator('deserialize', file_deserializer.deserialize(source_file))
+        persons = validate_input_data(file_content, person_schema, error_report, workers)
+        with profiler.stage('serialize'):
+            return file_serializer.serialize(profiler.wrap_iterator('validate', persons, count=True), output_path)
 
-def main() -> None:
-    source_format, target_format, source_file_path, output_file_path = parse_arguments()
 
-    # reads the source file
-    source_file_data = read_source_file(source_file_path)
-    breakpoint()
-    file_deserializer = FileConverterFactory.get_deserializer(source_format)
-    file_content = file_deserializer.deserialize(source_file_data)
+def main() -> None:
+    args = parse_arguments()
 
-    # validates the input data
-    person_schema = PersonSchema()
-    validate_input_data(file_content, person_schema)
+    if args.batch:
+        # imported here, batch_conversion uses convert_file() of this module
+        from batch_conversion import convert_batch
+        convert_batch(args.batch, args.targetFormat, args.sourceFormat, args.outputDir, args.workers,
+                      args.manifest, args.errorReport)
+        return
 
     # checks the output filename
-    if not output_file_path:
-        output_file_path = generate_output_filename(target_format)
-
-    file_serializer = FileConverterFactory.get_serializer(target_format)
-    file_serializer.serialize(file_content, output_file_path)
+    output_file_path = args.outputFilePath or generate_output_filename(args.targetFormat)
+
+    file_serializer = FileConverterFactory.get_serializer(args.targetFormat)
+    profiler = StageProfiler() if args.profile or args.profileOutput else None
+    with ExitStack() as stack:
+        error_report = stack.enter_context(open(args.errorReport, 'w')) if args.errorReport else None
+        parallel = args.sourceFormat == FileTypes.CSV and not detect_compression(args.sourceFilePath)
+        if args.parallel and parallel and isinstance(file_serializer, FragmentSerializer):
+            # the stages run in the workers, only the total time is profiled
+            records = convert_csv_parallel(args.sourceFilePath, args.targetFormat, output_file_path,
+                                           args.workers, error_report)
+            if profiler:
+                profiler.records = records
+        else:
+            if args.parallel:
+                logger.warning('Only uncompressed CSV to text formats are converted in parallel, '
+                               'converting sequentially')
+            convert_file(args.sourceFilePath, args.sourceFormat, args.targetFormat, output_file_path,
+                         PersonSchema(), error_report, args.workers, profiler)
+
+    if args.profile:
+        print(profiler.report(), file=sys.stderr)
+    if args.profileOutput:
+        with open(args.profileOutput, 'w') as f:
+            json.dump(profiler.results(), f, indent=2)
 
 
 if __name__ == "__main__":
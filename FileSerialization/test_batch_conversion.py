@@ -0,0 +1,87 @@
+import json
+import os
+
+import pytest
+
+from batch_conversion import convert_batch
+from test_data_validator import PERSON
+
+
+@pytest.fixture
+def sources_dir(tmp_path):
+    sources = tmp_path / 'sources'
+    sources.mkdir()
+    for index in range(3):
+        (sources / f'persons{index}.json').write_text(json.dumps([dict(PERSON, age=index + 1)]))
+    (sources / 'broken.json').write_text('[{"id": ')
+    (sources / 'notes.txt').write_text('not a source')
+    return sources
+
+
+def test_batch_skips_unchanged_files(tmp_path, sources_dir):
+    # Arrange
+    output_dir = str(tmp_path / 'output')
+
+    # Act
+    first = convert_batch(str(sources_dir), 'csv', output_dir=output_dir, workers=2)
+    second = convert_batch(str(sources_dir / '*.json'), 'csv', output_dir=output_dir, workers=2)
+    (sources_dir / 'persons1.json').write_text(json.dumps([dict(PERSON, age=100)]))
+    os.utime(sources_dir / 'persons2.json')
+    third = convert_batch(str(sources_dir), 'csv', output_dir=output_dir, workers=2)
+
+    # Assert
+    assert first == {'converted': 3, 'skipped': 0, 'failed': 1, 'records': 3}
+    assert second == {'converted': 0, 'skipped': 3, 'failed': 1, 'records': 0}
+    assert third == {'converted': 1, 'skipped': 2, 'failed': 1, 'records': 1}
+    assert sorted(os.listdir(output_dir)) == [
+        '.conversion-manifest.json', 'persons0.csv', 'persons1.csv', 'persons2.csv',
+    ]
+    assert ',100,' in (tmp_path / 'output' / 'persons1.csv').read_text()
+
+
+def test_batch_writes_error_report_per_file(tmp_path, sources_dir):
+    # Arrange
+    (sources_dir / 'persons0.json').write_text(json.dumps([dict(PERSON, email='invalid')]))
+    reports_dir = tmp_path / 'reports'
+
+    # Act
+    convert_batch(str(sources_dir / 'persons*.json'), 'xml', output_dir=str(tmp_path / 'output'),
+                  workers=1, error_report_dir=str(reports_dir))
+
+    # Assert
+    report = [json.loads(line) for line in (reports_dir / 'persons0.errors.ndjson').read_text().splitlines()]
+    assert report == [{'record': 0, 'id': PERSON['id'], 'errors': {'email': ['Not a valid email address.']}}]
+    assert (reports_dir / 'persons1.errors.ndjson').read_text() == ''
+
+
+def test_batch_reports_sources_converted_to_the_same_output(tmp_path, sources_dir):
+    # Arrange
+    (sources_dir / 'persons0.xml').write_text('<persons />')
+    output_dir = tmp_path / 'output'
+
+    # Act
+    stats = convert_batch(str(sources_dir), 'csv', output_dir=str(output_dir), workers=2)
+
+    # Assert
+    assert stats == {'converted': 2, 'skipped': 0, 'failed': 3, 'records': 2}
+    assert sorted(os.listdir(output_dir)) == ['.conversion-manifest.json', 'persons1.csv', 'persons2.csv']
+
+
+def test_batch_next_to_sources_keeps_manifest_there_and_skips_its_outputs(tmp_path, sources_dir, monkeypatch):
+    # Arrange
+    monkeypatch.chdir(tmp_path)
+
+    # Act
+    to_csv = convert_batch(str(sources_dir / '*.json'), 'csv', workers=2)
+    to_xml = convert_batch(str(sources_dir), 'xml', workers=2)
+
+    # Assert
+    assert to_csv == {'converted': 3, 'skipped': 0, 'failed': 1, 'records': 3}
+    assert to_xml == {'converted': 3, 'skipped': 0, 'failed': 1, 'records': 3}
+    assert not os.path.exists(tmp_path / '.conversion-manifest.json')
+    assert sorted(os.listdir(sources_dir)) == [
+        '.conversion-manifest.json', 'broken.json', 'notes.txt',
+        'persons0.csv', 'persons0.json', 'persons0.xml',
+        'persons1.csv', 'persons1.json', 'persons1.xml',
+        'persons2.csv', 'persons2.json', 'persons2.xml',
+    ]
@@ -0,0 +1,57 @@
+import pytest
+
+from binary_format import BinaryRecordFile
+from data_conversion import FileConverterFactory
+
+PERSONS = [
+    {
+        'id': 'b7a1c8d2-57a5-4b07-9a3c-3f1f7d1ad4b1',
+        'firstName': 'Анна',
+        'age': 33,
+        'salary': 1200.5,
+        'address': None,
+        'entities': [{'id': '6f1d3e2b-2c47-4f1a-8f0e-1f2a3b4c5d6e', 'name': 'Acme'}],
+        'active': True,
+        'score': 2 ** 70,
+    },
+] + [{'id': str(index), 'firstName': f'P{index}', 'entities': []} for index in range(1, 100)]
+
+
+@pytest.fixture
+def binary_path(tmp_path):
+    path = str(tmp_path / 'persons.bin')
+    FileConverterFactory.get_serializer('bin').serialize(iter(PERSONS), path)
+    return path
+
+
+def test_binary_round_trip(binary_path):
+    # Act
+    with open(binary_path, 'rb') as f:
+        records = list(FileConverterFactory.get_deserializer('bin').deserialize(f))
+
+    # Assert
+    assert records == PERSONS
+
+
+def test_binary_random_access(binary_path):
+    # Act
+    with BinaryRecordFile(binary_path) as records:
+        count, first, last, middle = len(records), records[0], records[-1], records[40:43]
+
+        # Assert
+        with pytest.raises(IndexError):
+            records[len(PERSONS)]
+    assert count == len(PERSONS)
+    assert (first, last, middle) == (PERSONS[0], PERSONS[-1], PERSONS[40:43])
+
+
+@pytest.mark.parametrize('size', [0, 10, -10])
+def test_binary_rejects_truncated_file(tmp_path, binary_path, size):
+    # Arrange
+    truncated = tmp_path / 'truncated.bin'
+    with open(binary_path, 'rb') as f:
+        truncated.write_bytes(f.read()[:size])
+
+    # Act / Assert
+    with pytest.raises(ValueError, match='Not a binary records file'):
+        BinaryRecordFile(str(truncated))
@@ -0,0 +1,61 @@
+import gzip
+import shutil
+import threading
+
+import pytest
+
+from compression import detect_compression, open_file
+from data_conversion import FileConverterFactory
+from serialization_tool import read_source_file
+from test_binary_format import PERSONS
+
+
+@pytest.mark.parametrize('extension, compression', [('.gz', 'gzip'), ('.bz2', 'bz2'), ('.xz', 'xz')])
+@pytest.mark.parametrize('file_format', ['json', 'csv', 'xml', 'bin'])
+def test_compressed_round_trip(tmp_path, extension, compression, file_format):
+    # Arrange
+    path = str(tmp_path / f'persons.{file_format}{extension}')
+    persons = [{'id': person['id'], 'firstName': person['firstName']} for person in PERSONS]
+    deserializer = FileConverterFactory.get_deserializer(file_format)
+
+    # Act
+    FileConverterFactory.get_serializer(file_format).serialize(iter(persons), path)
+    with read_source_file(path, deserializer.binary) as source:
+        records = list(deserializer.deserialize(source))
+
+    # Assert
+    assert detect_compression(path) == compression
+    assert records == persons
+
+
+def test_compression_detected_by_content(tmp_path):
+    # Arrange
+    plain, compressed = tmp_path / 'persons.json', tmp_path / 'persons-export'
+    plain.write_text('[{"id": "1"}] ' * 200_000)
+    with open(plain, 'rb') as source, gzip.open(compressed, 'wb') as target:
+        shutil.copyfileobj(source, target)
+
+    # Act
+    with open_file(str(compressed), 'r') as f:
+        content = f.read()
+
+    # Assert
+    assert detect_compression(str(compressed)) == 'gzip'
+    assert detect_compression(str(plain)) is None
+    assert content == plain.read_text()
+
+
+def test_reader_closed_before_the_end_stops_its_thread(tmp_path):
+    # Arrange
+    path = tmp_path / 'large.txt.gz'
+    with gzip.open(path, 'wb') as f:
+        f.write(b'x' * 50_000_000)
+    threads = threading.active_count()
+
+    # Act
+    with open_file(str(path), 'rb') as f:
+        head = f.read(10)
+
+    # Assert
+    assert head == b'x' * 10
+    assert threading.active_count() == threads
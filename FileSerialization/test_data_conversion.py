@@ -0,0 +1,97 @@
+import io
+import json
+
+import pytest
+
+from data_conversion import CSVDeserializer, FileConverterFactory, JSONDeserializer, XMLDeserializer
+
+PERSONS = [
+    {
+        'id': 'b7a1c8d2-57a5-4b07-9a3c-3f1f7d1ad4b1',
+        'firstName': 'Ann',
+        'entities': [{'id': '6f1d3e2b-2c47-4f1a-8f0e-1f2a3b4c5d6e', 'name': 'Acme'}],
+    },
+    {
+        'id': '0c9a1f3e-8d2b-4e6f-a1b2-c3d4e5f6a7b8',
+        'firstName': 'Bob, "Jr"',
+        'entities': [],
+    },
+]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64 * 1024])
+def test_json_deserializer_streams_array_items(chunk_size):
+    # Arrange
+    source = io.StringIO(json.dumps(PERSONS + [12345, 1234.5, -6.25e-07, 'text', None], indent=2))
+
+    # Act
+    records = list(JSONDeserializer(chunk_size).deserialize(source))
+
+    # Assert
+    assert records == PERSONS + [12345, 1234.5, -6.25e-07, 'text', None]
+
+
+def test_json_deserializer_rejects_truncated_array():
+    # Arrange
+    source = io.StringIO(json.dumps(PERSONS)[:-20])
+
+    # Act / Assert
+    with pytest.raises(ValueError):
+        list(JSONDeserializer(chunk_size=16).deserialize(source))
+
+
+def test_xml_deserializer_keeps_entities():
+    # Arrange
+    source = io.StringIO(
+        '<persons>'
+        '<person><id>1</id><firstName>Ann</firstName>'
+        '<entities><entity><id>2</id><name>Acme</name></entity></entities></person>'
+        '<person><id>3</id><firstName>Bob</firstName></person>'
+        '</persons>'
+    )
+
+    # Act
+    records = list(XMLDeserializer().deserialize(source))
+
+    # Assert
+    assert records == [
+        {'id': '1', 'firstName': 'Ann', 'entities': [{'id': '2', 'name': 'Acme'}]},
+        {'id': '3', 'firstName': 'Bob'},
+    ]
+
+
+def test_csv_deserializer_reads_quoted_line_breaks():
+    # Arrange
+    source = io.StringIO('id,firstName\r\n1,"Ann\nMarie"\r\n2,Bob\r\n', newline='')
+
+    # Act
+    records = list(CSVDeserializer().deserialize(source))
+
+    # Assert
+    assert records == [{'id': '1', 'firstName': 'Ann\nMarie'}, {'id': '2', 'firstName': 'Bob'}]
+
+
+@pytest.mark.parametrize('file_format', ['json', 'xml'])
+def test_serializer_round_trip_from_generator(tmp_path, file_format):
+    # Arrange
+    path = str(tmp_path / f'persons.{file_format}')
+
+    # Act
+    written = FileConverterFactory.get_serializer(file_format).serialize(iter(PERSONS), path)
+    with open(path, newline='') as f:
+        records = list(FileConverterFactory.get_deserializer(file_format).deserialize(f))
+
+    # Assert
+    assert written == 2
+    assert records == PERSONS
+
+
+def test_json_serializer_matches_json_dump(tmp_path):
+    # Arrange
+    path = tmp_path / 'persons.json'
+
+    # Act
+    FileConverterFactory.get_serializer('json').serialize((person for person in PERSONS), str(path))
+
+    # Assert
+    assert path.read_text() == json.dumps(PERSONS)
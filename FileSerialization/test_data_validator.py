@@ -0,0 +1,74 @@
+import io
+import json
+
+import pytest
+
+from data_validator import PersonSchema, compile_schema, validate_records
+
+PERSON = {
+    'id': 'b7a1c8d2-57a5-4b07-9a3c-3f1f7d1ad4b1',
+    'firstName': 'Ann',
+    'lastName': 'Lee',
+    'dateOfBirth': '1990-01-02',
+    'email': 'ann@example.com',
+    'contactNumber': '+380501234567',
+    'age': 33,
+    'salary': '1200.50',
+    'address': 'Main st 1',
+    'entities': [{'id': '6f1d3e2b-2c47-4f1a-8f0e-1f2a3b4c5d6e', 'name': 'Acme'}],
+}
+
+CHANGES = [
+    {},
+    {'id': None}, {'id': 'x'}, {'id': 5}, {'id': '{B7A1C8D2-57A5-4B07-9A3C-3F1F7D1AD4B1}'},
+    {'firstName': 'x' * 51}, {'firstName': b'Ann'}, {'firstName': 1},
+    {'dateOfBirth': ''}, {'dateOfBirth': '02.01.1990'}, {'dateOfBirth': None},
+    {'email': 'ann'}, {'email': 5},
+    {'contactNumber': '1' * 31},
+    {'age': '33'}, {'age': '33.5'}, {'age': 33.0}, {'age': True}, {'age': 0}, {'age': '2000'},
+    {'salary': 1200}, {'salary': 'nan'}, {'salary': 'Infinity'}, {'salary': 'abc'}, {'salary': 1.5},
+    {'address': 'ab'},
+    {'entities': []}, {'entities': None}, {'entities': 'Acme'}, {'entities': [1, {'id': 'x'}]},
+    {'entities': [{'id': '6f1d3e2b-2c47-4f1a-8f0e-1f2a3b4c5d6e', 'name': 'Ac', 'extra': 1}]},
+    {'unknown': 1},
+]
+
+
+@pytest.mark.parametrize('change', CHANGES)
+def test_compiled_schema_matches_marshmallow(change):
+    # Arrange
+    schema = PersonSchema()
+    person = dict(PERSON, **change)
+
+    # Act
+    errors = compile_schema(schema)(person)
+
+    # Assert
+    assert errors == schema.validate(person)
+
+
+@pytest.mark.parametrize('missing_field', ['id', 'email', 'age'])
+def test_compiled_schema_reports_missing_fields(missing_field):
+    # Arrange
+    schema = PersonSchema()
+    person = {key: value for key, value in PERSON.items() if key != missing_field}
+
+    # Act / Assert
+    assert compile_schema(schema)(person) == schema.validate(person)
+    assert compile_schema(schema)([person]) == schema.validate([person])
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_validate_records_streams_errors_in_order(workers):
+    # Arrange
+    persons = [dict(PERSON, age=index % 200) for index in range(1, 501)]
+    report = io.StringIO()
+
+    # Act
+    validated = list(validate_records(iter(persons), PersonSchema(), report, workers, chunk_size=32))
+
+    # Assert
+    lines = [json.loads(line) for line in report.getvalue().splitlines()]
+    assert validated == persons
+    assert [line['record'] for line in lines] == [i for i, person in enumerate(persons) if not 1 <= person['age'] <= 150]
+    assert lines[0]['errors'] == {'age': ['Must be greater than or equal to 1 and less than or equal to 150.']}
@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+
+import pytest
+
+import parallel_conversion
+from data_conversion import FileConverterFactory
+from parallel_conversion import convert_csv_parallel, split_csv
+
+FIELDS = ['id', 'firstName', 'lastName', 'email', 'contactNumber', 'salary', 'address']
+
+
+@pytest.fixture
+def source_path(tmp_path):
+    path = tmp_path / 'persons.csv'
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        for index in range(300):
+            writer.writerow([
+                f'00000000-0000-4000-8000-{index:012d}',
+                f'Ann "{index}"',
+                'Lee\nJr' if index % 3 else 'Lee',
+                f'ann{index}@example.com' if index % 50 else 'invalid',
+                '123',
+                f'{index}.50',
+                'Main st, 1',
+            ])
+    return str(path)
+
+
+def test_split_csv_starts_ranges_at_rows(source_path):
+    # Act
+    fieldnames, ranges = split_csv(source_path, 16)
+
+    # Assert
+    with open(source_path, 'rb') as f:
+        content = f.read()
+    rows = [
+        row
+        for start, end in ranges
+        for row in csv.DictReader(io.StringIO(content[start:end].decode(), newline=''), fieldnames=fieldnames)
+    ]
+    assert fieldnames == FIELDS
+    assert len(ranges) == 16
+    assert rows == list(csv.DictReader(io.StringIO(content.decode(), newline='')))
+
+
+def test_split_csv_reads_header_without_line_break(tmp_path):
+    # Arrange
+    path = tmp_path / 'persons.csv'
+    path.write_text(','.join(FIELDS))
+
+    # Act
+    fieldnames, ranges = split_csv(str(path), 4)
+
+    # Assert
+    assert fieldnames == FIELDS
+    assert ranges == []
+
+
+@pytest.mark.parametrize('target_format', ['json', 'csv', 'xml'])
+def test_parallel_conversion_matches_sequential(monkeypatch, tmp_path, source_path, target_format):
+    # Arrange
+    monkeypatch.setattr(parallel_conversion, 'MIN_RANGE_SIZE', 1024)
+    expected_path, output_path = tmp_path / f'expected.{target_format}', tmp_path / f'output.{target_format}'
+    with open(source_path, newline='') as f:
+        records = FileConverterFactory.get_deserializer('csv').deserialize(f)
+        FileConverterFactory.get_serializer(target_format).serialize(records, str(expected_path))
+    report = io.StringIO()
+
+    # Act
+    count = convert_csv_parallel(source_path, target_format, str(output_path), workers=2, error_report=report)
+
+    # Assert
+    errors = [json.loads(line) for line in report.getvalue().splitlines()]
+    assert count == 300
+    assert output_path.read_bytes() == expected_path.read_bytes()
+    assert [error['record'] for error in errors] == list(range(0, 300, 50))
+    assert not [path for path in tmp_path.iterdir() if path.is_dir()]
+
+
+def test_binary_output_is_not_converted_in_parallel(tmp_path, source_path):
+    # Act / Assert
+    with pytest.raises(ValueError, match="can't be stitched"):
+        convert_csv_parallel(source_path, 'bin', str(tmp_path / 'output.bin'), workers=2)
@@ -0,0 +1,24 @@
+import json
+
+from data_validator import PersonSchema
+from profiling import STAGES, StageProfiler
+from serialization_tool import convert_file
+from test_data_validator import PERSON
+
+
+def test_profiler_times_every_stage(tmp_path):
+    # Arrange
+    source_path, output_path = tmp_path / 'persons.json', tmp_path / 'persons.xml'
+    source_path.write_text(json.dumps([PERSON] * 1000))
+    profiler = StageProfiler()
+
+    # Act
+    converted = convert_file(str(source_path), 'json', 'xml', str(output_path), PersonSchema(), profiler=profiler)
+
+    # Assert
+    results = profiler.results()
+    stages = sum(results[f'{stage}_seconds'] for stage in STAGES)
+    assert converted == results['records'] == 1000
+    assert all(results[f'{stage}_seconds'] > 0 for stage in STAGES)
+    assert stages <= results['total_seconds']
+    assert results['peak_rss_bytes'] > 0
@@ -0,0 +1,113 @@
+"""Rows/sec of turning `rates` rows into API JSON: legacy schema and path vs the compact one.
+
+Usage (from money_exchange_app/):
+    python -m benchmarks.bench_rate_decoding --rows 200000
+"""
+import datetime
+import json
+import os
+import random
+import sqlite3
+import time
+import uuid
+from argparse import ArgumentParser
+from dataclasses import asdict, dataclass, field
+from typing import Callable
+
+os.environ.setdefault('DB_CONNECTION_URL', ':memory:')
+os.environ.setdefault('CURRENCY_API_KEY', 'benchmark')
+os.environ.setdefault('CURRENCY_API_GET_RATES_URL', 'http://127.0.0.1:1/api/v1/rates')
+
+from src.dtos import Rate  # noqa: E402
+from src.rate_encoder import RateRowEncoder  # noqa: E402
+from src.settings import get_settings  # noqa: E402
+
+CURRENCIES = ['EUR', 'UAH', 'GBP', 'PLN', 'JPY', 'CHF', 'CAD', 'AUD', 'CZK', 'SEK']
+
+
+@dataclass
+class LegacyRate:
+    # Rate as it was before the compact schema: REAL rate, ISO timestamp string, 36-char uuid
+    baseCurrency: str
+    currency: str
+    rate: float
+    addDate: datetime.datetime = field(default_factory=datetime.datetime.now)
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+
+    def to_dict(self) -> dict[str, any]:
+        rate = asdict(self)
+        rate['addDate'] = rate['addDate'].strftime(get_settings().TIME_FORMAT)
+        return rate
+
+    @classmethod
+    def from_tuple(cls, t: tuple[str, str, str, float, str]) -> 'LegacyRate':
+        id_, base, currency, rate, timestamp = t
+        return cls(id=id_, baseCurrency=base, currency=currency, rate=rate,
+                   addDate=datetime.datetime.fromisoformat(timestamp))
+
+
+def seed(rows: int) -> tuple[sqlite3.Connection, sqlite3.Connection]:
+    legacy = sqlite3.connect(':memory:')
+    legacy.execute('CREATE TABLE rates(id STRING PRIMARY KEY NOT NULL, baseCurrency char(3) NOT NULL, '
+                   'currency char(3) NOT NULL, rate REAL NOT NULL, addDate TIMESTAMP NOT NULL)')
+    compact = sqlite3.connect(':memory:')
+    compact.execute('CREATE TABLE rates(id BLOB PRIMARY KEY NOT NULL, baseCurrency char(3) NOT NULL, '
+                    'currency char(3) NOT NULL, rate INTEGER NOT NULL, addDate INTEGER NOT NULL)')
+
+    start = datetime.datetime(2020, 1, 1)
+    rates = [
+        Rate(baseCurrency='USD', currency=CURRENCIES[i % len(CURRENCIES)], rate=round(random.uniform(0.1, 150), 4),
+             addDate=start + datetime.timedelta(minutes=i // len(CURRENCIES)))
+        for i in range(rows)
+    ]
+    legacy.executemany('INSERT INTO rates VALUES (?, ?, ?, ?, ?)',
+                       [(r.id, r.baseCurrency, r.currency, r.rate, r.addDate.isoformat(' ')) for r in rates])
+    compact.executemany('INSERT INTO rates (baseCurrency, currency, rate, addDate, id) VALUES (?, ?, ?, ?, ?)',
+                        [r.to_tuple() for r in rates])
+    return legacy, compact
+
+
+def measure(name: str, rows: int, run: Callable[[], any], repeat: int) -> float:
+    best = min(_timed(run) for _ in range(repeat))
+    rows_per_sec = rows / best
+    print(f'{name:<45} {best:8.3f}s {rows_per_sec:14,.0f} rows/sec')
+    return rows_per_sec
+
+
+def _timed(run: Callable[[], any]) -> float:
+    started = time.perf_counter()
+    run()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = ArgumentParser(description='Rates decoding/encoding benchmark')
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    legacy, compact = seed(args.rows)
+    select = 'SELECT id, baseCurrency, currency, rate, addDate FROM rates'
+    time_format = get_settings().TIME_FORMAT
+
+    def legacy_path() -> None:
+        # before: Rate per row, fromisoformat, asdict + strftime, json per dict
+        rates = [LegacyRate.from_tuple(row).to_dict() for row in legacy.execute(select)]
+        json.dumps(rates)
+
+    def objects_path() -> None:
+        rates = [Rate.from_tuple(row).to_dict() for row in compact.execute(select)]
+        json.dumps(rates)
+
+    def encoder_path() -> None:
+        encoder = RateRowEncoder(time_format)
+        '[' + ', '.join(encoder.encode(row) for row in compact.execute(select)) + ']'
+
+    before = measure('legacy schema, Rate + asdict + json', args.rows, legacy_path, args.repeat)
+    measure('compact schema, slots Rate + to_dict + json', args.rows, objects_path, args.repeat)
+    after = measure('compact schema, RateRowEncoder', args.rows, encoder_path, args.repeat)
+    print(f'speedup: {after / before:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
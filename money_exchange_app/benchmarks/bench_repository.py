@@ -0,0 +1,93 @@
+"""Micro-benchmarks of RateRepository/RollupRepository queries and Rate decoding/encoding on a seeded DB.
+
+Usage (from money_exchange_app/):
+    python -m benchmarks.seed --db /tmp/rates-1m.sqlite --rows 1000000
+    python -m benchmarks.bench_repository --db /tmp/rates-1m.sqlite --output repository.json
+"""
+import datetime
+import json
+import sqlite3
+from argparse import ArgumentParser
+from typing import Callable
+
+from benchmarks import common
+
+
+def build_cases(db_path: str, currency: str, page_size: int) -> dict[str, tuple[Callable[[], int], int]]:
+    # case -> (run, rows per run)
+    from src.dtos import Rate, RatesPage, RatesQuery
+    from src.rate_encoder import RateRowEncoder
+    from src.rate_repository import RateRepository
+    from src.rollup_repository import RollupRepository
+    from src.settings import get_settings
+    from src.tasks import db_setup
+
+    # a DB seeded by an older version is migrated first
+    db_setup.prepare_db()
+    repository, rollups = RateRepository(), RollupRepository()
+    connection = sqlite3.connect(db_path)
+    last_ts = connection.execute('SELECT max(addDate) FROM rates').fetchone()[0]
+    connection.close()
+    last = datetime.datetime.fromtimestamp(last_ts)
+    day_before = (last - datetime.timedelta(days=1)).strftime(get_settings().GET_RATES_QUERY_TIME_FORMAT)
+    month_before = last - datetime.timedelta(days=30)
+
+    sample_rows = [row[1:] for row in repository.iter_rows(RatesQuery(currency, None, None), RatesPage(limit=10_000))]
+    sample_rates = [Rate.from_tuple(row) for row in sample_rows]
+    time_format = get_settings().TIME_FORMAT
+
+    def count(rows) -> int:
+        return sum(1 for _ in rows)
+
+    return {
+        'first_page_unfiltered': (
+            lambda: count(repository.iter_rows(RatesQuery(None, None, None), RatesPage(limit=page_size))), page_size,
+        ),
+        'first_page_currency': (
+            lambda: count(repository.iter_rows(RatesQuery(currency, None, None), RatesPage(limit=page_size))),
+            page_size,
+        ),
+        'currency_last_day': (
+            lambda: count(repository.iter_rows(RatesQuery(currency, day_before, None), RatesPage())), 0,
+        ),
+        'latest_rates': (lambda: len(repository.get_latest_rates()), 0),
+        'rates_at_10_currencies': (
+            lambda: len(repository.get_rates_at('USD', common.currencies(10), month_before)), 10,
+        ),
+        'day_rollups_30_days': (lambda: len(rollups.get_rollups(currency, 'day', month_before)), 0),
+        'decode_rate_from_tuple': (lambda: count(Rate.from_tuple(row) for row in sample_rows), len(sample_rows)),
+        'encode_rate_to_dict_json': (
+            lambda: count(json.dumps(rate.to_dict()) for rate in sample_rates), len(sample_rates),
+        ),
+        'encode_row_encoder': (
+            lambda: count(map(RateRowEncoder(time_format).encode, sample_rows)), len(sample_rows),
+        ),
+    }
+
+
+def main() -> None:
+    parser = ArgumentParser(description='RateRepository and Rate micro-benchmarks')
+    parser.add_argument('--db', required=True, help='seeded SQLite file, see benchmarks.seed')
+    parser.add_argument('--currency', default='EUR')
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help='JSON file for the results')
+    args = parser.parse_args()
+
+    common.configure(args.db)
+    results = {}
+    for name, (run, rows) in build_cases(args.db, args.currency, args.page_size).items():
+        returned = run()
+        timings = common.time_calls(run, args.repeat)
+        result = common.percentiles(timings)
+        result['rows'] = rows or returned
+        result['rows_per_sec'] = result['rows'] / (result['mean_ms'] / 1000)
+        results[name] = result
+
+    common.print_table(results, ['p50_ms', 'p95_ms', 'p99_ms', 'rows', 'rows_per_sec'])
+    params = {**vars(args), 'db_stats': common.db_stats(args.db)}
+    common.save_results('repository', params, results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import time
+from typing import Callable
+
+# ISO codes first, synthetic ones fill the rest up to the requested number of currencies
+KNOWN_CURRENCIES = [
+    'EUR', 'UAH', 'GBP', 'PLN', 'JPY', 'CHF', 'CAD', 'AUD', 'CZK', 'SEK', 'NOK', 'DKK', 'HUF', 'RON', 'BGN',
+    'TRY', 'CNY', 'HKD', 'SGD', 'KRW', 'INR', 'BRL', 'MXN', 'ZAR', 'NZD', 'ILS', 'THB', 'IDR', 'MYR', 'PHP',
+]
+
+
+def configure(db_path: str) -> None:
+    # settings are read once per process: must run before anything imports `src`
+    os.environ['DB_CONNECTION_URL'] = db_path
+    os.environ.setdefault('CURRENCY_API_KEY', 'benchmark')
+    os.environ.setdefault('CURRENCY_API_GET_RATES_URL', 'http://127.0.0.1:1/api/v1/rates')
+
+
+def currencies(count: int) -> list[str]:
+    codes = list(KNOWN_CURRENCIES[:count])
+    i = 0
+    while len(codes) < count:
+        code = 'X' + chr(ord('A') + i // 26 % 26) + chr(ord('A') + i % 26)
+        if code not in codes:
+            codes.append(code)
+        i += 1
+    return codes
+
+
+def db_stats(db_path: str) -> dict[str, any]:
+    connection = sqlite3.connect(db_path)
+    try:
+        rows, first, last = connection.execute('SELECT count(*), min(addDate), max(addDate) FROM rates').fetchone()
+        currency_count = connection.execute('SELECT count(DISTINCT currency) FROM rates').fetchone()[0]
+    finally:
+        connection.close()
+    return {
+        'rows': rows,
+        'currencies': currency_count,
+        'first': datetime.datetime.fromtimestamp(first).isoformat() if first else None,
+        'last': datetime.datetime.fromtimestamp(last).isoformat() if last else None,
+        'size_bytes': os.path.getsize(db_path),
+    }
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    # nearest-rank percentiles, in milliseconds
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))] * 1000
+
+    return {
+        'p50_ms': rank(50),
+        'p95_ms': rank(95),
+        'p99_ms': rank(99),
+        'max_ms': ordered[-1] * 1000,
+        'mean_ms': statistics.fmean(ordered) * 1000,
+    }
+
+
+def time_calls(run: Callable[[], any], repeat: int, warmup: int = 1) -> list[float]:
+    for _ in range(warmup):
+        run()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def save_results(name: str, params: dict[str, any], results: dict[str, dict], output: str | None) -> dict:
+    report = {
+        'benchmark': name,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'params': params,
+        'results': results,
+    }
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'results saved to {output}')
+    return report
+
+
+def print_table(results: dict[str, dict], columns: list[str]) -> None:
+    print(f'{"case":<28}' + ''.join(f'{c:>14}' for c in columns))
+    for case, values in results.items():
+        cells = ''.join(f'{values.get(c, float("nan")):>14,.2f}' for c in columns)
+        print(f'{case:<28}' + cells)
@@ -0,0 +1,61 @@
+"""Compares two saved benchmark results (see common.save_results) and fails on regressions.
+
+Usage (from money_exchange_app/):
+    python -m benchmarks.compare baseline.json candidate.json --threshold 10
+"""
+import json
+import sys
+from argparse import ArgumentParser
+
+# metrics where a larger value is better, every other *_ms / *_s metric is a latency
+HIGHER_IS_BETTER = ('rows_per_sec', 'throughput_rps')
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> list[tuple[str, str, float, float, float, bool]]:
+    rows = []
+    for case, metrics in candidate['results'].items():
+        base_metrics = baseline['results'].get(case)
+        if not base_metrics:
+            continue
+        for metric, value in metrics.items():
+            base_value = base_metrics.get(metric)
+            if not _is_compared(metric) or not base_value or value is None:
+                continue
+            change = (value - base_value) / base_value * 100
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            rows.append((case, metric, base_value, value, change, worse > threshold))
+    return rows
+
+
+def _is_compared(metric: str) -> bool:
+    return metric in HIGHER_IS_BETTER or metric.endswith(('_ms', '_s'))
+
+
+def main() -> None:
+    parser = ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=10.0, help='allowed slowdown, percent')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    if baseline.get('benchmark') != candidate.get('benchmark'):
+        parser.error(f'different benchmarks: {baseline.get("benchmark")} vs {candidate.get("benchmark")}')
+
+    rows = compare(baseline, candidate, args.threshold)
+    print(f'{"case":<28}{"metric":<16}{"baseline":>14}{"candidate":>14}{"change":>10}')
+    for case, metric, base_value, value, change, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f'{case:<28}{metric:<16}{base_value:>14,.2f}{value:>14,.2f}{change:>+9.1f}%{flag}')
+
+    regressions = sum(1 for row in rows if row[-1])
+    if regressions:
+        print(f'{regressions} regression(s) past {args.threshold}%')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Concurrent HTTP load generator for the rates API, reports throughput and latency percentiles per query shape.
+
+Without --url it starts the app on a seeded DB in a separate process (so the generator doesn't share its GIL).
+
+Usage (from money_exchange_app/):
+    python -m benchmarks.load_test --db /tmp/rates-1m.sqlite --concurrency 16 --requests 2000 --output load.json
+    python -m benchmarks.load_test --url http://127.0.0.1:5000 --shapes latest,currency_page
+"""
+import datetime
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from argparse import SUPPRESS, ArgumentParser
+from urllib.parse import urlsplit
+
+from benchmarks import common
+
+
+def query_shapes(currency: str, other_currency: str, day: str) -> dict[str, str]:
+    return {
+        'unfiltered_page': '/api/rates?limit=1000',
+        'currency_page': f'/api/rates?currencyName={currency}&limit=1000',
+        'currency_day': f'/api/rates?currencyName={currency}&startDate={day}',
+        'latest': '/api/rates/latest',
+        'aggregate_day': f'/api/rates/aggregate?currencyName={currency}&interval=day',
+        'convert': f'/api/convert?fromCurrency={currency}&toCurrency={other_currency}&amount=100',
+    }
+
+
+def run_shape(host: str, port: int, path: str, concurrency: int, requests: int) -> dict[str, float]:
+    latencies, errors, lock = [], [0], threading.Lock()
+    remaining = iter(range(requests))
+
+    def worker() -> None:
+        # one keep-alive connection per worker
+        connection = http.client.HTTPConnection(host, port, timeout=60)
+        local, local_errors = [], 0
+        while next(remaining, None) is not None:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    local_errors += 1
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=60)
+            local.append(time.perf_counter() - started)
+        connection.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    result = common.percentiles(latencies)
+    result['requests'] = len(latencies)
+    result['errors'] = errors[0]
+    result['throughput_rps'] = len(latencies) / elapsed
+    return result
+
+
+def start_server(db_path: str, cache_size: int, workers: int, async_handlers: bool) -> tuple[subprocess.Popen, str]:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+
+    env = {
+        **os.environ,
+        'RESPONSE_CACHE_SIZE': str(cache_size),
+        'DB_CONNECTION_URL': db_path,
+        'SERVER_WORKERS': str(workers),
+        'SERVER_HOST': '127.0.0.1',
+        'SERVER_PORT': str(port),
+        'ASYNC_HANDLERS': 'true' if async_handlers else '',
+    }
+    env.setdefault('CURRENCY_API_KEY', 'benchmark')
+    env.setdefault('CURRENCY_API_GET_RATES_URL', 'http://127.0.0.1:1/api/v1/rates')
+    process = subprocess.Popen([sys.executable, '-m', 'benchmarks.load_test', '--serve'], env=env)
+
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, f'http://127.0.0.1:{port}'
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError('benchmark server exited')
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('benchmark server did not start')
+
+
+def serve() -> None:
+    import main
+
+    if main.settings.SERVER_WORKERS:
+        main.serve()
+        return
+    from werkzeug.serving import run_simple
+
+    run_simple(main.settings.SERVER_HOST, main.settings.SERVER_PORT, main.app, threaded=True)
+
+
+def main() -> None:
+    parser = ArgumentParser(description='Rates API load test')
+    parser.add_argument('--db', help='seeded SQLite file to serve, see benchmarks.seed')
+    parser.add_argument('--url', help='benchmark a running server instead of starting one')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=1000, help='requests per query shape')
+    parser.add_argument('--shapes', help='comma separated subset of the query shapes')
+    parser.add_argument('--currency', default='EUR')
+    parser.add_argument('--other-currency', default='GBP')
+    parser.add_argument('--cache-size', type=int, default=256, help='RESPONSE_CACHE_SIZE of the started server')
+    parser.add_argument('--output', help='JSON file for the results')
+    parser.add_argument('--workers', type=int, default=0, help='pre-forked workers of the started server')
+    parser.add_argument('--async-handlers', action='store_true', help='start the server with ASYNC_HANDLERS')
+    # internal: the started server process runs this module with --serve
+    parser.add_argument('--serve', action='store_true', help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve()
+        return
+    if not args.url and not args.db:
+        parser.error('either --db or --url is required')
+
+    process, url = (None, args.url) if args.url else start_server(
+        args.db, args.cache_size, args.workers, args.async_handlers,
+    )
+    try:
+        target = urlsplit(url)
+        day = (datetime.date.today() - datetime.timedelta(days=1)).isoformat()
+        shapes = query_shapes(args.currency, args.other_currency, day)
+        if args.shapes:
+            shapes = {name: shapes[name] for name in args.shapes.split(',')}
+
+        results = {}
+        for name, path in shapes.items():
+            results[name] = run_shape(target.hostname, target.port or 80, path, args.concurrency, args.requests)
+            print(f'{name}: {results[name]["throughput_rps"]:,.0f} req/s')
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    common.print_table(results, ['throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'errors'])
+    params = {key: value for key, value in vars(args).items() if key != 'serve'}
+    if args.db:
+        params['db_stats'] = common.db_stats(args.db)
+    common.save_results('load_test', params, results, args.output)
+
+
+if __name__ == '__main__':
+    main()
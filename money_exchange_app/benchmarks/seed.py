@@ -0,0 +1,96 @@
+"""Seeds a SQLite DB with synthetic rate history: one pull of every currency each `--step` seconds.
+
+Usage (from money_exchange_app/):
+    python -m benchmarks.seed --db /tmp/rates-1m.sqlite --rows 1000000 --currencies 150
+"""
+import datetime
+import math
+import random
+import sqlite3
+import time
+from argparse import ArgumentParser
+from typing import Iterator
+
+from benchmarks import common
+
+CHUNK_SIZE = 100_000
+
+
+def seed_db(
+        db_path: str,
+        rows: int,
+        currency_count: int = 150,
+        step: int = 300,
+        end: datetime.datetime | None = None,
+        rollups: bool = True,
+        seed: int = 42,
+) -> float:
+    """Creates the current schema at `db_path` and appends `rows` rates ending at `end`, returns rows/sec."""
+    common.configure(db_path)
+    from src.dtos import RATE_SCALE
+    from src.partition_repository import create_rates_indexes
+    from src.rollup_repository import RollupRepository
+    from src.tasks import db_setup
+
+    db_setup.prepare_db()
+
+    codes = common.currencies(currency_count)
+    pulls = math.ceil(rows / len(codes))
+    end_ts = int((end or datetime.datetime.now()).timestamp())
+    start_ts = end_ts - (pulls - 1) * step
+    rnd = random.Random(seed)
+
+    def generate() -> Iterator[tuple]:
+        # random walk per currency, rates rounded to 4 decimals like the puller stores them
+        levels = [rnd.uniform(0.5, 150) for _ in codes]
+        produced = 0
+        for pull in range(pulls):
+            timestamp = start_ts + pull * step
+            for i, code in enumerate(codes):
+                if produced == rows:
+                    return
+                levels[i] *= 1 + rnd.gauss(0, 0.001)
+                produced += 1
+                yield rnd.randbytes(16), 'USD', code, round(levels[i] * 10_000) * (RATE_SCALE // 10_000), timestamp
+
+    # bulk load: plain connection, indexes dropped during the load and rebuilt once at the end
+    connection = sqlite3.connect(db_path)
+    connection.execute('PRAGMA synchronous=OFF')
+    started = time.perf_counter()
+    connection.execute('DROP INDEX IF EXISTS rates_currency_add_date_idx')
+    connection.execute('DROP INDEX IF EXISTS rates_add_date_idx')
+    generator, inserted = generate(), 0
+    while chunk := [row for _, row in zip(range(CHUNK_SIZE), generator)]:
+        connection.executemany('INSERT INTO rates (id, baseCurrency, currency, rate, addDate) VALUES (?, ?, ?, ?, ?)',
+                               chunk)
+        connection.commit()
+        inserted += len(chunk)
+        print(f'\r{inserted:,}/{rows:,} rows', end='', flush=True)
+    print()
+    create_rates_indexes(connection.cursor(), 'rates')
+    connection.commit()
+    connection.close()
+    elapsed = time.perf_counter() - started
+
+    if rollups:
+        RollupRepository().rebuild()
+    return rows / elapsed
+
+
+def main() -> None:
+    parser = ArgumentParser(description='Seed a rates DB for benchmarks')
+    parser.add_argument('--db', required=True, help='SQLite file to create or append to')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--currencies', type=int, default=150)
+    parser.add_argument('--step', type=int, default=300, help='seconds between two pulls')
+    parser.add_argument('--no-rollups', action='store_true', help='skip rebuilding rate_rollups')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rows_per_sec = seed_db(args.db, args.rows, args.currencies, args.step, rollups=not args.no_rollups, seed=args.seed)
+    print(f'inserted at {rows_per_sec:,.0f} rows/sec')
+    print(common.db_stats(args.db))
+
+
+if __name__ == '__main__':
+    main()
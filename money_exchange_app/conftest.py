@@ -0,0 +1,38 @@
+import os
+import tempfile
+
+import pytest
+
+# settings are read once per process, point them to a throwaway DB before anything imports `src`
+os.environ.setdefault('DB_CONNECTION_URL', os.path.join(tempfile.mkdtemp(), 'rates.sqlite'))
+os.environ.setdefault('CURRENCY_API_KEY', 'test-key')
+os.environ.setdefault('CURRENCY_API_GET_RATES_URL', 'http://127.0.0.1:1/api/v1/rates')
+
+from src.clients import DBClient  # noqa: E402
+from src.partition_repository import PartitionRepository  # noqa: E402
+from src.settings import get_settings  # noqa: E402
+from src.tasks import db_setup  # noqa: E402
+
+
+@pytest.fixture
+def db_client() -> DBClient:
+    settings = get_settings()
+    db_setup.prepare_db()
+    client = DBClient(settings.DB_CONNECTION_URL, settings.DB_POOL_SIZE)
+    client.execute('DELETE FROM rates')
+    client.execute('DELETE FROM rate_rollups')
+    PartitionRepository().drop_all()
+    return client
+
+
+@pytest.fixture
+def client(db_client):
+    from main import app
+    from src.services import GetRatesService
+    from src.snapshot import LatestRatesSnapshot
+
+    # drop singletons holding in-process state (caches) between tests
+    GetRatesService._instance = None
+    LatestRatesSnapshot().load([])
+
+    return app.test_client()
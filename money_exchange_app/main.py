@@ -1,28 +1,96 @@
 import logging
+import os
+import time
+from functools import cache
+from typing import Callable
 
 from flask import Flask, Response
-from flask import request
+from flask import g, request
 
-from src.tasks import db_setup
+from src.clients import DBClient
+from src.tasks import db_setup, maintenance, rate_puller
+from src.metrics import HTTP_REQUEST_SECONDS
+from src.server import PreforkServer
+from src.settings import get_settings
+from src.snapshot import LatestRatesSnapshot
 from src.services import (
+    ABCService,
     GetRatesService,
+    GetLatestRatesService,
+    ConvertService,
+    GetRatesAggregateService,
+    MetricsService,
 )
 
 logging.basicConfig(level=logging.INFO)
 
-# NOTE: to not overcomplicate task, imagine that it works on schedule (from tasks queue, e.g. RabbitMQ/Amazon SQS, etc)
-# from src.tasks import rate_puller
-# rate_puller.pull_rates()
-
-db_setup.prepare_db()
+settings = get_settings()
 app = Flask(__name__)
 
 
-@app.get('/api/rates')
-def get_rates() -> Response:
-    service = GetRatesService()
-    return service.handle_request(request)
+@cache
+def prepare() -> None:
+    # schema migrations and the latest rates snapshot, once per process creating the app. pre-forked workers
+    # inherit it from the supervisor, a WSGI server should load the app before forking (gunicorn --preload)
+    db_setup.prepare_db()
+    LatestRatesSnapshot().refresh()
+
+
+def service_view(service_class: type[ABCService]) -> Callable[[], Response]:
+    if settings.ASYNC_HANDLERS:
+        # requires Flask[async]. under WSGI every request still holds its own server thread, Flask runs
+        # the coroutine to completion there: this mode adds no concurrency, HandlerPool only caps how many
+        # handlers run at once (HANDLER_THREADS)
+        async def view() -> Response:
+            return await service_class().handle_request_async(request)
+    else:
+        def view() -> Response:
+            return service_class().handle_request(request)
+    return view
+
+
+@app.before_request
+def start_request_timer() -> None:
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_latency(response: Response) -> Response:
+    # streamed bodies are produced after this point, their latency is time to first byte
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_REQUEST_SECONDS.labels(endpoint, request.method, str(response.status_code)).observe(
+        time.perf_counter() - g.request_started,
+    )
+    return response
+
+
+app.add_url_rule('/api/rates', 'get_rates', service_view(GetRatesService))
+app.add_url_rule('/api/rates/latest', 'get_latest_rates', service_view(GetLatestRatesService))
+app.add_url_rule('/api/rates/aggregate', 'get_rates_aggregate', service_view(GetRatesAggregateService))
+app.add_url_rule('/api/convert', 'convert', service_view(ConvertService), methods=['GET', 'POST'])
+app.add_url_rule('/metrics', 'get_metrics', service_view(MetricsService))
+prepare()
+
+
+def serve() -> None:
+    # pre-fork mode: prepared once on import, the DB pool is emptied so no connection crosses fork()
+    DBClient(settings.DB_CONNECTION_URL, settings.DB_POOL_SIZE).close()
+
+    def on_worker_start(index: int) -> None:
+        # a single puller for all workers, the others see its writes through the shared generation file
+        if index == 0:
+            rate_puller.schedule_pulling()
+            maintenance.schedule_maintenance()
+
+    PreforkServer(app, settings.SERVER_HOST, settings.SERVER_PORT, settings.SERVER_WORKERS, on_worker_start).run()
 
 
 if __name__ == '__main__':
-    app.run(host='localhost', port=5000, debug=True)
+    if settings.SERVER_WORKERS:
+        serve()
+    else:
+        # the debug reloader runs this module twice, pull rates on schedule only in the serving process
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            rate_puller.schedule_pulling()
+            maintenance.schedule_maintenance()
+        app.run(host=settings.SERVER_HOST, port=settings.SERVER_PORT, debug=True)
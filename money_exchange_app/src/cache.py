@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+
+class ResponseCache:
+    """LRU cache of encoded response bodies.
+
+    An entry is served only while it is younger than `ttl` seconds and was stored for the current
+    data generation, so a write to the rates table invalidates everything cached before it.
+    The cache holds at most `max_size` entries and `max_bytes` of bodies, a body larger than
+    `max_entry_bytes` (an unfiltered response grows with the table) is not stored at all.
+    """
+
+    def __init__(self, max_size: int, ttl: float, max_bytes: int, max_entry_bytes: int) -> None:
+        self._max_size = max_size
+        self._ttl = ttl
+        self._max_bytes = max_bytes
+        self._max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self._entries: OrderedDict[Hashable, tuple[int, float, bytes]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, generation: int) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_generation, expires_at, body = entry
+                if entry_generation == generation and expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return body
+                self._remove(key)
+
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, generation: int, body: bytes) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if len(body) > self._max_entry_bytes:
+                return
+            self._entries[key] = (generation, time.monotonic() + self._ttl, body)
+            self._bytes += len(body)
+            while len(self._entries) > self._max_size or self._bytes > self._max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, body = self._entries.pop(key)
+        self._bytes -= len(body)
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution.
+
+    The first caller runs `func`, callers arriving while it is in flight wait for its result
+    (or its exception) instead of running their own. Nothing is kept once the call is done.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key: Hashable, func: Callable[[], any]) -> tuple[any, bool]:
+        # returns the result and whether it was shared from another caller's execution
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def waiters(self, key: Hashable) -> int:
+        with self._lock:
+            call = self._calls.get(key)
+            return call.waiters if call else 0
@@ -1,13 +1,19 @@
+import datetime
 import logging
 from http import HTTPStatus
 from typing import Self
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from src.settings import Settings
 
 logger = logging.getLogger(__name__)
 
+RETRY_STATUSES = (HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.BAD_GATEWAY, HTTPStatus.SERVICE_UNAVAILABLE,
+                  HTTPStatus.GATEWAY_TIMEOUT)
+
 
 class InvalidAPIResponse(ValueError):
     pass
@@ -24,18 +30,33 @@ class CurrencyClient:
     def __init__(self, settings: Settings) -> None:
         self._base_currency = settings.BASE_CURRENCY
         self._get_rates_url = settings.CURRENCY_API_GET_RATES_URL
+        self._get_history_url = settings.CURRENCY_API_GET_HISTORY_URL or settings.CURRENCY_API_GET_RATES_URL
         self._api_key = settings.CURRENCY_API_KEY
+        self._timeout = settings.CURRENCY_API_TIMEOUT
+        # one keep-alive session for the client's lifetime, shared by concurrent pulls
+        if not hasattr(self, '_session'):
+            self._session = self._create_session(settings)
 
-    def get_rates(self) -> dict[str, any]:
-        # https://currencyapi.net/documentation
+    def get_rates(self, base_currency: str | None = None, date: datetime.date | None = None) -> dict[str, any]:
+        # https://currencyapi.net/documentation. with `date`: the rates of that day
 
         params = {
             'key': self._api_key,
-            'base': self._base_currency,
+            'base': base_currency or self._base_currency,
             'output': 'JSON',
         }
+        url = self._get_rates_url
+        if date:
+            params['date'] = date.isoformat()
+            url = self._get_history_url
+
+        try:
+            response = self._session.get(url, params=params, timeout=self._timeout)
+        except requests.RequestException as e:
+            msg = f'Currency API request failed. Error: {e}'
+            logger.error(msg)
+            raise InvalidAPIResponse(msg) from e
 
-        response = requests.get(self._get_rates_url, params=params)
         try:
             assert response.status_code == HTTPStatus.OK, \
                 f'Invalid API response: {response.status_code}, {response.text}'
@@ -49,3 +70,25 @@ class CurrencyClient:
             msg = f'Failed to parse API response. Response: {response.text}. Error: {e}'
             logger.error(msg)
             raise InvalidAPIResponse(msg) from e
+
+    def close(self) -> None:
+        self._session.close()
+
+    @staticmethod
+    def _create_session(settings: Settings) -> requests.Session:
+        retry = Retry(
+            total=settings.CURRENCY_API_RETRIES,
+            backoff_factor=0.5,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({'GET'}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=max(len(settings.BASE_CURRENCIES), settings.CURRENCY_API_CONCURRENCY, 1),
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
@@ -1,26 +1,148 @@
+import functools
 import logging
+import os
+import queue
 import sqlite3
-from typing import Self
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Iterator, Self
+
+from src.metrics import DB_QUERY_ROWS, DB_QUERY_SECONDS
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_POOL_SIZE = 5
+DEFAULT_ACQUIRE_TIMEOUT = 10.0
+
+# applied to every new connection. WAL lets readers run concurrently with the rate puller's writes,
+# NORMAL sync is durable enough in WAL mode and avoids an fsync per commit
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-16000',
+    'PRAGMA mmap_size=268435456',
+)
+
 
 class DBOperationError(Exception):
     pass
 
 
-class DBContextManager:
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections shared between threads.
 
-    def __init__(self, url: str) -> None:
+    Connections are created lazily up to `size` and handed out LIFO, so the hottest connection
+    (with a warm page cache and parsed schema) is reused first.
+    A SQLite connection must not be used across fork(): a forked worker starts with an empty pool.
+    """
+
+    def __init__(self, url: str, size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_ACQUIRE_TIMEOUT) -> None:
         self._url = url
+        self._size = size
+        self._timeout = timeout
+        self._inherited: list[sqlite3.Connection] = []
+        self._reset()
+        # runs in the child right after fork(), before any other thread exists there
+        os.register_at_fork(after_in_child=functools.partial(_reset_after_fork, weakref.ref(self)))
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self._size:
+                connection = self._connect()
+                self._created += 1
+                return connection
+
+        try:
+            return self._idle.get(timeout=self._timeout)
+        except queue.Empty as e:
+            msg = f'No free DB connection after {self._timeout}s (pool size: {self._size})'
+            logger.error(msg)
+            raise DBOperationError(msg) from e
+
+    def release(self, connection: sqlite3.Connection, broken: bool = False) -> None:
+        if self._pid != os.getpid():
+            # checked out before a fork, belongs to the parent
+            return
+        if broken:
+            self._discard(connection)
+            return
+        self._idle.put_nowait(connection)
+
+    def close(self) -> None:
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+    def _reset(self) -> None:
+        # connections inherited from the parent are kept referenced but never used or closed:
+        # closing one here (even by garbage collection) could checkpoint and remove the WAL the parent uses
+        if hasattr(self, '_idle'):
+            self._inherited.extend(self._idle.queue)
+        self._pid = os.getpid()
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue(maxsize=self._size)
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _discard(self, connection: sqlite3.Connection) -> None:
+        try:
+            connection.close()
+        finally:
+            with self._lock:
+                self._created -= 1
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self._url,
+            timeout=self._timeout,
+            check_same_thread=False,
+            cached_statements=256,
+        )
+        for pragma in CONNECTION_PRAGMAS:
+            connection.execute(pragma)
+        return connection
+
+
+class DBContextManager:
+
+    def __init__(self, pool: ConnectionPool) -> None:
+        self._pool = pool
         self._connection = None
 
     def __enter__(self) -> sqlite3.Cursor:
-        self._connection = sqlite3.connect(self._url)
+        self._connection = self._pool.acquire()
         return self._connection.cursor()
 
     def __exit__(self, exc_type: type, exc_val: Exception, exc_tb) -> bool:
-        self._connection.close()
+        if exc_type is GeneratorExit:
+            # a streaming reader stopped consuming rows early, that's not an error
+            exc_type = None
+        broken = False
+        try:
+            if exc_type:
+                self._connection.rollback()
+            elif self._connection.in_transaction:
+                self._connection.commit()
+        except sqlite3.Error as e:
+            logger.error(f'Failed to finish DB transaction, dropping connection. Error: {e}')
+            broken = True
+        self._pool.release(self._connection, broken=broken)
+        self._connection = None
+
         if exc_type:
             msg = f'SQL operaion error. Error: {exc_type}: {exc_val}'
             logger.error(msg)
@@ -37,25 +159,84 @@ class DBClient:
             cls._instance = super().__new__(cls)
         return cls._instance
 
-    def __init__(self, connect_url: str) -> None:
+    def __init__(self, connect_url: str, pool_size: int = DEFAULT_POOL_SIZE) -> None:
+        # the client is a singleton, keep the pool (and its warm connections) between instantiations
+        if getattr(self, '_connect_url', None) == connect_url:
+            return
+        if getattr(self, '_pool', None) is not None:
+            self._pool.close()
+
         self._connect_url = connect_url
+        self._pool = ConnectionPool(connect_url, pool_size)
 
-    def execute(self, statement: str, values: tuple | None = None) -> list[tuple] | None:
-        with DBContextManager(self._connect_url) as cursor:
-            if values:
-                # write operations
-                ex_res = cursor.execute(statement, values)
-                cursor.connection.commit()
-            else:
-                # read operations
-                ex_res = cursor.execute(statement)
-            res = ex_res.fetchall()
+    def execute(self, statement: str, values: tuple = ()) -> list[tuple] | None:
+        # values are always bound, never interpolated, so the connection's statement cache is reused.
+        # write operations are committed when the connection goes back to the pool
+        started = time.perf_counter()
+        with DBContextManager(self._pool) as cursor:
+            res = cursor.execute(statement, values).fetchall()
+            row_count = len(res) or max(cursor.rowcount, 0)
 
+        _record(statement, started, row_count)
         return res
 
     def executemany(self, statement: str, values: list[tuple]) -> list[tuple]:
-        with DBContextManager(self._connect_url) as cursor:
+        started = time.perf_counter()
+        with DBContextManager(self._pool) as cursor:
             res = cursor.executemany(statement, values)
             cursor.connection.commit()
             res = res.fetchall()
+            row_count = max(cursor.rowcount, 0)
+
+        _record(statement, started, row_count)
         return res
+
+    def iterate(self, statement: str, values: tuple = (), batch_size: int = 1000) -> Iterator[tuple]:
+        # keeps a pooled connection checked out until the rows are consumed (or the generator is closed).
+        # only the time spent in SQLite is recorded, not the time the consumer holds the rows
+        elapsed, row_count = 0.0, 0
+        try:
+            with DBContextManager(self._pool) as cursor:
+                started = time.perf_counter()
+                cursor.execute(statement, values)
+                rows = cursor.fetchmany(batch_size)
+                elapsed += time.perf_counter() - started
+                while rows:
+                    row_count += len(rows)
+                    yield from rows
+                    started = time.perf_counter()
+                    rows = cursor.fetchmany(batch_size)
+                    elapsed += time.perf_counter() - started
+        finally:
+            DB_QUERY_SECONDS.labels(_operation(statement)).observe(elapsed)
+            DB_QUERY_ROWS.labels(_operation(statement)).inc(row_count)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        # several statements committed (or rolled back) together on one pooled connection
+        started = time.perf_counter()
+        with DBContextManager(self._pool) as cursor:
+            cursor.execute('BEGIN')
+            yield cursor
+        DB_QUERY_SECONDS.labels('transaction').observe(time.perf_counter() - started)
+
+    def close(self) -> None:
+        self._pool.close()
+
+
+def _reset_after_fork(pool_ref: weakref.ref) -> None:
+    pool = pool_ref()
+    if pool is not None:
+        pool._reset()
+
+
+def _operation(statement: str) -> str:
+    # statement kind (select, insert, ...) keeps the metric labels low-cardinality
+    words = statement.split(None, 1)
+    return words[0].lower() if words else 'unknown'
+
+
+def _record(statement: str, started: float, row_count: int) -> None:
+    operation = _operation(statement)
+    DB_QUERY_SECONDS.labels(operation).observe(time.perf_counter() - started)
+    DB_QUERY_ROWS.labels(operation).inc(row_count)
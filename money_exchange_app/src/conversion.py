@@ -0,0 +1,112 @@
+import datetime
+import threading
+from collections import defaultdict
+from typing import Self
+
+import numpy as np
+
+from .dtos import Conversion
+from .rate_repository import RateRepository
+from .settings import get_settings
+from .snapshot import LatestRatesSnapshot
+
+
+class UnknownCurrency(ValueError):
+    pass
+
+
+class ConversionEngine:
+    """Converts amounts between any two currencies through the stored BASE_CURRENCY rates.
+
+    Latest conversions use a dense cross-rate matrix, `matrix[i, j]` being the amount of currency `j`
+    for one unit of currency `i`. The matrix is rebuilt only when the latest rates snapshot changes,
+    i.e. after a pull. Historical conversions use the nearest prior stored rates.
+    """
+    _instance: Self = None
+
+    def __new__(cls, *args, **kwargs) -> 'ConversionEngine':
+        if not cls._instance:
+            cls._instance = super().__new__(cls)
+            cls._instance._state = None
+            cls._instance._lock = threading.Lock()
+        return cls._instance
+
+    def __init__(self) -> None:
+        self._base_currency = get_settings().BASE_CURRENCY
+        self._snapshot = LatestRatesSnapshot()
+
+    def get_matrix(self) -> tuple[list[str], np.ndarray]:
+        _, currencies, matrix = self._get_state()
+        return list(currencies), matrix
+
+    def convert(self, conversions: list[Conversion]) -> list[Conversion]:
+        latest, historical = [], defaultdict(list)
+        for conversion in conversions:
+            if conversion.date:
+                historical[conversion.date].append(conversion)
+            else:
+                latest.append(conversion)
+
+        if latest:
+            self._convert_latest(latest)
+        for date, at_date in historical.items():
+            self._convert_at(date, at_date)
+        return conversions
+
+    def _convert_latest(self, conversions: list[Conversion]) -> None:
+        indexes, _, matrix = self._get_state()
+        self._check_known(conversions, indexes)
+
+        from_idx = np.fromiter((indexes[c.fromCurrency] for c in conversions), dtype=np.intp, count=len(conversions))
+        to_idx = np.fromiter((indexes[c.toCurrency] for c in conversions), dtype=np.intp, count=len(conversions))
+        self._apply(conversions, matrix[from_idx, to_idx])
+
+    def _convert_at(self, date: datetime.datetime, conversions: list[Conversion]) -> None:
+        currencies = {c.fromCurrency for c in conversions} | {c.toCurrency for c in conversions}
+        currencies.discard(self._base_currency)
+        rates = RateRepository().get_rates_at(self._base_currency, sorted(currencies), date)
+        rates[self._base_currency] = 1.0
+        self._check_known(conversions, rates)
+
+        from_rates = np.fromiter((rates[c.fromCurrency] for c in conversions), dtype=float, count=len(conversions))
+        to_rates = np.fromiter((rates[c.toCurrency] for c in conversions), dtype=float, count=len(conversions))
+        self._apply(conversions, to_rates / from_rates)
+
+    @staticmethod
+    def _apply(conversions: list[Conversion], cross_rates: np.ndarray) -> None:
+        amounts = np.fromiter((c.amount for c in conversions), dtype=float, count=len(conversions))
+        results = amounts * cross_rates
+        for conversion, rate, result in zip(conversions, cross_rates.tolist(), results.tolist()):
+            conversion.rate = rate
+            conversion.result = result
+
+    @staticmethod
+    def _check_known(conversions: list[Conversion], known: dict[str, any]) -> None:
+        unknown = {c.fromCurrency for c in conversions if c.fromCurrency not in known}
+        unknown |= {c.toCurrency for c in conversions if c.toCurrency not in known}
+        if unknown:
+            raise UnknownCurrency(f'No rates for: {", ".join(sorted(unknown))}')
+
+    def _get_state(self) -> tuple[dict[str, int], tuple[str, ...], np.ndarray]:
+        version = self._snapshot.version
+        state = self._state
+        if state is None or state[0] != version:
+            with self._lock:
+                state = self._state
+                if state is None or state[0] != version:
+                    state = self._state = (version, *self._build())
+        return state[1:]
+
+    def _build(self) -> tuple[dict[str, int], tuple[str, ...], np.ndarray]:
+        rates = {
+            rate.currency: rate.rate
+            for rate in self._snapshot.get_rates(base_currency=self._base_currency)
+            if rate.rate > 0
+        }
+        rates[self._base_currency] = 1.0
+
+        currencies = tuple(sorted(rates))
+        vector = np.array([rates[c] for c in currencies], dtype=float)
+        matrix = np.outer(1 / vector, vector)
+        indexes = {currency: i for i, currency in enumerate(currencies)}
+        return indexes, currencies, matrix
@@ -1,12 +1,21 @@
 import datetime
 import uuid
-from dataclasses import dataclass, field, astuple, asdict
+from dataclasses import dataclass, field, asdict
 from typing import Self
 
 from .settings import get_settings
 
+# rates are stored as fixed-point integers: rate * RATE_SCALE
+RATE_SCALE = 1_000_000
 
-@dataclass
+
+def format_uuid(id_bytes: bytes) -> str:
+    # ids are stored as 16 raw bytes, same output as str(uuid.UUID(bytes=...)) without building a UUID
+    h = id_bytes.hex()
+    return f'{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}'
+
+
+@dataclass(slots=True)
 class Rate:
     baseCurrency: str
     currency: str
@@ -15,24 +24,33 @@ class Rate:
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
 
     def to_tuple(self) -> tuple[any, ...]:
-        return astuple(self)
+        # DB form: fixed-point rate, unix timestamp and raw uuid bytes
+        return (
+            self.baseCurrency,
+            self.currency,
+            round(self.rate * RATE_SCALE),
+            int(self.addDate.timestamp()),
+            uuid.UUID(self.id).bytes,
+        )
 
     def to_dict(self) -> dict[str, any]:
-        # todo: mb make sqlite DB convertor instead ?
-        rate = asdict(self)
-        timestamp_str = rate['addDate'].strftime(get_settings().TIME_FORMAT)
-        rate['addDate'] = timestamp_str
-        return rate
+        return {
+            'baseCurrency': self.baseCurrency,
+            'currency': self.currency,
+            'rate': self.rate,
+            'addDate': self.addDate.strftime(get_settings().TIME_FORMAT),
+            'id': self.id,
+        }
 
     @classmethod
-    def from_tuple(cls, t: tuple[str, str, str, float, str]) -> Self:
+    def from_tuple(cls, t: tuple[bytes, str, str, int, int]) -> Self:
         id_, base, currency, rate, timestamp = t
         return cls(
-            id=id_,
+            id=format_uuid(id_),
             baseCurrency=base,
             currency=currency,
-            rate=rate,
-            addDate=datetime.datetime.fromisoformat(timestamp),
+            rate=rate / RATE_SCALE,
+            addDate=datetime.datetime.fromtimestamp(timestamp),
         )
 
 
@@ -44,3 +62,108 @@ class RatesQuery:
 
     def to_dict(self) -> dict[str, any]:
         return asdict(self)
+
+    def normalize(self) -> Self:
+        # only the first word of every value is used by the repository, blank values mean "not set"
+        values = {}
+        for name, value in self.to_dict().items():
+            words = value.split() if value else None
+            values[name] = words[0] if words else None
+        return RatesQuery(**values)
+
+
+@dataclass
+class RatesPage:
+    limit: int | None = None
+    # keyset of the last row of the previous page: (addDate, rowid)
+    after: tuple[int, int] | None = None
+
+    @staticmethod
+    def encode_cursor(add_date: int, row_id: int) -> str:
+        return f'{add_date}-{row_id}'
+
+    @classmethod
+    def from_values(cls, limit: str | None, after: str | None) -> Self:
+        page = cls()
+        if limit:
+            try:
+                page.limit = int(limit)
+            except ValueError as e:
+                raise ValueError(f'Invalid limit: {limit}') from e
+            if page.limit < 1:
+                raise ValueError(f'Invalid limit: {limit}')
+        if after:
+            try:
+                add_date, row_id = after.rsplit('-', 1)
+                page.after = (int(add_date), int(row_id))
+            except ValueError as e:
+                raise ValueError(f'Invalid cursor: {after}') from e
+        return page
+
+
+@dataclass
+class Conversion:
+    fromCurrency: str
+    toCurrency: str
+    amount: float
+    # convert at the rates known at that moment instead of the latest ones
+    date: datetime.datetime | None = None
+    rate: float | None = None
+    result: float | None = None
+
+    def to_dict(self) -> dict[str, any]:
+        conversion = asdict(self)
+        if self.date:
+            conversion['date'] = self.date.strftime(get_settings().TIME_FORMAT)
+        return conversion
+
+
+@dataclass
+class RateRollup:
+    baseCurrency: str
+    currency: str
+    interval: str
+    # start of the bucket, UTC
+    bucket: datetime.datetime
+    open: float
+    close: float
+    min: float
+    max: float
+    avg: float
+    count: int
+
+    def to_dict(self) -> dict[str, any]:
+        rollup = asdict(self)
+        rollup['bucket'] = self.bucket.strftime(get_settings().TIME_FORMAT)
+        return rollup
+
+    @classmethod
+    def from_tuple(cls, t: tuple[str, str, str, int, float, float, float, float, float, int]) -> Self:
+        interval, base, currency, bucket, open_, close, min_, max_, rate_sum, count = t
+        return cls(
+            baseCurrency=base,
+            currency=currency,
+            interval=interval,
+            bucket=datetime.datetime.fromtimestamp(bucket, tz=datetime.timezone.utc),
+            open=open_,
+            close=close,
+            min=min_,
+            max=max_,
+            avg=rate_sum / count,
+            count=count,
+        )
+
+
+@dataclass
+class RatePartition:
+    # a month of rates history moved out of the `rates` table, see PartitionRepository
+    name: str
+    monthStart: int
+    monthEnd: int
+    # seconds between kept points once downsampled, 0 for raw data
+    resolution: int = 0
+
+    @classmethod
+    def from_tuple(cls, t: tuple[str, int, int, int]) -> Self:
+        name, month_start, month_end, resolution = t
+        return cls(name=name, monthStart=month_start, monthEnd=month_end, resolution=resolution)
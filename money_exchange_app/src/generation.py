@@ -0,0 +1,38 @@
+import fcntl
+import mmap
+import os
+import struct
+import threading
+
+_COUNTER = struct.Struct('q')
+
+
+class SharedGeneration:
+    """The data generation of a DB, shared by every process on the host through a memory-mapped file.
+
+    The file sits next to the DB (`<db>-generation`, like SQLite's own `-wal` and `-shm` files). Reading the
+    generation is a plain memory read: no query and no system call. Pre-forked workers, the puller and the
+    maintenance and bulk CLIs all map the same file, so a write in any of them is seen by all the others.
+    The `rates_generation` row stays the value stored on disk, writers publish what they stored there
+    once their transaction has committed.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self._fd).st_size < _COUNTER.size:
+            os.ftruncate(self._fd, _COUNTER.size)
+        self._map = mmap.mmap(self._fd, _COUNTER.size)
+        self._lock = threading.Lock()
+
+    def get(self) -> int:
+        return _COUNTER.unpack_from(self._map)[0]
+
+    def publish(self, generation: int) -> None:
+        # the counter never goes back: two writers commit in one order but may publish in the other
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                if generation > self.get():
+                    _COUNTER.pack_into(self._map, 0, generation)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
@@ -0,0 +1,186 @@
+import threading
+from bisect import bisect_left
+from typing import Callable
+
+# seconds, tuned for in-process SQLite queries and sub-second HTTP requests
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _CounterValue:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name: str, labels: str) -> list[str]:
+        return [f'{name}{labels} {self.value}']
+
+
+class _HistogramValue:
+    __slots__ = ('_bounds', '_counts', '_sum', '_lock')
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self._bounds = bounds
+        # the last slot is the +Inf bucket
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    def samples(self, name: str, labels: str) -> list[str]:
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+
+        lines, cumulative = [], 0
+        for bound, count in zip(self._bounds + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{name}_bucket{_merge_labels(labels, f"le={_quote(le)}")} {cumulative}')
+        lines.append(f'{name}_sum{labels} {total}')
+        lines.append(f'{name}_count{labels} {cumulative}')
+        return lines
+
+
+class Metric:
+    type_name = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children: dict[tuple[str, ...], any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> any:
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f'{self.name}: expected labels {self.labelnames}, got {values}')
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        for values, child in sorted(self._children.items()):
+            labels = ','.join(f'{n}={_quote(v)}' for n, v in zip(self.labelnames, values))
+            lines.extend(child.samples(self.name, f'{{{labels}}}' if labels else ''))
+        return lines
+
+    def _new_child(self) -> any:
+        raise NotImplementedError()
+
+
+class Counter(Metric):
+    type_name = 'counter'
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _new_child(self) -> _CounterValue:
+        return _CounterValue()
+
+
+class Histogram(Metric):
+    type_name = 'histogram'
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: tuple[str, ...] = (),
+            buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self._buckets)
+
+
+class CallbackMetric(Metric):
+    """Value read at scrape time, for state that is already tracked elsewhere (cache stats, pool size)."""
+
+    def __init__(self, name: str, documentation: str, type_name: str, callback: Callable[[], float]) -> None:
+        super().__init__(name, documentation)
+        self.type_name = type_name
+        self._callback = callback
+
+    def render(self) -> list[str]:
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.type_name}',
+            f'{self.name} {float(self._callback())}',
+        ]
+
+
+class MetricsRegistry:
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        # re-registering a name replaces the metric, e.g. when a singleton owning a callback is re-created
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        # Prometheus text exposition format 0.0.4
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def _quote(value: str) -> str:
+    escaped = str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+    return f'"{escaped}"'
+
+
+def _merge_labels(labels: str, extra: str) -> str:
+    if not labels:
+        return f'{{{extra}}}'
+    return f'{labels[:-1]},{extra}}}'
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'Time to produce a response, per endpoint.', ('endpoint', 'method', 'status'),
+))
+DB_QUERY_SECONDS = REGISTRY.register(Histogram(
+    'db_query_duration_seconds', 'Time spent in SQLite per statement kind.', ('operation',),
+))
+DB_QUERY_ROWS = REGISTRY.register(Counter(
+    'db_query_rows_total', 'Rows returned or affected per statement kind.', ('operation',),
+))
+RATES_SERIALIZATION_SECONDS = REGISTRY.register(Histogram(
+    'rates_serialization_duration_seconds', 'Time spent encoding /api/rates rows to JSON, per response.',
+))
+RATE_PULLS = REGISTRY.register(Counter(
+    'rate_pulls_total', 'Rate pulls from the currency API by result.', ('result',),
+))
+RATE_PULL_SECONDS = REGISTRY.register(Histogram(
+    'rate_pull_duration_seconds', 'Duration of a rate pull, API calls and DB write included.',
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+))
+RATE_PULLED_ROWS = REGISTRY.register(Counter(
+    'rate_pulled_rows_total', 'Rates stored by the puller.',
+))
@@ -0,0 +1,186 @@
+import datetime
+import sqlite3
+
+from .dtos import RatePartition
+from .clients import DBClient
+from .settings import get_settings
+
+RATE_COLUMNS = 'id, baseCurrency, currency, rate, addDate'
+PARTITION_COLUMNS = 'name, monthStart, monthEnd, resolution'
+
+# only the last point of each (baseCurrency, currency, resolution bucket) survives downsampling,
+# so the latest rate of every pair is always kept
+DOWNSAMPLE_STATEMENT = """
+    DELETE FROM {table} WHERE rowid NOT IN (
+        SELECT kept FROM (
+            SELECT rowid AS kept, max(addDate) FROM {table}
+            GROUP BY baseCurrency, currency, addDate - addDate % :resolution
+        )
+    )
+    """
+
+
+def month_start(timestamp: int) -> int:
+    date = datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
+    return int(datetime.datetime(date.year, date.month, 1, tzinfo=datetime.timezone.utc).timestamp())
+
+
+def add_months(timestamp: int, months: int) -> int:
+    # `timestamp` must be a month start
+    date = datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
+    year, month = divmod(date.year * 12 + date.month - 1 + months, 12)
+    return int(datetime.datetime(year, month + 1, 1, tzinfo=datetime.timezone.utc).timestamp())
+
+
+def partition_name(timestamp: int) -> str:
+    return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc).strftime('rates_%Y%m')
+
+
+def rates_source(tables: list[str]) -> str:
+    # a FROM clause over several rates tables. rowids are unique across them, rows keep theirs when archived
+    if len(tables) == 1:
+        return tables[0]
+    arms = ' UNION ALL '.join(f'SELECT rowid AS rowid, {RATE_COLUMNS} FROM {table}' for table in tables)
+    return f'({arms})'
+
+
+def get_partition_tables(cursor: sqlite3.Cursor, start: int, end: int) -> list[str]:
+    # partitions overlapping [start, end] read inside the cursor's transaction, oldest first
+    statement = 'SELECT name from rate_partitions WHERE monthEnd > ? AND monthStart <= ? ORDER BY monthStart'
+    return [name for name, in cursor.execute(statement, (start, end))]
+
+
+def create_rates_table(cursor: sqlite3.Cursor, table: str) -> None:
+    # addDate is stored as an integer unix timestamp: compact and usable for index range scans.
+    # rate is fixed-point (see dtos.RATE_SCALE) and id holds the 16 raw uuid bytes
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table}(
+            id BLOB PRIMARY KEY NOT NULL,
+            baseCurrency char(3) NOT NULL,
+            currency char(3) NOT NULL,
+            rate INTEGER NOT NULL,
+            addDate INTEGER NOT NULL
+        )
+        """)
+
+
+def create_rates_indexes(cursor: sqlite3.Cursor, table: str) -> None:
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {table}_currency_add_date_idx ON {table} (currency, addDate)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {table}_add_date_idx ON {table} (addDate)')
+
+
+def drop_rates_indexes(cursor: sqlite3.Cursor, table: str) -> None:
+    cursor.execute(f'DROP INDEX IF EXISTS {table}_currency_add_date_idx')
+    cursor.execute(f'DROP INDEX IF EXISTS {table}_add_date_idx')
+
+
+def enable_incremental_vacuum(cursor: sqlite3.Cursor) -> None:
+    # auto_vacuum only changes through a VACUUM once the file exists (the pool's WAL switch creates it),
+    # and VACUUM can't run in a transaction: the cursor's one is committed first
+    cursor.connection.commit()
+    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    cursor.execute('VACUUM')
+
+
+def create_partitions_table(cursor: sqlite3.Cursor) -> None:
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rate_partitions(
+            name TEXT PRIMARY KEY NOT NULL,
+            monthStart INTEGER NOT NULL,
+            monthEnd INTEGER NOT NULL,
+            resolution INTEGER NOT NULL DEFAULT 0
+        )
+        """)
+
+
+class PartitionRepository:
+    """Monthly partitions of the rates history.
+
+    `rates` keeps the recent (hot) months and receives every insert. Older months are moved to one
+    `rates_YYYYMM` table each, with the same columns, indexes and rowids. Readers pick the tables
+    overlapping their date range via get_tables().
+    """
+    __slots__ = ('_db_client',)
+
+    def __init__(self) -> None:
+        settings = get_settings()
+
+        self._db_client = DBClient(settings.DB_CONNECTION_URL, settings.DB_POOL_SIZE)
+
+    def get_partitions(self, start: int | None = None, end: int | None = None) -> list[RatePartition]:
+        # partitions overlapping [start, end], oldest first
+        ands, values = [], []
+        if start is not None:
+            ands.append('monthEnd > ?')
+            values.append(start)
+        if end is not None:
+            ands.append('monthStart <= ?')
+            values.append(end)
+
+        where = f'WHERE {" AND ".join(ands)}' if ands else ''
+        statement = f'SELECT {PARTITION_COLUMNS} from rate_partitions {where} ORDER BY monthStart'
+        rows = self._db_client.execute(statement, tuple(values))
+        return [RatePartition.from_tuple(row) for row in rows]
+
+    def get_tables(self, start: int | None = None, end: int | None = None) -> list[str]:
+        # the hot table is always read: it may still hold rows of any month until they are archived
+        return [partition.name for partition in self.get_partitions(start, end)] + ['rates']
+
+    def get_oldest_archivable(self, before: int) -> int | None:
+        # the row with the highest rowid is never archived, so a new insert can't reuse the rowid of a moved row
+        statement = 'SELECT min(addDate) from rates WHERE addDate < ? AND rowid < (SELECT max(rowid) from rates)'
+        timestamp = self._db_client.execute(statement, (before,))[0][0]
+        return month_start(timestamp) if timestamp is not None else None
+
+    def archive_month(self, start: int) -> int:
+        # moves the month's rows from `rates` to its partition in one transaction, readers see them in either place
+        end = add_months(start, 1)
+        table = partition_name(start)
+        where = 'WHERE addDate >= ? AND addDate < ? AND rowid < (SELECT max(rowid) from rates)'
+        with self._db_client.transaction() as cursor:
+            create_rates_table(cursor, table)
+            cursor.execute(
+                f'INSERT INTO {table} (rowid, {RATE_COLUMNS}) SELECT rowid, {RATE_COLUMNS} from rates {where}',
+                (start, end),
+            )
+            moved = cursor.rowcount
+            cursor.execute(f'DELETE from rates {where}', (start, end))
+            # created after the bulk insert, cheaper than maintaining them row by row
+            create_rates_indexes(cursor, table)
+            # rows moved into an already downsampled partition (a late import, a backfill) are at full resolution:
+            # the partition is downsampled again by the next maintenance run
+            conflict = 'DO UPDATE SET resolution = 0' if moved else 'DO NOTHING'
+            cursor.execute(
+                f'INSERT INTO rate_partitions ({PARTITION_COLUMNS}) VALUES (?, ?, ?, 0) ON CONFLICT(name) {conflict}',
+                (table, start, end),
+            )
+        return moved
+
+    def downsample(self, partition: RatePartition, resolution: int) -> int:
+        with self._db_client.transaction() as cursor:
+            cursor.execute(DOWNSAMPLE_STATEMENT.format(table=partition.name), {'resolution': resolution})
+            deleted = cursor.rowcount
+            cursor.execute('UPDATE rate_partitions SET resolution = ? WHERE name = ?', (resolution, partition.name))
+        return deleted
+
+    def drop(self, partition: RatePartition) -> None:
+        with self._db_client.transaction() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {partition.name}')
+            cursor.execute('DELETE from rate_partitions WHERE name = ?', (partition.name,))
+
+    def drop_all(self) -> None:
+        for partition in self.get_partitions():
+            self.drop(partition)
+
+    def incremental_vacuum(self) -> int | None:
+        # returns the freed pages, None if the DB was created without auto_vacuum=INCREMENTAL
+        if self._db_client.execute('PRAGMA auto_vacuum')[0][0] != 2:
+            return None
+        free_pages = self._db_client.execute('PRAGMA freelist_count')[0][0]
+        self._db_client.execute('PRAGMA incremental_vacuum')
+        return free_pages - self._db_client.execute('PRAGMA freelist_count')[0][0]
+
+    def enable_incremental_vacuum(self) -> None:
+        # one-off for DBs created before auto_vacuum was set: VACUUM rewrites the whole file
+        with self._db_client.transaction() as cursor:
+            enable_incremental_vacuum(cursor)
@@ -0,0 +1,35 @@
+import datetime
+import json
+
+from .dtos import RATE_SCALE, format_uuid
+
+
+class RateRowEncoder:
+    """Encodes raw `rates` rows straight to JSON objects, with no Rate or dict in between.
+
+    Output matches `json.dumps(Rate.from_tuple(row).to_dict())`. Timestamps and currency codes repeat
+    a lot (all rates of one pull share a timestamp), so their encoded forms are memoized per encoder.
+    """
+    __slots__ = ('_time_format', '_dates', '_strings')
+
+    def __init__(self, time_format: str) -> None:
+        self._time_format = time_format
+        self._dates: dict[int, str] = {}
+        self._strings: dict[str, str] = {}
+
+    def encode(self, row: tuple[bytes, str, str, int, int]) -> str:
+        id_, base, currency, rate, timestamp = row
+
+        date = self._dates.get(timestamp)
+        if date is None:
+            date = self._dates[timestamp] = json.dumps(
+                datetime.datetime.fromtimestamp(timestamp).strftime(self._time_format)
+            )
+        strings = self._strings
+        base_str = strings.get(base) or strings.setdefault(base, json.dumps(base))
+        currency_str = strings.get(currency) or strings.setdefault(currency, json.dumps(currency))
+
+        return (
+            f'{{"baseCurrency": {base_str}, "currency": {currency_str}, "rate": {rate / RATE_SCALE!r}, '
+            f'"addDate": {date}, "id": "{format_uuid(id_)}"}}'
+        )
@@ -1,51 +1,274 @@
 import datetime
+import itertools
+import sqlite3
+import threading
+from typing import Iterable, Iterator
 
-from .dtos import Rate, RatesQuery
+from .dtos import RATE_SCALE, Rate, RatesPage, RatesQuery
 from .clients import DBClient
+from .generation import SharedGeneration
+from .partition_repository import (
+    RATE_COLUMNS,
+    PartitionRepository,
+    create_rates_indexes,
+    drop_rates_indexes,
+    get_partition_tables,
+    rates_source,
+)
+from .rollup_repository import RollupRepository
 from .settings import get_settings
 
 
+# rows per transaction of a bulk insert
+BULK_CHUNK_SIZE = 50_000
+
+# the data generation is stored in a counter row and read from a SharedGeneration file next to the DB
+BUMP_GENERATION_STATEMENT = 'UPDATE rates_generation SET generation = generation + 1 RETURNING generation'
+# at startup: the file may be missing, or left over from a DB recreated from scratch
+LOAD_GENERATION_STATEMENT = 'UPDATE rates_generation SET generation = max(generation, ?) RETURNING generation'
+
+INSERT_STATEMENT = 'INSERT INTO rates (baseCurrency, currency, rate, addDate, id) VALUES(?, ?, ?, ?, ?)'
+
+
 class RateRepository:
-    __slots__ = ('_db_client', '_time_format', '_from_str_time_format')
+    """Reads and writes rates. Reads go to the `rates` table and the monthly partitions overlapping
+    the requested dates, see PartitionRepository."""
+    __slots__ = ('_db_client', '_partition_repository', '_from_str_time_format')
+
+    _shared_generation: SharedGeneration | None = None
+    _shared_generation_lock = threading.Lock()
 
     def __init__(self) -> None:
         settings = get_settings()
 
-        self._db_client = DBClient(settings.DB_CONNECTION_URL)
-        self._time_format = settings.TIME_FORMAT
+        self._db_client = DBClient(settings.DB_CONNECTION_URL, settings.DB_POOL_SIZE)
+        self._partition_repository = PartitionRepository()
         self._from_str_time_format = settings.GET_RATES_QUERY_TIME_FORMAT
 
     def get_all_rates(self) -> list[Rate]:
-        statement = 'SELECT * from rates'
+        statement = f'SELECT {RATE_COLUMNS} from {rates_source(self._partition_repository.get_tables())}'
         rows = self._db_client.execute(statement)
         return [Rate.from_tuple(row) for row in rows]
 
     def get_rates_by_query(self, query: RatesQuery) -> list[Rate]:
-        where = self._build_where(query)
-        statement = 'SELECT * from rates' + ' ' + where
+        tables = self._partition_repository.get_tables(*self._date_range(query))
+        where, values = self._build_where(query)
+        statement = ' UNION ALL '.join(f'SELECT {RATE_COLUMNS} from {table} {where}' for table in tables)
+        rows = self._db_client.execute(statement, values * len(tables))
+        return [Rate.from_tuple(row) for row in rows]
+
+    def get_latest_rates(self) -> list[Rate]:
+        # SQLite takes the bare columns from the row holding max(addDate) in each group
+        statement = (
+            f'SELECT id, baseCurrency, currency, rate, max(addDate) '
+            f'from {rates_source(self._partition_repository.get_tables())} GROUP BY baseCurrency, currency'
+        )
         rows = self._db_client.execute(statement)
         return [Rate.from_tuple(row) for row in rows]
 
-    def add_rates_batch(self, rates: list[Rate]) -> None:
-        statement = 'INSERT INTO rates (baseCurrency, currency, rate, addDate, id) VALUES(?, ?, ?, ?, ?)'
-        self._db_client.executemany(statement, [r.to_tuple() for r in rates])
+    def get_max_rowid(self) -> int:
+        return self._db_client.execute('SELECT max(rowid) from rates')[0][0] or 0
+
+    def get_rates_since(self, rowid: int) -> tuple[list[Rate], int]:
+        # rows added after `rowid` and the new high-water mark, a seek on the rowid b-tree
+        statement = f'SELECT rowid, {RATE_COLUMNS} from rates WHERE rowid > ? ORDER BY rowid'
+        rows = self._db_client.execute(statement, (rowid,))
+        last_rowid = rows[-1][0] if rows else rowid
+        return [Rate.from_tuple(row[1:]) for row in rows], last_rowid
+
+    def get_rates_at(self, base_currency: str, currencies: Iterable[str], date: datetime.datetime) -> dict[str, float]:
+        # nearest prior rate per currency, each lookup is a backwards range scan on (currency, addDate).
+        # partitions hold disjoint months: the newest one with a match has the best archived candidate,
+        # `rates` is always checked as it can hold rows of any month
+        timestamp = int(date.timestamp())
+        partitions = [p.name for p in reversed(self._partition_repository.get_partitions(end=timestamp))]
+        rates = {}
+        for currency in currencies:
+            found = self._get_rate_at('rates', currency, timestamp, base_currency)
+            for table in partitions:
+                archived = self._get_rate_at(table, currency, timestamp, base_currency)
+                if archived:
+                    found = max(found, archived) if found else archived
+                    break
+            if found:
+                rates[currency] = found[1] / RATE_SCALE
+        return rates
+
+    def _get_rate_at(self, table: str, currency: str, timestamp: int, base_currency: str) -> tuple[int, int] | None:
+        statement = (
+            f'SELECT addDate, rate from {table} WHERE currency = ? AND addDate <= ? AND baseCurrency = ? '
+            'ORDER BY addDate DESC LIMIT 1'
+        )
+        rows = self._db_client.execute(statement, (currency, timestamp, base_currency))
+        return rows[0] if rows else None
+
+    def iter_rows(self, query: RatesQuery, page: RatesPage) -> Iterator[tuple]:
+        # raw rows: (rowid, id, baseCurrency, currency, rate, addDate), see RateRowEncoder.
+        # keyset pagination: ordered by (addDate, rowid), which both indexes deliver without sorting.
+        # with partitions SQLite merges the per-table ordered scans (MERGE (UNION ALL)), still without sorting
+        start, end = self._date_range(query)
+        if page.after:
+            # later pages only need the partitions from the cursor on
+            start = max(start or page.after[0], page.after[0])
+        tables = self._partition_repository.get_tables(start, end)
+        where, values = self._build_where(query, page.after)
+        if len(tables) == 1:
+            statement = f'SELECT rowid, {RATE_COLUMNS} from rates {where} ORDER BY addDate, rowid'
+        else:
+            statement = ' UNION ALL '.join(f'SELECT rowid, {RATE_COLUMNS} from {table} {where}' for table in tables)
+            # compound selects order by result column: addDate, rowid
+            statement += ' ORDER BY 6, 1'
+            values *= len(tables)
+        if page.limit:
+            statement += ' LIMIT ?'
+            values += (page.limit,)
+
+        return self._db_client.iterate(statement, values)
+
+    def iter_rates(self, query: RatesQuery, page: RatesPage) -> Iterator[tuple[int, Rate]]:
+        for row in self.iter_rows(query, page):
+            yield row[0], Rate.from_tuple(row[1:])
+
+    def get_rates_page(self, query: RatesQuery, page: RatesPage) -> tuple[list[Rate], str | None]:
+        rows = list(self.iter_rows(query, page))
 
-    def _build_where(self, query: RatesQuery) -> str:
-        ands = []
+        next_cursor = None
+        if page.limit and len(rows) == page.limit:
+            next_cursor = RatesPage.encode_cursor(rows[-1][-1], rows[-1][0])
+        return [Rate.from_tuple(row[1:]) for row in rows], next_cursor
+
+    def add_rates_batch(self, rates: list[Rate]) -> int:
+        # returns the generation this write produced
+        rows = [r.to_tuple() for r in rates]
+        with self._db_client.transaction() as cursor:
+            cursor.executemany(INSERT_STATEMENT, rows)
+            RollupRepository.update_rollups(cursor, rows)
+            generation = _increment_generation(cursor)
+        # published once committed: a reader that sees the new generation also sees the new rows
+        self._get_shared_generation().publish(generation)
+        return generation
+
+    def add_rates_bulk(
+            self,
+            rows: Iterable[tuple],
+            chunk_size: int = BULK_CHUNK_SIZE,
+            defer_indexes: bool = False,
+    ) -> int:
+        """Inserts DB rows (see Rate.to_tuple) in one transaction per `chunk_size` rows, returns the inserted count.
+
+        Rows with an id already stored, in `rates` or in the partition of their month, are skipped,
+        so an import or a backfill can be re-run. Rollups are updated with each chunk.
+        With `defer_indexes` the `rates` indexes are dropped for the load and built once at the end:
+        much faster for large loads, but readers scan the table meanwhile.
+        """
+        rows, inserted = iter(rows), 0
+        if defer_indexes:
+            with self._db_client.transaction() as cursor:
+                drop_rates_indexes(cursor, 'rates')
+        try:
+            while chunk := list(itertools.islice(rows, chunk_size)):
+                with self._db_client.transaction() as cursor:
+                    new_rows = self._skip_stored(cursor, chunk)
+                    cursor.executemany(INSERT_STATEMENT, new_rows)
+                    RollupRepository.update_rollups(cursor, new_rows)
+                    generation = _increment_generation(cursor) if new_rows else None
+                if generation is not None:
+                    self._get_shared_generation().publish(generation)
+                inserted += len(new_rows)
+        finally:
+            if defer_indexes:
+                with self._db_client.transaction() as cursor:
+                    create_rates_indexes(cursor, 'rates')
+        return inserted
+
+    @staticmethod
+    def _skip_stored(cursor: sqlite3.Cursor, rows: list[tuple]) -> list[tuple]:
+        # the rows whose id is neither stored nor repeated earlier in `rows`. ids are looked up through
+        # a temporary table, each stored table is probed once via its primary key
+        timestamps = [row[3] for row in rows]
+        tables = get_partition_tables(cursor, min(timestamps), max(timestamps)) + ['rates']
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS bulk_ids(id BLOB PRIMARY KEY) WITHOUT ROWID')
+        cursor.execute('DELETE FROM temp.bulk_ids')
+        cursor.executemany('INSERT OR IGNORE INTO temp.bulk_ids VALUES (?)', [(row[4],) for row in rows])
+        seen = {
+            id_ for table in tables
+            for id_, in cursor.execute(f'SELECT id from {table} WHERE id IN (SELECT id FROM temp.bulk_ids)')
+        }
+        new_rows = []
+        for row in rows:
+            if row[4] not in seen:
+                seen.add(row[4])
+                new_rows.append(row)
+        return new_rows
+
+    @classmethod
+    def generation(cls) -> int:
+        # bumped on every write to the rates history, readers compare it to invalidate derived data.
+        # a memory read, the DB is not queried
+        return cls._get_shared_generation().get()
+
+    @classmethod
+    def bump_generation(cls) -> int:
+        # for writes that don't go through add_rates_*: maintenance, a reset
+        with _get_db_client().transaction() as cursor:
+            generation = _increment_generation(cursor)
+        cls._get_shared_generation().publish(generation)
+        return generation
+
+    @classmethod
+    def load_generation(cls) -> int:
+        # once at startup (prepare_db): the stored row and the shared file agree on the higher of the two
+        generation = _get_db_client().execute(LOAD_GENERATION_STATEMENT, (cls._get_shared_generation().get(),))[0][0]
+        cls._get_shared_generation().publish(generation)
+        return generation
+
+    @classmethod
+    def _get_shared_generation(cls) -> SharedGeneration:
+        if cls._shared_generation is None:
+            with cls._shared_generation_lock:
+                if cls._shared_generation is None:
+                    cls._shared_generation = SharedGeneration(f'{get_settings().DB_CONNECTION_URL}-generation')
+        return cls._shared_generation
+
+    def _build_where(self, query: RatesQuery, after: tuple[int, int] | None = None) -> tuple[str, tuple]:
+        # only placeholders go into the statement, so each query shape is parsed once per connection
+        # and (currency, addDate) lookups are served by rates_currency_add_date_idx
+        ands, values = [], []
+        start, end = self._date_range(query)
         if query.currencyName:
-            ands.append(f"currency = '{query.currencyName.split()[0].strip()}'")
-        if query.startDate:
-            start_date = query.startDate.split()[0].strip()
-            statement = self._build_date_query(start_date, '>=')
-            ands.append(statement)
-        if query.endDate:
-            end_date = query.endDate.split()[0].strip()
-            statement = self._build_date_query(end_date, '<=')
-            ands.append(statement)
+            ands.append('currency = ?')
+            values.append(query.currencyName.split()[0].strip())
+        if start is not None:
+            ands.append('addDate >= ?')
+            values.append(start)
+        if end is not None:
+            ands.append('addDate <= ?')
+            values.append(end)
+        if after:
+            ands.append('(addDate, rowid) > (?, ?)')
+            values.extend(after)
 
+        if not ands:
+            return '', ()
         where = 'WHERE ' + ' AND '.join(ands)
-        return where
+        return where, tuple(values)
 
-    def _build_date_query(self, date_str: str, action: str) -> str:
+    def _date_range(self, query: RatesQuery) -> tuple[int | None, int | None]:
+        start = self._to_timestamp(query.startDate) if query.startDate else None
+        end = self._to_timestamp(query.endDate) if query.endDate else None
+        return start, end
+
+    def _to_timestamp(self, date_str: str) -> int:
+        date_str = date_str.split()[0].strip()
         date = datetime.datetime.strptime(date_str, self._from_str_time_format)
-        return f"addDate {action} datetime('{date.strftime(self._time_format)}')"
+        return int(date.timestamp())
+
+
+def _increment_generation(cursor: sqlite3.Cursor) -> int:
+    # within `cursor`'s transaction, the caller publishes the new value once it has committed
+    return cursor.execute(BUMP_GENERATION_STATEMENT).fetchone()[0]
+
+
+def _get_db_client() -> DBClient:
+    settings = get_settings()
+    return DBClient(settings.DB_CONNECTION_URL, settings.DB_POOL_SIZE)
@@ -0,0 +1,124 @@
+import datetime
+import sqlite3
+
+from .dtos import RATE_SCALE, RateRollup
+from .clients import DBClient
+from .partition_repository import PartitionRepository, rates_source
+from .settings import get_settings
+
+# bucket sizes in seconds, buckets are aligned to UTC
+INTERVALS = {
+    'hour': 3600,
+    'day': 86400,
+    'week': 7 * 86400,
+}
+# 1970-01-01 was a Thursday, shift week buckets so they start on Mondays
+INTERVAL_OFFSETS = {
+    'hour': 0,
+    'day': 0,
+    'week': 4 * 86400,
+}
+
+ROLLUP_COLUMNS = 'interval, baseCurrency, currency, bucket, openRate, closeRate, minRate, maxRate, rateSum, rateCount'
+
+UPSERT_STATEMENT = """
+    INSERT INTO rate_rollups (
+        interval, baseCurrency, currency, bucket,
+        openRate, openDate, closeRate, closeDate, minRate, maxRate, rateSum, rateCount
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+    ON CONFLICT (interval, currency, baseCurrency, bucket) DO UPDATE SET
+        openRate = CASE WHEN excluded.openDate < openDate THEN excluded.openRate ELSE openRate END,
+        openDate = min(openDate, excluded.openDate),
+        closeRate = CASE WHEN excluded.closeDate >= closeDate THEN excluded.closeRate ELSE closeRate END,
+        closeDate = max(closeDate, excluded.closeDate),
+        minRate = min(minRate, excluded.minRate),
+        maxRate = max(maxRate, excluded.maxRate),
+        rateSum = rateSum + excluded.rateSum,
+        rateCount = rateCount + excluded.rateCount
+    """
+
+# open/close are taken from the first/last row of the bucket, ties broken by insertion order like the upsert does.
+# {source} is `rates` or the union of it and the archived partitions
+BACKFILL_STATEMENT = """
+    INSERT INTO rate_rollups (
+        interval, baseCurrency, currency, bucket,
+        openRate, openDate, closeRate, closeDate, minRate, maxRate, rateSum, rateCount
+    )
+    SELECT
+        :interval, g.baseCurrency, g.currency, g.bucket,
+        (SELECT r.rate / :scale FROM {source} r WHERE r.currency = g.currency AND r.addDate = g.openDate
+            AND r.baseCurrency = g.baseCurrency ORDER BY r.rowid LIMIT 1),
+        g.openDate,
+        (SELECT r.rate / :scale FROM {source} r WHERE r.currency = g.currency AND r.addDate = g.closeDate
+            AND r.baseCurrency = g.baseCurrency ORDER BY r.rowid DESC LIMIT 1),
+        g.closeDate, g.minRate, g.maxRate, g.rateSum, g.rateCount
+    FROM (
+        SELECT
+            baseCurrency, currency, addDate - (addDate - :offset) % :size AS bucket,
+            min(addDate) AS openDate, max(addDate) AS closeDate,
+            min(rate) / :scale AS minRate, max(rate) / :scale AS maxRate, sum(rate) / :scale AS rateSum,
+            count(*) AS rateCount
+        FROM {source}
+        GROUP BY baseCurrency, currency, bucket
+    ) g
+    """
+
+
+def bucket_start(timestamp: int, interval: str) -> int:
+    return timestamp - (timestamp - INTERVAL_OFFSETS[interval]) % INTERVALS[interval]
+
+
+class RollupRepository:
+    """Per interval OHLC + avg rollups of the rates table, kept up to date on every insert."""
+    __slots__ = ('_db_client', '_base_currency')
+
+    def __init__(self) -> None:
+        settings = get_settings()
+
+        self._db_client = DBClient(settings.DB_CONNECTION_URL, settings.DB_POOL_SIZE)
+        self._base_currency = settings.BASE_CURRENCY
+
+    def get_rollups(
+            self,
+            currency: str,
+            interval: str,
+            start_date: datetime.datetime | None = None,
+            end_date: datetime.datetime | None = None,
+            base_currency: str | None = None,
+    ) -> list[RateRollup]:
+        ands = ['interval = ?', 'currency = ?', 'baseCurrency = ?']
+        values = [interval, currency, base_currency or self._base_currency]
+        if start_date:
+            ands.append('bucket >= ?')
+            values.append(bucket_start(int(start_date.timestamp()), interval))
+        if end_date:
+            ands.append('bucket <= ?')
+            values.append(int(end_date.timestamp()))
+
+        statement = f'SELECT {ROLLUP_COLUMNS} from rate_rollups WHERE {" AND ".join(ands)} ORDER BY bucket'
+        rows = self._db_client.execute(statement, tuple(values))
+        return [RateRollup.from_tuple(row) for row in rows]
+
+    def rebuild(self) -> None:
+        # from the history still stored: downsampled or dropped partitions rebuild to coarser rollups
+        statement = BACKFILL_STATEMENT.format(source=rates_source(PartitionRepository().get_tables()))
+        with self._db_client.transaction() as cursor:
+            cursor.execute('DELETE FROM rate_rollups')
+            for interval, size in INTERVALS.items():
+                cursor.execute(
+                    statement,
+                    {'interval': interval, 'size': size, 'offset': INTERVAL_OFFSETS[interval], 'scale': float(RATE_SCALE)},
+                )
+
+    @staticmethod
+    def update_rollups(cursor: sqlite3.Cursor, rows: list[tuple]) -> None:
+        # rows in the rates table insert order: (baseCurrency, currency, fixed-point rate, addDate, id).
+        # must run in the same transaction as the insert, so rollups never diverge from raw data
+        values = []
+        for base, currency, rate, timestamp, _ in rows:
+            rate = rate / RATE_SCALE
+            for interval in INTERVALS:
+                bucket = bucket_start(timestamp, interval)
+                values.append((interval, base, currency, bucket, rate, timestamp, rate, timestamp, rate, rate, rate))
+        cursor.executemany(UPSERT_STATEMENT, values)
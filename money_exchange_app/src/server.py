@@ -0,0 +1,106 @@
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Callable
+
+from werkzeug.serving import make_server
+
+logger = logging.getLogger(__name__)
+
+# a worker that keeps dying is restarted at most this often
+RESTART_DELAY = 1.0
+
+
+class PreforkServer:
+    """Serves a WSGI app from `workers` forked processes accepting on one shared listening socket.
+
+    Everything loaded before run() (schema checks, the latest rates snapshot) is done once and shared
+    with the workers copy-on-write. Each worker serves requests on its own threads and its own DB pool.
+    The supervisor only forks, reaps and restarts workers, it never serves or starts threads itself,
+    so forking again after a crash is safe. Metrics are per worker.
+    """
+
+    def __init__(
+            self,
+            app: Callable,
+            host: str,
+            port: int,
+            workers: int,
+            on_worker_start: Callable[[int], None] | None = None,
+    ) -> None:
+        self._app = app
+        self._host = host
+        self._port = port
+        self._workers_count = workers
+        self._on_worker_start = on_worker_start
+        self._workers: dict[int, int] = {}
+        self._socket: socket.socket | None = None
+        self._running = False
+
+    def run(self) -> None:
+        self._socket = socket.create_server((self._host, self._port), backlog=1024)
+        self._socket.set_inheritable(True)
+        self._running = True
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        logger.info(f'Serving on http://{self._host}:{self._port} with {self._workers_count} workers')
+
+        for index in range(self._workers_count):
+            self._spawn(index)
+
+        while self._workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            index = self._workers.pop(pid, None)
+            if index is None or not self._running:
+                continue
+            logger.warning(f'Worker {index} (pid {pid}) exited with status {status}, restarting...')
+            time.sleep(RESTART_DELAY)
+            if self._running:
+                self._spawn(index)
+
+        self._socket.close()
+        logger.info('Server stopped')
+
+    def _stop(self, signum: int, frame) -> None:
+        self._running = False
+        for pid in list(self._workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _spawn(self, index: int) -> None:
+        pid = os.fork()
+        if pid:
+            self._workers[pid] = index
+            return
+
+        exit_code = 0
+        try:
+            # the supervisor handles Ctrl+C and stops the workers with SIGTERM
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, _exit_worker)
+            if self._on_worker_start:
+                self._on_worker_start(index)
+            server = make_server(self._host, self._port, self._app, threaded=True, fd=self._socket.fileno())
+            logger.info(f'Worker {index} started, pid {os.getpid()}')
+            server.serve_forever()
+        except SystemExit:
+            pass
+        except BaseException:
+            logger.exception(f'Worker {index} failed')
+            exit_code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)
+
+
+def _exit_worker(signum: int, frame) -> None:
+    raise SystemExit(0)
@@ -1 +1,7 @@
 from .get_rates_service import GetRatesService
+from .get_latest_rates_service import GetLatestRatesService
+from .convert_service import ConvertService
+from .get_rates_aggregate_service import GetRatesAggregateService
+from .metrics_service import MetricsService
+from .abc_service import ABCService
+from .handler_pool import HandlerPool
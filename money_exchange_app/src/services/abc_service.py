@@ -3,9 +3,15 @@ from abc import abstractmethod
 
 from flask import Request, Response
 
+from .handler_pool import HandlerPool
+
 
 class ABCService(ABC):
 
     @abstractmethod
     def handle_request(self, request: Request) -> Response:
         raise NotImplementedError()
+
+    async def handle_request_async(self, request: Request) -> Response:
+        # the blocking handler runs on the bounded HandlerPool, the event loop only awaits it
+        return await HandlerPool().run(self.handle_request, request)
@@ -0,0 +1,89 @@
+import datetime
+import logging
+from http import HTTPStatus
+from typing import Self
+
+from flask import Request, Response
+from flask import jsonify
+
+from .abc_service import ABCService
+from src.conversion import ConversionEngine
+from src.dtos import Conversion
+from src.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 10000
+
+
+class ConvertService(ABCService):
+    _instance: Self = None
+
+    def __new__(cls, *args, **kwargs) -> 'ConvertService':
+        if not cls._instance:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        settings = get_settings()
+
+        self._engine = ConversionEngine()
+        self._time_formats = (settings.TIME_FORMAT, settings.GET_RATES_QUERY_TIME_FORMAT)
+
+    def handle_request(self, request: Request) -> Response:
+        # GET: a single conversion from query params, POST: {"conversions": [{...}, ...]}
+        try:
+            if request.method == 'POST':
+                conversions = self._get_batch(request)
+            else:
+                conversions = [self._get_conversion(request.values)]
+            conversions = self._engine.convert(conversions)
+        except (ValueError, TypeError) as e:
+            return self._bad_request(str(e))
+
+        response = {
+            'total': len(conversions),
+            'conversions': [c.to_dict() for c in conversions],
+        }
+        return jsonify(response)
+
+    def _get_batch(self, request: Request) -> list[Conversion]:
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not isinstance(body.get('conversions'), list):
+            raise ValueError('Expected a JSON body with a "conversions" list')
+        if len(body['conversions']) > MAX_BATCH_SIZE:
+            raise ValueError(f'Too many conversions, max: {MAX_BATCH_SIZE}')
+
+        return [self._get_conversion(item) for item in body['conversions']]
+
+    def _get_conversion(self, values: dict) -> Conversion:
+        from_currency, to_currency = values.get('fromCurrency'), values.get('toCurrency')
+        if not from_currency or not to_currency:
+            raise ValueError('"fromCurrency" and "toCurrency" are required')
+
+        try:
+            amount = float(values.get('amount', 1))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f'Invalid amount: {values.get("amount")}') from e
+
+        date = values.get('date')
+        return Conversion(
+            fromCurrency=from_currency.strip().upper(),
+            toCurrency=to_currency.strip().upper(),
+            amount=amount,
+            date=self._parse_date(date) if date else None,
+        )
+
+    def _parse_date(self, date_str: str) -> datetime.datetime:
+        for time_format in self._time_formats:
+            try:
+                return datetime.datetime.strptime(date_str.strip(), time_format)
+            except ValueError:
+                continue
+        raise ValueError(f'Invalid date: {date_str}')
+
+    @staticmethod
+    def _bad_request(msg: str) -> Response:
+        response = jsonify({'error': msg})
+        response.status_code = HTTPStatus.BAD_REQUEST
+        return response
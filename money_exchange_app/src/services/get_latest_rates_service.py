@@ -0,0 +1,41 @@
+import logging
+from typing import Self
+
+from flask import Request, Response
+from flask import jsonify
+
+from .abc_service import ABCService
+from src.snapshot import LatestRatesSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+class GetLatestRatesService(ABCService):
+    _instance: Self = None
+
+    def __new__(cls, *args, **kwargs) -> 'GetLatestRatesService':
+        if not cls._instance:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        self._snapshot = LatestRatesSnapshot()
+
+    def handle_request(self, request: Request) -> Response:
+        # served from the in-memory snapshot, the DB is read only to catch up after another process wrote rates
+        currencies = self._get_list(request, 'currencyName')
+        base_currency = request.values.get('baseCurrency', '').strip() or None
+
+        rates = self._snapshot.get_dicts(currencies, base_currency)
+        response = {
+            'total': len(rates),
+            'rates': rates,
+        }
+        return jsonify(response)
+
+    @staticmethod
+    def _get_list(request: Request, name: str) -> list[str] | None:
+        value = request.values.get(name)
+        if not value:
+            return None
+        return [v.strip() for v in value.split(',') if v.strip()]
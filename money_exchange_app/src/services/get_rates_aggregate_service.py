@@ -0,0 +1,66 @@
+import datetime
+import logging
+from http import HTTPStatus
+from typing import Self
+
+from flask import Request, Response
+from flask import jsonify
+
+from .abc_service import ABCService
+from src.rollup_repository import INTERVALS, RollupRepository
+from src.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class GetRatesAggregateService(ABCService):
+    _instance: Self = None
+
+    def __new__(cls, *args, **kwargs) -> 'GetRatesAggregateService':
+        if not cls._instance:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        self._rollup_repository = RollupRepository()
+        self._from_str_time_format = get_settings().GET_RATES_QUERY_TIME_FORMAT
+
+    def handle_request(self, request: Request) -> Response:
+        currency = request.values.get('currencyName', '').strip()
+        interval = request.values.get('interval', 'day').strip().lower()
+        start_date, end_date = request.values.get('startDate'), request.values.get('endDate')
+        base_currency = request.values.get('baseCurrency', '').strip() or None
+
+        if not currency:
+            return self._bad_request('"currencyName" is required')
+        if interval not in INTERVALS:
+            return self._bad_request(f'Invalid interval: {interval}. Expected one of: {", ".join(INTERVALS)}')
+        try:
+            start, end = self._parse_date(start_date), self._parse_date(end_date)
+        except ValueError as e:
+            return self._bad_request(str(e))
+
+        rollups = self._rollup_repository.get_rollups(currency, interval, start, end, base_currency)
+        response = {
+            'total': len(rollups),
+            'currencyName': currency,
+            'interval': interval,
+            'startDate': start_date,
+            'endDate': end_date,
+            'rollups': [r.to_dict() for r in rollups],
+        }
+        return jsonify(response)
+
+    def _parse_date(self, date_str: str | None) -> datetime.datetime | None:
+        if not date_str:
+            return None
+        try:
+            return datetime.datetime.strptime(date_str.strip(), self._from_str_time_format)
+        except ValueError as e:
+            raise ValueError(f'Invalid date: {date_str}') from e
+
+    @staticmethod
+    def _bad_request(msg: str) -> Response:
+        response = jsonify({'error': msg})
+        response.status_code = HTTPStatus.BAD_REQUEST
+        return response
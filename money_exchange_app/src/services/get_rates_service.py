@@ -1,15 +1,30 @@
+import hashlib
+import json
 import logging
-from typing import Self
+import time
+import uuid
+from http import HTTPStatus
+from typing import Iterator, Self
 
 from flask import Request, Response
 from flask import jsonify
 
 from .abc_service import ABCService
-from src.dtos import RatesQuery
+from src.cache import ResponseCache, SingleFlight
+from src.dtos import RatesPage, RatesQuery
+from src.metrics import REGISTRY, RATES_SERIALIZATION_SECONDS, CallbackMetric
+from src.rate_encoder import RateRowEncoder
 from src.rate_repository import RateRepository
+from src.settings import get_settings
 
 logger = logging.getLogger(__name__)
 
+# rates encoded per write when streaming
+STREAM_CHUNK_SIZE = 500
+# a DB recreated from scratch restarts the generation from 0, ETags handed out before must not match.
+# set at import, so pre-forked workers share it
+ETAG_EPOCH = uuid.uuid4().hex[:8]
+
 
 class GetRatesService(ABCService):
     _instance: Self = None
@@ -21,34 +36,140 @@ class GetRatesService(ABCService):
 
     def __init__(self) -> None:
         self._rate_repository = RateRepository()
+        # the service is a singleton, the cache must survive re-instantiation on every request
+        if not hasattr(self, '_response_cache'):
+            settings = get_settings()
+            self._response_cache = ResponseCache(
+                settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_TTL,
+                settings.RESPONSE_CACHE_MAX_BYTES, settings.RESPONSE_CACHE_MAX_ENTRY_BYTES,
+            )
+            self._single_flight = SingleFlight()
+            self._time_format = settings.TIME_FORMAT
+            self._register_cache_metrics()
+
+    @property
+    def response_cache(self) -> ResponseCache:
+        return self._response_cache
 
     def handle_request(self, request: Request) -> Response:
-        query = self._get_query(request)
-        if not any(list(query.__dict__.values())):
-            return self._get_all_rates()
-
-        return self._get_rates_by_query(query)
-
-    def _get_all_rates(self) -> Response:
-        rates = self._rate_repository.get_all_rates()
-        rates = [r.to_dict() for r in rates]
-        response = {
-            'total': len(rates),
-            'rates': rates,
-        }
-        return jsonify(response)
-
-    def _get_rates_by_query(self, query: RatesQuery) -> Response:
-        rates = self._rate_repository.get_rates_by_query(query)
-        rates = [r.to_dict() for r in rates]
-        response = {
-            'total': len(rates),
-            'currencyName': query.currencyName,
-            'startDate': query.startDate,
-            'endDate': query.endDate,
-            'rates': rates,
-        }
-        return jsonify(response)
+        query = self._get_query(request).normalize()
+        try:
+            page = RatesPage.from_values(request.values.get('limit'), request.values.get('after'))
+        except ValueError as e:
+            return self._bad_request(str(e))
+
+        # read the generation before querying: a batch added meanwhile makes the stored entry
+        # and the ETag stale right away
+        generation = RateRepository.generation()
+        cache_key = (query.currencyName, query.startDate, query.endDate, page.limit, page.after)
+        etag = self._etag(cache_key, generation)
+        if request.if_none_match.contains(etag):
+            # the client has this exact body: the generation is a memory read, SQLite and the encoder are not touched
+            return self._not_modified(etag)
+
+        if self._is_stream(request):
+            return self._with_etag(self._stream_rates(query, page), etag)
+
+        body = self._response_cache.get(cache_key, generation)
+        if body is not None:
+            response = Response(body, mimetype='application/json')
+            response.headers['X-Cache'] = 'HIT'
+            return self._with_etag(response, etag)
+
+        # identical requests arriving while the body is being built wait for it instead of running the query again
+        body, shared = self._single_flight.do(
+            (cache_key, generation), lambda: self._build_body(query, page, cache_key, generation),
+        )
+        response = Response(body, mimetype='application/json')
+        response.headers['X-Cache'] = 'COALESCED' if shared else 'MISS'
+        return self._with_etag(response, etag)
+
+    def _build_body(self, query: RatesQuery, page: RatesPage, cache_key: tuple, generation: int) -> bytes:
+        body = ''.join(self._encode_rates(query, page)).encode()
+        self._response_cache.set(cache_key, generation, body)
+        return body
+
+    def _stream_rates(self, query: RatesQuery, page: RatesPage) -> Response:
+        # rows are read from the cursor and written as they are encoded,
+        # so memory per request is bounded by STREAM_CHUNK_SIZE and the first byte goes out immediately
+        return Response(self._encode_rates(query, page), mimetype='application/json')
+
+    def _encode_rates(self, query: RatesQuery, page: RatesPage) -> Iterator[str]:
+        # rows go from the DB cursor straight to JSON text, see RateRowEncoder
+        rows = self._rate_repository.iter_rows(query, page)
+        encoder = RateRowEncoder(self._time_format)
+
+        # unfiltered responses don't echo the query
+        head = query.to_dict() if any(query.to_dict().values()) else {}
+        yield json.dumps(head)[:-1] + (', ' if head else '') + '"rates": ['
+
+        total, last_row, encoding_time = 0, None, 0.0
+        for raw_chunk in _chunks(rows, STREAM_CHUNK_SIZE):
+            started = time.perf_counter()
+            chunk = ', '.join([encoder.encode(row[1:]) for row in raw_chunk])
+            encoding_time += time.perf_counter() - started
+            yield (', ' if total else '') + chunk
+            total += len(raw_chunk)
+            last_row = raw_chunk[-1]
+        RATES_SERIALIZATION_SECONDS.observe(encoding_time)
+
+        tail = {'total': total}
+        if page.limit:
+            tail['next'] = None
+            if total == page.limit:
+                tail['next'] = RatesPage.encode_cursor(last_row[-1], last_row[0])
+        yield '], ' + json.dumps(tail)[1:]
+
+    def _register_cache_metrics(self) -> None:
+        cache = self._response_cache
+        REGISTRY.register(CallbackMetric(
+            'rates_response_cache_hits_total', '/api/rates responses served from cache.', 'counter',
+            lambda: cache.hits,
+        ))
+        REGISTRY.register(CallbackMetric(
+            'rates_response_cache_misses_total', '/api/rates responses built from the DB.', 'counter',
+            lambda: cache.misses,
+        ))
+        single_flight = self._single_flight
+        REGISTRY.register(CallbackMetric(
+            'rates_coalesced_requests_total', '/api/rates requests that waited for an identical in-flight one.',
+            'counter', lambda: single_flight.coalesced,
+        ))
+        REGISTRY.register(CallbackMetric(
+            'rates_response_cache_entries', 'Encoded /api/rates responses currently cached.', 'gauge',
+            lambda: cache.stats()['size'],
+        ))
+        REGISTRY.register(CallbackMetric(
+            'rates_response_cache_bytes', 'Bytes of the encoded /api/rates responses currently cached.', 'gauge',
+            lambda: cache.stats()['bytes'],
+        ))
+
+    @staticmethod
+    def _etag(cache_key: tuple, generation: int) -> str:
+        # strong: the same query at the same generation always encodes to the same bytes, streamed or not
+        query_hash = hashlib.blake2b(repr(cache_key).encode(), digest_size=8).hexdigest()
+        return f'{ETAG_EPOCH}-{generation}-{query_hash}'
+
+    @staticmethod
+    def _with_etag(response: Response, etag: str) -> Response:
+        response.set_etag(etag)
+        # clients may keep the body but must revalidate it, which is a cheap 304 until the next batch
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    @classmethod
+    def _not_modified(cls, etag: str) -> Response:
+        return cls._with_etag(Response(status=HTTPStatus.NOT_MODIFIED), etag)
+
+    @staticmethod
+    def _is_stream(request: Request) -> bool:
+        return request.values.get('stream', '').lower() in ('1', 'true')
+
+    @staticmethod
+    def _bad_request(msg: str) -> Response:
+        response = jsonify({'error': msg})
+        response.status_code = HTTPStatus.BAD_REQUEST
+        return response
 
     @staticmethod
     def _get_query(request: Request) -> RatesQuery:
@@ -57,3 +178,14 @@ class GetRatesService(ABCService):
             startDate=request.values.get('startDate'),
             endDate=request.values.get('endDate'),
         )
+
+
+def _chunks(rows: Iterator[tuple], size: int) -> Iterator[list[tuple]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,49 @@
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Self
+
+from src.settings import get_settings
+
+
+class HandlerPool:
+    """Bounded thread pool running the blocking part of async views.
+
+    The event loop never waits on SQLite: handlers are awaited on at most `HANDLER_THREADS` threads,
+    extra requests queue here instead of piling up on the DB connection pool. Context variables
+    (Flask's app and request contexts) are copied to the worker thread.
+    """
+    _instance: Self = None
+
+    def __new__(cls, *args, **kwargs) -> 'HandlerPool':
+        if not cls._instance:
+            cls._instance = super().__new__(cls)
+            cls._instance._executor = None
+            cls._instance._pid = None
+            cls._instance._lock = threading.Lock()
+        return cls._instance
+
+    def __init__(self) -> None:
+        self._size = get_settings().HANDLER_THREADS
+
+    async def run(self, func: Callable[..., any], *args) -> any:
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._get_executor(), context.run, func, *args)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # threads don't survive fork(), a forked worker creates its own executor
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(self._size, thread_name_prefix='handler')
+                    self._pid = os.getpid()
+        return self._executor
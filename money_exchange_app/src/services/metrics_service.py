@@ -0,0 +1,21 @@
+import logging
+from typing import Self
+
+from flask import Request, Response
+
+from .abc_service import ABCService
+from src.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsService(ABCService):
+    _instance: Self = None
+
+    def __new__(cls, *args, **kwargs) -> 'MetricsService':
+        if not cls._instance:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def handle_request(self, request: Request) -> Response:
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
@@ -8,6 +8,7 @@ from dotenv import load_dotenv
 load_dotenv(Path().parent.absolute())
 
 DEFAULT_CURRENCIES_TO_FIND = ['USD']
+DEFAULT_BASE_CURRENCIES = ('USD',)
 
 
 @dataclass(frozen=True)
@@ -19,16 +20,73 @@ class Settings:
     BASE_CURRENCY: str = 'USD'
     TIME_FORMAT: str = '%Y-%m-%dT%H:%M:%SZ'
     GET_RATES_QUERY_TIME_FORMAT: str = '%Y-%m-%d'
+    DB_POOL_SIZE: int = 5
+    RESPONSE_CACHE_SIZE: int = 256
+    RESPONSE_CACHE_TTL: float = 60.0
+    # bytes of cached bodies in total and per body, larger bodies are rebuilt on every request
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_MAX_ENTRY_BYTES: int = 4 * 1024 * 1024
+    # bases pulled on every run, BASE_CURRENCY stays the one used for conversions and aggregates
+    BASE_CURRENCIES: tuple[str, ...] = ('USD',)
+    CURRENCY_API_TIMEOUT: float = 10.0
+    CURRENCY_API_RETRIES: int = 3
+    # rates at a past date: the rates endpoint with a `date` param unless set
+    CURRENCY_API_GET_HISTORY_URL: str | None = None
+    # parallel requests of a historical backfill
+    CURRENCY_API_CONCURRENCY: int = 4
+    # seconds between scheduled pulls, 0 disables the in-process scheduler
+    PULL_RATES_INTERVAL: float = 0.0
+    PULL_RATES_JITTER: float = 0.1
+    # pre-forked worker processes, 0 runs the single-process debug server
+    SERVER_WORKERS: int = 0
+    SERVER_HOST: str = 'localhost'
+    SERVER_PORT: int = 5000
+    # async views: blocking handler work runs on a bounded pool of HANDLER_THREADS threads.
+    # a cap on concurrent handlers, not extra concurrency: under WSGI each request keeps its server thread
+    ASYNC_HANDLERS: bool = False
+    HANDLER_THREADS: int = 5
+    # history maintenance, see tasks.maintenance. months are UTC calendar months, 0 disables a step
+    MAINTENANCE_INTERVAL: float = 0.0
+    RATES_HOT_MONTHS: int = 1
+    RATES_DOWNSAMPLE_AFTER_MONTHS: int = 0
+    RATES_DOWNSAMPLE_RESOLUTION: int = 3600
+    RATES_RETENTION_MONTHS: int = 0
 
 
 @cache
 def get_settings() -> Settings:
     currencies_to_find = os.environ.get('CURRENCY_TO_FIND')
     currencies_to_find = currencies_to_find.split(',') if currencies_to_find else DEFAULT_CURRENCIES_TO_FIND
+    base_currencies = os.environ.get('BASE_CURRENCIES')
+    base_currencies = tuple(base_currencies.split(',')) if base_currencies else DEFAULT_BASE_CURRENCIES
+    db_pool_size = int(os.environ.get('DB_POOL_SIZE', 5))
 
     return Settings(
         DB_CONNECTION_URL=os.environ['DB_CONNECTION_URL'],
         CURRENCY_API_KEY=os.environ['CURRENCY_API_KEY'],
         CURRENCY_API_GET_RATES_URL=os.environ['CURRENCY_API_GET_RATES_URL'],
         CURRENCIES_TO_FIND=currencies_to_find,
+        DB_POOL_SIZE=db_pool_size,
+        RESPONSE_CACHE_SIZE=int(os.environ.get('RESPONSE_CACHE_SIZE', 256)),
+        RESPONSE_CACHE_TTL=float(os.environ.get('RESPONSE_CACHE_TTL', 60.0)),
+        RESPONSE_CACHE_MAX_BYTES=int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+        RESPONSE_CACHE_MAX_ENTRY_BYTES=int(os.environ.get('RESPONSE_CACHE_MAX_ENTRY_BYTES', 4 * 1024 * 1024)),
+        BASE_CURRENCIES=base_currencies,
+        CURRENCY_API_TIMEOUT=float(os.environ.get('CURRENCY_API_TIMEOUT', 10.0)),
+        CURRENCY_API_RETRIES=int(os.environ.get('CURRENCY_API_RETRIES', 3)),
+        CURRENCY_API_GET_HISTORY_URL=os.environ.get('CURRENCY_API_GET_HISTORY_URL'),
+        CURRENCY_API_CONCURRENCY=int(os.environ.get('CURRENCY_API_CONCURRENCY', 4)),
+        PULL_RATES_INTERVAL=float(os.environ.get('PULL_RATES_INTERVAL', 0.0)),
+        PULL_RATES_JITTER=float(os.environ.get('PULL_RATES_JITTER', 0.1)),
+        SERVER_WORKERS=int(os.environ.get('SERVER_WORKERS', 0)),
+        SERVER_HOST=os.environ.get('SERVER_HOST', 'localhost'),
+        SERVER_PORT=int(os.environ.get('SERVER_PORT', 5000)),
+        ASYNC_HANDLERS=os.environ.get('ASYNC_HANDLERS', '').lower() in ('1', 'true'),
+        # by default no more handlers run at once than there are pooled DB connections
+        HANDLER_THREADS=int(os.environ.get('HANDLER_THREADS', db_pool_size)),
+        MAINTENANCE_INTERVAL=float(os.environ.get('MAINTENANCE_INTERVAL', 0.0)),
+        RATES_HOT_MONTHS=max(int(os.environ.get('RATES_HOT_MONTHS', 1)), 1),
+        RATES_DOWNSAMPLE_AFTER_MONTHS=int(os.environ.get('RATES_DOWNSAMPLE_AFTER_MONTHS', 0)),
+        RATES_DOWNSAMPLE_RESOLUTION=int(os.environ.get('RATES_DOWNSAMPLE_RESOLUTION', 3600)),
+        RATES_RETENTION_MONTHS=int(os.environ.get('RATES_RETENTION_MONTHS', 0)),
     )
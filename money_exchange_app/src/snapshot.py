@@ -0,0 +1,91 @@
+import threading
+from typing import Iterable, Self
+
+from .dtos import Rate
+from .rate_repository import RateRepository
+
+
+class LatestRatesSnapshot:
+    """In-memory latest rate per (baseCurrency, currency).
+
+    Readers never touch the DB: the mapping is replaced as a whole on every update (copy-on-write),
+    so a reader always sees a consistent snapshot without taking a lock, and the generation check is
+    a memory read (see SharedGeneration). Rates written by another process (a pre-forked worker running
+    the puller, a bulk import) show up as a change of that generation: the next reader then catches up
+    once on the rows added since the last sync.
+    """
+    _instance: Self = None
+
+    def __new__(cls, *args, **kwargs) -> 'LatestRatesSnapshot':
+        if not cls._instance:
+            cls._instance = super().__new__(cls)
+            cls._instance._rates = {}
+            cls._instance._version = 0
+            cls._instance._generation = RateRepository.generation()
+            cls._instance._last_rowid = 0
+            cls._instance._lock = threading.Lock()
+        return cls._instance
+
+    @property
+    def version(self) -> int:
+        # changes whenever the snapshot content is replaced, derived data (cross rates) is rebuilt on change
+        self._sync()
+        return self._version
+
+    def refresh(self) -> None:
+        # generation and high-water mark are read first: rows added meanwhile are applied again on the next sync
+        generation = RateRepository.generation()
+        rate_repository = RateRepository()
+        last_rowid = rate_repository.get_max_rowid()
+        self.load(rate_repository.get_latest_rates(), generation, last_rowid)
+
+    def load(self, rates: Iterable[Rate], generation: int | None = None, last_rowid: int = 0) -> None:
+        with self._lock:
+            self._rates = {(r.baseCurrency, r.currency): (r, r.to_dict()) for r in rates}
+            self._generation = RateRepository.generation() if generation is None else generation
+            self._last_rowid = last_rowid
+            self._version += 1
+
+    def update(self, rates: Iterable[Rate], generation: int | None = None) -> None:
+        # called by the writer with the generation add_rates_batch returned. if no other write happened
+        # in between, the snapshot is current without re-reading the rows
+        with self._lock:
+            self._apply(rates)
+            if generation == self._generation + 1:
+                self._generation = generation
+
+    def _sync(self) -> None:
+        generation = RateRepository.generation()
+        if generation == self._generation:
+            return
+        with self._lock:
+            if generation == self._generation:
+                return
+            rates, self._last_rowid = RateRepository().get_rates_since(self._last_rowid)
+            self._apply(rates)
+            self._generation = generation
+
+    def _apply(self, rates: Iterable[Rate]) -> None:
+        latest = dict(self._rates)
+        for rate in rates:
+            key = (rate.baseCurrency, rate.currency)
+            current = latest.get(key)
+            if current is None or current[0].addDate <= rate.addDate:
+                latest[key] = (rate, rate.to_dict())
+        self._rates = latest
+        self._version += 1
+
+    def get_rates(self, currencies: Iterable[str] | None = None, base_currency: str | None = None) -> list[Rate]:
+        return [rate for rate, _ in self._select(currencies, base_currency)]
+
+    def get_dicts(self, currencies: Iterable[str] | None = None, base_currency: str | None = None) -> list[dict]:
+        return [rate_dict for _, rate_dict in self._select(currencies, base_currency)]
+
+    def _select(self, currencies: Iterable[str] | None, base_currency: str | None) -> list[tuple[Rate, dict]]:
+        self._sync()
+        rates = self._rates
+        currencies = set(currencies) if currencies else None
+        return [
+            value for (base, currency), value in rates.items()
+            if (currencies is None or currency in currencies) and (base_currency is None or base == base_currency)
+        ]
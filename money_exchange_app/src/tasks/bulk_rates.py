@@ -0,0 +1,224 @@
+import csv
+import datetime
+import json
+import logging
+import sys
+import time
+import uuid
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import IO, Iterable, Iterator
+
+from src.clients import CurrencyClient
+from src.dtos import RATE_SCALE, RatesPage, RatesQuery, format_uuid
+from src.rate_encoder import RateRowEncoder
+from src.rate_repository import BULK_CHUNK_SIZE, RateRepository
+from src.settings import get_settings
+from src.tasks import db_setup
+from src.tasks.rate_puller import parse_rates
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('ndjson', 'csv')
+# same fields and order as the API's rate objects
+CSV_FIELDS = ('baseCurrency', 'currency', 'rate', 'addDate', 'id')
+# ids of backfilled rates are derived from (base, currency, timestamp), re-running a backfill adds nothing twice
+BACKFILL_NAMESPACE = uuid.UUID('5b4f0a43-1f0e-4c57-9c0b-2a3a3f6a1e11')
+
+
+def import_rates(path: str, fmt: str | None = None, defer_indexes: bool = True,
+                 chunk_size: int = BULK_CHUNK_SIZE) -> int:
+    """Streams NDJSON or CSV rates (as exported, addDate in TIME_FORMAT or unix seconds) into `rates`."""
+    fmt = _get_format(path, fmt)
+    parser = _RowParser(get_settings().TIME_FORMAT)
+    started = time.perf_counter()
+    with _open(path, 'r') as f:
+        records = _read_ndjson(f) if fmt == 'ndjson' else csv.DictReader(f)
+        rows = _progress((parser.parse(record) for record in records), 'read', chunk_size)
+        inserted = RateRepository().add_rates_bulk(rows, chunk_size, defer_indexes)
+    _report('Imported', inserted, started)
+    return inserted
+
+
+def export_rates(path: str, fmt: str | None = None, query: RatesQuery | None = None) -> int:
+    # streams rows in (addDate, rowid) order across partitions, memory use does not depend on the export size
+    fmt = _get_format(path, fmt)
+    time_format = get_settings().TIME_FORMAT
+    rows = RateRepository().iter_rows(query or RatesQuery(None, None, None), RatesPage())
+    started, exported = time.perf_counter(), 0
+    with _open(path, 'w') as f:
+        if fmt == 'ndjson':
+            encoder = RateRowEncoder(time_format)
+            for row in rows:
+                f.write(encoder.encode(row[1:]) + '\n')
+                exported += 1
+        else:
+            writer = csv.writer(f)
+            writer.writerow(CSV_FIELDS)
+            dates: dict[int, str] = {}
+            for _, id_, base, currency, rate, timestamp in rows:
+                date = dates.get(timestamp)
+                if date is None:
+                    date = dates[timestamp] = datetime.datetime.fromtimestamp(timestamp).strftime(time_format)
+                writer.writerow((base, currency, rate / RATE_SCALE, date, format_uuid(id_)))
+                exported += 1
+    _report('Exported', exported, started)
+    return exported
+
+
+def backfill_rates(
+        start: datetime.date,
+        end: datetime.date,
+        base_currencies: Iterable[str] | None = None,
+        currencies: Iterable[str] | None = None,
+        defer_indexes: bool = False,
+) -> int:
+    """Loads the daily rates of [start, end] from the currency API, CURRENCY_API_CONCURRENCY days at a time.
+
+    Each day's rates are stored at its local midnight. Rows are written in chunks while later days
+    are still being fetched, any failed request aborts the backfill (the chunks written so far stay).
+    """
+    settings = get_settings()
+    base_currencies = list(base_currencies or settings.BASE_CURRENCIES)
+    currencies = list(currencies or settings.CURRENCIES_TO_FIND)
+    requests = [
+        (start + datetime.timedelta(days=i), base)
+        for i in range((end - start).days + 1) for base in base_currencies
+    ]
+    logger.info(f'Backfilling {len(requests)} daily rates requests from {start} to {end}...')
+
+    client = CurrencyClient(settings)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(settings.CURRENCY_API_CONCURRENCY, thread_name_prefix='backfill') as executor:
+        responses = executor.map(lambda request: client.get_rates(request[1], date=request[0]), requests)
+        rows = _progress(_backfill_rows(requests, responses, currencies), 'fetched', BULK_CHUNK_SIZE)
+        inserted = RateRepository().add_rates_bulk(rows, defer_indexes=defer_indexes)
+    _report('Backfilled', inserted, started)
+    return inserted
+
+
+def _backfill_rows(
+        requests: list[tuple[datetime.date, str]],
+        responses: Iterator[dict],
+        currencies: list[str],
+) -> Iterator[tuple]:
+    for (date, base), response in zip(requests, responses):
+        pull_time = datetime.datetime.combine(date, datetime.time())
+        for rate in parse_rates(response, base, currencies, pull_time):
+            rate.id = str(uuid.uuid5(BACKFILL_NAMESPACE, f'{base}:{rate.currency}:{int(pull_time.timestamp())}'))
+            yield rate.to_tuple()
+
+
+class _RowParser:
+    # record (NDJSON object or CSV row) -> DB row, addDate strings repeat a lot and are parsed once
+
+    def __init__(self, time_format: str) -> None:
+        self._time_format = time_format
+        self._timestamps: dict[str, int] = {}
+
+    def parse(self, record: dict[str, any]) -> tuple:
+        try:
+            add_date = record['addDate']
+            timestamp = self._timestamps.get(add_date) if isinstance(add_date, str) else int(add_date)
+            if timestamp is None:
+                if add_date.isdigit():
+                    timestamp = int(add_date)
+                else:
+                    timestamp = int(datetime.datetime.strptime(add_date, self._time_format).timestamp())
+                self._timestamps[add_date] = timestamp
+            id_ = uuid.UUID(record['id']) if record.get('id') else uuid.uuid4()
+            return (
+                record['baseCurrency'],
+                record['currency'],
+                round(float(record['rate']) * RATE_SCALE),
+                timestamp,
+                id_.bytes,
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f'Invalid rate record {record}: {e!r}') from e
+
+
+def _read_ndjson(f: IO[str]) -> Iterator[dict]:
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _progress(rows: Iterator[tuple], action: str, every: int) -> Iterator[tuple]:
+    started, count = time.perf_counter(), 0
+    for count, row in enumerate(rows, start=1):
+        yield row
+        if count % every == 0:
+            logger.info(f'{count:,} rows {action}, {count / (time.perf_counter() - started):,.0f} rows/sec')
+
+
+def _report(action: str, rows: int, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    logger.info(f'{action} {rows:,} rows in {elapsed:.2f}s, {rows / elapsed if elapsed else 0:,.0f} rows/sec')
+
+
+def _get_format(path: str, fmt: str | None) -> str:
+    fmt = fmt or ('csv' if path.endswith('.csv') else 'ndjson')
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format: {fmt}, expected one of {FORMATS}')
+    return fmt
+
+
+@contextmanager
+def _open(path: str, mode: str) -> Iterator[IO[str]]:
+    # "-" is stdin/stdout
+    if path == '-':
+        yield sys.stdin if mode == 'r' else sys.stdout
+        return
+    with open(path, mode, encoding='utf-8', newline='') as f:
+        yield f
+
+
+def _parse_date(value: str) -> datetime.date:
+    return datetime.datetime.strptime(value, get_settings().GET_RATES_QUERY_TIME_FORMAT).date()
+
+
+if __name__ == '__main__':
+    # python -m src.tasks.bulk_rates import rates.ndjson
+    # python -m src.tasks.bulk_rates export rates.csv --currency EUR --start 2022-01-01
+    # python -m src.tasks.bulk_rates backfill --start 2020-01-01 --end 2022-12-31 --currencies EUR,UAH
+    logging.basicConfig(level=logging.INFO)
+    parser = ArgumentParser(description='Bulk import, export and historical backfill of rates')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser('import', help='load NDJSON or CSV rates, "-" reads stdin')
+    import_parser.add_argument('path')
+    import_parser.add_argument('--format', choices=FORMATS)
+    import_parser.add_argument('--chunk-size', type=int, default=BULK_CHUNK_SIZE)
+    import_parser.add_argument('--online', action='store_true',
+                               help='keep the indexes during the load, for a DB serving reads')
+
+    export_parser = commands.add_parser('export', help='write rates as NDJSON or CSV, "-" writes stdout')
+    export_parser.add_argument('path')
+    export_parser.add_argument('--format', choices=FORMATS)
+    export_parser.add_argument('--currency')
+    export_parser.add_argument('--start')
+    export_parser.add_argument('--end')
+
+    backfill_parser = commands.add_parser('backfill', help='load daily rates from the currency API')
+    backfill_parser.add_argument('--start', required=True, type=_parse_date)
+    backfill_parser.add_argument('--end', type=_parse_date, default=datetime.date.today())
+    backfill_parser.add_argument('--bases', help='comma separated, BASE_CURRENCIES by default')
+    backfill_parser.add_argument('--currencies', help='comma separated, CURRENCY_TO_FIND by default')
+    backfill_parser.add_argument('--defer-indexes', action='store_true')
+
+    args = parser.parse_args()
+    db_setup.prepare_db()
+    if args.command == 'import':
+        import_rates(args.path, args.format, defer_indexes=not args.online, chunk_size=args.chunk_size)
+    elif args.command == 'export':
+        export_rates(args.path, args.format, RatesQuery(args.currency, args.start, args.end).normalize())
+    else:
+        backfill_rates(
+            args.start,
+            args.end,
+            args.bases.split(',') if args.bases else None,
+            args.currencies.split(',') if args.currencies else None,
+            args.defer_indexes,
+        )
@@ -1,5 +1,16 @@
 import logging
+import sqlite3
+import uuid
 
+from src.dtos import RATE_SCALE
+from src.partition_repository import (
+    PartitionRepository,
+    create_partitions_table,
+    create_rates_indexes,
+    create_rates_table,
+    enable_incremental_vacuum,
+)
+from src.rate_repository import RateRepository
 from src.settings import get_settings
 from src.clients import DBClient
 
@@ -10,31 +21,155 @@ logger = logging.getLogger(__name__)
 
 def prepare_db() -> None:
     # works
-    db_client = DBClient(settings.DB_CONNECTION_URL)
+    db_client = DBClient(settings.DB_CONNECTION_URL, settings.DB_POOL_SIZE)
 
     statement = "SELECT name FROM sqlite_master WHERE type='table' AND name='rates'"
     results = db_client.execute(statement)
     if not results:
         logger.info('Table "rate" not found. Creating a table...')
         _create_db(db_client)
+    else:
+        _migrate_db(db_client)
+    RateRepository.load_generation()
 
 
 def reset_db() -> None:
-    db_client = DBClient(settings.DB_CONNECTION_URL)
+    db_client = DBClient(settings.DB_CONNECTION_URL, settings.DB_POOL_SIZE)
 
+    PartitionRepository().drop_all()
     statement = "DROP TABLE rates"
     db_client.execute(statement)
+    db_client.execute("DROP TABLE IF EXISTS rate_rollups")
     _create_db(db_client)
+    # the generation row survives the reset, caches and ETags of the dropped rates must not match
+    RateRepository.bump_generation()
 
 
 def _create_db(db_client: DBClient) -> None:
-    statement = """
-            CREATE TABLE rates(
-                id STRING PRIMARY KEY NOT NULL,
-                baseCurrency char(3) NOT NULL,
-                currency char(3) NOT NULL,
-                rate REAL NOT NULL,
-                addDate TIMESTAMP NOT NULL
-            )
-            """
-    db_client.execute(statement)
+    with db_client.transaction() as cursor:
+        # lets tasks.maintenance return freed pages in steps, rewriting the still empty file is instant
+        enable_incremental_vacuum(cursor)
+    with db_client.transaction() as cursor:
+        create_rates_table(cursor, 'rates')
+        create_rates_indexes(cursor, 'rates')
+        _create_rollups_table(cursor)
+        create_partitions_table(cursor)
+        _create_generation_table(cursor)
+        _set_schema_version(cursor, SCHEMA_VERSION)
+
+
+def _migrate_db(db_client: DBClient) -> None:
+    version = db_client.execute('PRAGMA user_version')[0][0]
+    for target_version, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        logger.info(f'Migrating table "rates" to schema version {target_version}...')
+        with db_client.transaction() as cursor:
+            migration(cursor)
+            _set_schema_version(cursor, target_version)
+
+
+def _set_schema_version(cursor: sqlite3.Cursor, version: int) -> None:
+    cursor.execute(f'PRAGMA user_version = {int(version)}')
+
+
+def _migrate_to_epoch_add_date(cursor: sqlite3.Cursor) -> None:
+    # v1: addDate from naive local ISO strings to unix timestamps + (currency, addDate) index
+    cursor.execute("""
+        CREATE TABLE rates_new(
+            id STRING PRIMARY KEY NOT NULL,
+            baseCurrency char(3) NOT NULL,
+            currency char(3) NOT NULL,
+            rate REAL NOT NULL,
+            addDate INTEGER NOT NULL
+        )
+        """)
+    cursor.execute("""
+        INSERT INTO rates_new (id, baseCurrency, currency, rate, addDate)
+        SELECT id, baseCurrency, currency, rate, CAST(strftime('%s', addDate, 'utc') AS INTEGER) FROM rates
+        """)
+    cursor.execute('DROP TABLE rates')
+    cursor.execute('ALTER TABLE rates_new RENAME TO rates')
+    cursor.execute('CREATE INDEX IF NOT EXISTS rates_currency_add_date_idx ON rates (currency, addDate)')
+
+
+def _add_add_date_index(cursor: sqlite3.Cursor) -> None:
+    # v2: unfiltered and date-only reads are paginated by (addDate, rowid)
+    cursor.execute('CREATE INDEX IF NOT EXISTS rates_add_date_idx ON rates (addDate)')
+
+
+def _create_rollups_table(cursor: sqlite3.Cursor) -> None:
+    # v3: per hour/day/week rollups, maintained on insert. existing history is loaded by tasks.rollup_backfill
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rate_rollups(
+            interval char(4) NOT NULL,
+            baseCurrency char(3) NOT NULL,
+            currency char(3) NOT NULL,
+            bucket INTEGER NOT NULL,
+            openRate REAL NOT NULL,
+            openDate INTEGER NOT NULL,
+            closeRate REAL NOT NULL,
+            closeDate INTEGER NOT NULL,
+            minRate REAL NOT NULL,
+            maxRate REAL NOT NULL,
+            rateSum REAL NOT NULL,
+            rateCount INTEGER NOT NULL,
+            PRIMARY KEY (interval, currency, baseCurrency, bucket)
+        ) WITHOUT ROWID
+        """)
+
+
+def _migrate_to_compact_rates(cursor: sqlite3.Cursor) -> None:
+    # v4: fixed-point integer rates and 16-byte uuids instead of REAL rates and 36-char uuid strings
+    cursor.connection.create_function('uuid_to_bytes', 1, lambda id_: uuid.UUID(id_).bytes, deterministic=True)
+    cursor.execute("""
+        CREATE TABLE rates_new(
+            id BLOB PRIMARY KEY NOT NULL,
+            baseCurrency char(3) NOT NULL,
+            currency char(3) NOT NULL,
+            rate INTEGER NOT NULL,
+            addDate INTEGER NOT NULL
+        )
+        """)
+    cursor.execute(
+        'INSERT INTO rates_new (rowid, id, baseCurrency, currency, rate, addDate) '
+        'SELECT rowid, uuid_to_bytes(id), baseCurrency, currency, CAST(round(rate * ?) AS INTEGER), addDate '
+        'FROM rates',
+        (RATE_SCALE,),
+    )
+    cursor.execute('DROP TABLE rates')
+    cursor.execute('ALTER TABLE rates_new RENAME TO rates')
+    cursor.execute('CREATE INDEX IF NOT EXISTS rates_currency_add_date_idx ON rates (currency, addDate)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS rates_add_date_idx ON rates (addDate)')
+
+
+def _create_partitions_table(cursor: sqlite3.Cursor) -> None:
+    # v5: monthly partitions of old history, see tasks.maintenance
+    create_partitions_table(cursor)
+
+
+def _enable_incremental_vacuum(cursor: sqlite3.Cursor) -> None:
+    # v6: DBs created before v5 (or by a v5 that never applied it) switch to auto_vacuum=INCREMENTAL.
+    # the VACUUM rewrites the whole file once, the schema version is then set outside a transaction
+    enable_incremental_vacuum(cursor)
+
+
+def _create_generation_table(cursor: sqlite3.Cursor) -> None:
+    # v7: the data generation as a single counter row, the stored value behind RateRepository.generation
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rates_generation(
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            generation INTEGER NOT NULL
+        )
+        """)
+    cursor.execute('INSERT OR IGNORE INTO rates_generation (id, generation) VALUES (0, 0)')
+
+
+MIGRATIONS = [
+    _migrate_to_epoch_add_date,
+    _add_add_date_index,
+    _create_rollups_table,
+    _migrate_to_compact_rates,
+    _create_partitions_table,
+    _enable_incremental_vacuum,
+    _create_generation_table,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
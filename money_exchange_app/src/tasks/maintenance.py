@@ -0,0 +1,83 @@
+import datetime
+import logging
+import time
+from argparse import ArgumentParser
+
+from src.partition_repository import PartitionRepository, add_months, month_start
+from src.rate_repository import RateRepository
+from src.settings import get_settings
+from src.tasks import db_setup
+from src.tasks.scheduler import Scheduler
+
+logger = logging.getLogger(__name__)
+
+
+def run_maintenance(now: datetime.datetime | None = None) -> dict[str, int]:
+    """Archives, downsamples and drops rates history by UTC month, then returns free pages to the OS.
+
+    - rows older than RATES_HOT_MONTHS (the current month included) move from `rates` to monthly partitions
+    - partitions older than RATES_DOWNSAMPLE_AFTER_MONTHS keep one point per RATES_DOWNSAMPLE_RESOLUTION seconds
+    - partitions older than RATES_RETENTION_MONTHS are dropped
+
+    Rollups are left as they are, aggregates stay available for downsampled and dropped months.
+    """
+    settings = get_settings()
+    partition_repository = PartitionRepository()
+    current_month = month_start(int((now or datetime.datetime.now(datetime.timezone.utc)).timestamp()))
+    stats = {'archived_rows': 0, 'downsampled_rows': 0, 'dropped_partitions': 0, 'vacuumed_pages': 0}
+    started = time.perf_counter()
+
+    hot_start = add_months(current_month, 1 - settings.RATES_HOT_MONTHS)
+    while (month := partition_repository.get_oldest_archivable(hot_start)) is not None:
+        stats['archived_rows'] += partition_repository.archive_month(month)
+
+    if settings.RATES_RETENTION_MONTHS:
+        retention_start = add_months(current_month, -settings.RATES_RETENTION_MONTHS)
+        for partition in partition_repository.get_partitions():
+            if partition.monthEnd <= retention_start:
+                partition_repository.drop(partition)
+                stats['dropped_partitions'] += 1
+
+    if settings.RATES_DOWNSAMPLE_AFTER_MONTHS:
+        downsample_start = add_months(current_month, -settings.RATES_DOWNSAMPLE_AFTER_MONTHS)
+        resolution = settings.RATES_DOWNSAMPLE_RESOLUTION
+        for partition in partition_repository.get_partitions():
+            if partition.monthEnd <= downsample_start and partition.resolution < resolution:
+                stats['downsampled_rows'] += partition_repository.downsample(partition, resolution)
+
+    if stats['downsampled_rows'] or stats['dropped_partitions']:
+        # cached responses may include removed rows. archived rows are still found through routing
+        RateRepository.bump_generation()
+
+    vacuumed_pages = partition_repository.incremental_vacuum()
+    if vacuumed_pages is None:
+        logger.warning('auto_vacuum is not INCREMENTAL, run `python -m src.tasks.maintenance --enable-auto-vacuum` once')
+    stats['vacuumed_pages'] = vacuumed_pages or 0
+
+    logger.info(f'Maintenance done in {time.perf_counter() - started:.2f}s: {stats}')
+    return stats
+
+
+def schedule_maintenance() -> Scheduler | None:
+    settings = get_settings()
+    if not settings.MAINTENANCE_INTERVAL:
+        logger.info('MAINTENANCE_INTERVAL is not set, history maintenance is not scheduled')
+        return None
+
+    scheduler = Scheduler(run_maintenance, interval=settings.MAINTENANCE_INTERVAL, name='maintenance')
+    scheduler.start(run_immediately=False)
+    return scheduler
+
+
+if __name__ == '__main__':
+    # python -m src.tasks.maintenance [--enable-auto-vacuum]
+    logging.basicConfig(level=logging.INFO)
+    parser = ArgumentParser(description='Archive, downsample and drop old rates history')
+    parser.add_argument('--enable-auto-vacuum', action='store_true',
+                        help='one-off VACUUM switching an existing DB to incremental auto_vacuum')
+    args = parser.parse_args()
+
+    db_setup.prepare_db()
+    if args.enable_auto_vacuum:
+        PartitionRepository().enable_incremental_vacuum()
+    run_maintenance()
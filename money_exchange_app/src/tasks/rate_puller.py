@@ -1,28 +1,93 @@
 import logging
 import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
 
 from src.dtos import Rate
+from src.metrics import RATE_PULLED_ROWS, RATE_PULL_SECONDS, RATE_PULLS
 from src.settings import get_settings
 from src.rate_repository import RateRepository
+from src.snapshot import LatestRatesSnapshot
 from src.clients import CurrencyClient, InvalidAPIResponse
+from src.tasks.scheduler import Scheduler
 
 logger = logging.getLogger(__name__)
 
 
-def pull_rates() -> None:
+def pull_rates(base_currencies: Iterable[str] | None = None) -> list[Rate]:
+    started = time.perf_counter()
+    try:
+        rates = _pull_rates(base_currencies)
+    except Exception:
+        RATE_PULLS.labels('failure').inc()
+        raise
+    finally:
+        RATE_PULL_SECONDS.observe(time.perf_counter() - started)
+
+    RATE_PULLS.labels('success').inc()
+    RATE_PULLED_ROWS.inc(len(rates))
+    return rates
+
+
+def _pull_rates(base_currencies: Iterable[str] | None) -> list[Rate]:
     settings = get_settings()
+    base_currencies = list(base_currencies or settings.BASE_CURRENCIES)
+    if not base_currencies:
+        logger.warning('No base currencies to pull rates for')
+        return []
     pull_time = datetime.datetime.now()
 
-    logger.info(f'Pulling rates... Current time: {pull_time.strftime(settings.TIME_FORMAT)}')
+    logger.info(f'Pulling rates for {", ".join(base_currencies)}... '
+                f'Current time: {pull_time.strftime(settings.TIME_FORMAT)}')
+    client = CurrencyClient(settings)
+    # bases are fetched concurrently over the client's keep-alive session. any failure (the client raises
+    # InvalidAPIResponse for request, status and parse errors) aborts the whole pull
+    with ThreadPoolExecutor(max_workers=len(base_currencies), thread_name_prefix='rate-puller') as executor:
+        responses = list(executor.map(client.get_rates, base_currencies))
+
+    rates_to_add = []
+    for base_currency, response in zip(base_currencies, responses):
+        rates_to_add.extend(parse_rates(response, base_currency, settings.CURRENCIES_TO_FIND, pull_time))
+
+    # one batch: all bases are committed in a single transaction
+    rate_repository = RateRepository()
+    generation = rate_repository.add_rates_batch(rates_to_add)
+    LatestRatesSnapshot().update(rates_to_add, generation)
+    return rates_to_add
+
+
+def schedule_pulling() -> Scheduler | None:
+    settings = get_settings()
+    if not settings.PULL_RATES_INTERVAL:
+        logger.info('PULL_RATES_INTERVAL is not set, rates are not pulled on schedule')
+        return None
+
+    scheduler = Scheduler(
+        pull_rates,
+        interval=settings.PULL_RATES_INTERVAL,
+        jitter=settings.PULL_RATES_JITTER,
+        name='rate-puller',
+    )
+    scheduler.start()
+    return scheduler
+
+
+def parse_rates(
+        response: dict[str, any],
+        base_currency: str,
+        currencies: Iterable[str],
+        pull_time: datetime.datetime,
+) -> list[Rate]:
     try:
-        response = CurrencyClient(settings).get_rates()
-    except AssertionError as e:
-        logger.error(e)
-        raise InvalidAPIResponse(str(e))
+        rates = response['rates']
+    except (KeyError, TypeError) as e:
+        msg = f'Invalid API response for {base_currency}: {response}'
+        logger.error(msg)
+        raise InvalidAPIResponse(msg) from e
 
-    rates = response['rates']
     rates_to_add = []
-    for currency in settings.CURRENCIES_TO_FIND:
+    for currency in currencies:
         try:
             rate = rates[currency]
         except KeyError as e:
@@ -32,11 +97,9 @@ def pull_rates() -> None:
 
         # NOTE: use Decimal module for wokring with such rate. float is here bc I'm lazy
         rates_to_add.append(Rate(
-            baseCurrency=settings.BASE_CURRENCY,
+            baseCurrency=base_currency,
             currency=currency,
             rate=float(f'{rate:.4f}'),
             addDate=pull_time,
         ))
-
-    rate_repository = RateRepository()
-    rate_repository.add_rates_batch(rates_to_add)
+    return rates_to_add
@@ -0,0 +1,23 @@
+import logging
+import time
+
+from src.rollup_repository import RollupRepository
+from src.tasks import db_setup
+
+logger = logging.getLogger(__name__)
+
+
+def backfill_rollups() -> None:
+    # one-off: rebuilds all rollups from the rates history. new rates keep them up to date on insert
+    db_setup.prepare_db()
+
+    started = time.perf_counter()
+    logger.info('Rebuilding rate rollups...')
+    RollupRepository().rebuild()
+    logger.info(f'Rate rollups rebuilt in {time.perf_counter() - started:.2f}s')
+
+
+if __name__ == '__main__':
+    # python -m src.tasks.rollup_backfill
+    logging.basicConfig(level=logging.INFO)
+    backfill_rollups()
@@ -0,0 +1,79 @@
+import logging
+import random
+import threading
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """Runs `job` every `interval` seconds in a daemon thread.
+
+    Every delay is randomized by +-`jitter` (a fraction of the delay), so several processes don't hit
+    the API in lockstep. A failed run is retried with exponential backoff capped by `interval`,
+    and a run is skipped rather than started while the previous one is still in progress.
+    """
+
+    def __init__(
+            self,
+            job: Callable[[], any],
+            interval: float,
+            jitter: float = 0.1,
+            initial_backoff: float = 1.0,
+            name: str = 'scheduler',
+    ) -> None:
+        self._job = job
+        self._interval = interval
+        self._jitter = jitter
+        self._initial_backoff = initial_backoff
+        self._name = name
+        self._running = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.runs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+
+    def start(self, run_immediately: bool = True) -> None:
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._loop, args=(run_immediately,), name=self._name, daemon=True)
+        self._thread.start()
+        logger.info(f'{self._name}: started, interval: {self._interval}s')
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self) -> bool:
+        # returns False if the job failed or the previous run is still in progress
+        if not self._running.acquire(blocking=False):
+            logger.warning(f'{self._name}: previous run is still in progress, skipping')
+            return False
+
+        try:
+            self._job()
+        except Exception as e:
+            self.failures += 1
+            self.consecutive_failures += 1
+            logger.error(f'{self._name}: run failed ({self.consecutive_failures} in a row). Error: {e}')
+            return False
+        else:
+            self.consecutive_failures = 0
+            return True
+        finally:
+            self.runs += 1
+            self._running.release()
+
+    def next_delay(self) -> float:
+        delay = self._interval
+        if self.consecutive_failures:
+            delay = min(self._initial_backoff * 2 ** (self.consecutive_failures - 1), self._interval)
+        return delay * (1 + random.uniform(-self._jitter, self._jitter))
+
+    def _loop(self, run_immediately: bool) -> None:
+        if run_immediately:
+            self.run_once()
+        while not self._stopped.wait(self.next_delay()):
+            self.run_once()
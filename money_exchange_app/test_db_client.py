@@ -0,0 +1,105 @@
+import os
+import threading
+
+import pytest
+
+from src.clients.db_client import DBClient, DBOperationError
+
+
+@pytest.fixture
+def db_client(tmp_path):
+    app_client, DBClient._instance = DBClient._instance, None
+    client = DBClient(str(tmp_path / 'test.sqlite'), pool_size=2)
+    client.execute('CREATE TABLE items(name TEXT NOT NULL)')
+    yield client
+    client.close()
+    DBClient._instance = app_client
+
+
+def test_connections_are_reused(db_client):
+    # Act
+    for _ in range(10):
+        db_client.execute('SELECT count(*) FROM items')
+
+    # Assert
+    assert db_client._pool._created == 1
+    assert db_client._pool._idle.qsize() == 1
+
+
+def test_wal_mode_enabled(db_client):
+    # Act
+    journal_mode = db_client.execute('PRAGMA journal_mode')
+
+    # Assert
+    assert journal_mode == [('wal',)]
+
+
+def test_concurrent_readers_and_writer(db_client):
+    # Arrange
+    errors = []
+
+    def write() -> None:
+        for i in range(50):
+            db_client.execute('INSERT INTO items (name) VALUES (?)', (f'item-{i}',))
+
+    def read() -> None:
+        try:
+            for _ in range(50):
+                db_client.execute('SELECT count(*) FROM items')
+        except DBOperationError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(4)]
+
+    # Act
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Assert
+    assert not errors
+    assert db_client.execute('SELECT count(*) FROM items') == [(50,)]
+    assert db_client._pool._created <= 2
+
+
+def test_failed_statement_returns_connection(db_client):
+    # Act
+    with pytest.raises(DBOperationError):
+        db_client.execute('SELECT * FROM missing_table')
+
+    # Assert
+    assert db_client.execute('SELECT count(*) FROM items') == [(0,)]
+    assert db_client._pool._created == 1
+
+
+def test_transaction_rolls_back_on_error(db_client):
+    # Act
+    with pytest.raises(DBOperationError):
+        with db_client.transaction() as cursor:
+            cursor.execute("INSERT INTO items (name) VALUES ('first')")
+            cursor.execute('INSERT INTO items (name) VALUES (NULL)')
+
+    # Assert
+    assert db_client.execute('SELECT count(*) FROM items') == [(0,)]
+
+
+def test_forked_process_gets_fresh_pool(db_client):
+    # Arrange
+    db_client.execute("INSERT INTO items (name) VALUES ('parent')")
+    parent_connection = db_client._pool.acquire()
+    db_client._pool.release(parent_connection)
+
+    # Act
+    pid = os.fork()
+    if pid == 0:
+        connection = db_client._pool.acquire()
+        fresh = db_client._pool._created == 1 and connection is not parent_connection
+        db_client._pool.release(connection)
+        count = db_client.execute('SELECT count(*) FROM items')
+        os._exit(0 if fresh and count == [(1,)] else 1)
+    _, status = os.waitpid(pid, 0)
+
+    # Assert
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert db_client.execute('SELECT count(*) FROM items') == [(1,)]
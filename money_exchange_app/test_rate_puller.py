@@ -0,0 +1,177 @@
+import datetime
+import json
+import threading
+import time
+from dataclasses import replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src.clients import CurrencyClient, InvalidAPIResponse
+from src.rate_repository import RateRepository
+from src.settings import get_settings
+from src.tasks import bulk_rates, rate_puller
+from src.tasks.scheduler import Scheduler
+
+STUB_RATES = {
+    'USD': {'USD': 1.0, 'EUR': 0.9, 'UAH': 36.8},
+    'EUR': {'USD': 1.1, 'EUR': 1.0, 'UAH': 40.5},
+}
+
+
+class CurrencyAPIStub(BaseHTTPRequestHandler):
+    failures_left = 0
+    requests = []
+    dates = []
+
+    def do_GET(self) -> None:
+        params = parse_qs(urlparse(self.path).query)
+        type(self).requests.append(params['base'][0])
+        if 'date' in params:
+            type(self).dates.append(params['date'][0])
+        if type(self).failures_left:
+            type(self).failures_left -= 1
+            self._send(503, {'error': 'try later'})
+            return
+        if params['base'][0] not in STUB_RATES:
+            self._send(404, {'error': 'unknown base'})
+            return
+        self._send(200, {'base': params['base'][0], 'rates': STUB_RATES[params['base'][0]]})
+
+    def _send(self, status: int, body: dict) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def currency_api(db_client):
+    CurrencyAPIStub.failures_left, CurrencyAPIStub.requests, CurrencyAPIStub.dates = 0, [], []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CurrencyAPIStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    settings = replace(
+        get_settings(),
+        CURRENCY_API_GET_RATES_URL=f'http://127.0.0.1:{server.server_port}/api/v1/rates',
+        BASE_CURRENCIES=('USD', 'EUR'),
+        CURRENCIES_TO_FIND=['EUR', 'UAH'],
+        CURRENCY_API_TIMEOUT=2.0,
+    )
+    CurrencyClient._instance = None
+    with patch('src.tasks.rate_puller.get_settings', return_value=settings), \
+            patch('src.tasks.bulk_rates.get_settings', return_value=settings):
+        yield server
+    CurrencyClient._instance = None
+    server.shutdown()
+
+
+def test_pull_rates_for_several_bases(currency_api):
+    # Act
+    pulled = rate_puller.pull_rates()
+
+    # Assert
+    stored = {(r.baseCurrency, r.currency): r.rate for r in RateRepository().get_all_rates()}
+    assert len(pulled) == 4
+    assert stored == {('USD', 'EUR'): 0.9, ('USD', 'UAH'): 36.8, ('EUR', 'EUR'): 1.0, ('EUR', 'UAH'): 40.5}
+    assert sorted(CurrencyAPIStub.requests) == ['EUR', 'USD']
+
+
+def test_pull_rates_retries_unavailable_api(currency_api):
+    # Arrange
+    CurrencyAPIStub.failures_left = 1
+
+    # Act
+    rate_puller.pull_rates(['USD'])
+
+    # Assert
+    assert CurrencyAPIStub.requests == ['USD', 'USD']
+    assert len(RateRepository().get_all_rates()) == 2
+
+
+def test_failed_base_aborts_whole_pull(currency_api):
+    # Act
+    with pytest.raises(InvalidAPIResponse):
+        rate_puller.pull_rates(['USD', 'GBP'])
+
+    # Assert
+    assert RateRepository().get_all_rates() == []
+
+
+def test_pull_rates_without_base_currencies_pulls_nothing(currency_api):
+    # Arrange
+    generation = RateRepository.generation()
+    settings = replace(rate_puller.get_settings(), BASE_CURRENCIES=())
+
+    # Act
+    with patch('src.tasks.rate_puller.get_settings', return_value=settings):
+        pulled = rate_puller.pull_rates()
+
+    # Assert
+    assert pulled == []
+    assert CurrencyAPIStub.requests == []
+    assert RateRepository.generation() == generation
+
+
+def test_scheduler_backs_off_after_failures():
+    # Arrange
+    results = iter([RuntimeError('API is down'), RuntimeError('API is down'), None])
+
+    def job() -> None:
+        result = next(results)
+        if result:
+            raise result
+
+    scheduler = Scheduler(job, interval=60, jitter=0, initial_backoff=2)
+
+    # Act
+    delays = []
+    for _ in range(3):
+        scheduler.run_once()
+        delays.append(scheduler.next_delay())
+
+    # Assert
+    assert delays == [2, 4, 60]
+    assert (scheduler.runs, scheduler.failures) == (3, 2)
+
+
+def test_scheduler_skips_overlapping_runs():
+    # Arrange
+    release = threading.Event()
+    scheduler = Scheduler(release.wait, interval=60)
+    first_run = threading.Thread(target=scheduler.run_once)
+    first_run.start()
+    time.sleep(0.05)
+
+    # Act
+    overlapping = scheduler.run_once()
+    release.set()
+    first_run.join()
+
+    # Assert
+    assert overlapping is False
+    assert scheduler.runs == 1
+
+
+def test_backfill_loads_each_day_once(currency_api):
+    # Arrange
+    start, end = datetime.date(2022, 5, 1), datetime.date(2022, 5, 3)
+
+    # Act
+    inserted = bulk_rates.backfill_rates(start, end)
+    repeated = bulk_rates.backfill_rates(start, end)
+
+    # Assert
+    stored = RateRepository().get_all_rates()
+    assert inserted == 12
+    assert repeated == 0
+    assert len(stored) == 12
+    assert sorted(set(CurrencyAPIStub.dates)) == ['2022-05-01', '2022-05-02', '2022-05-03']
+    assert {r.addDate for r in stored} == {datetime.datetime(2022, 5, day) for day in (1, 2, 3)}
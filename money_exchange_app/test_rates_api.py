@@ -0,0 +1,642 @@
+import asyncio
+import datetime
+import json
+import os
+import signal
+import socket
+import sqlite3
+import threading
+import time
+import urllib.request
+from dataclasses import replace
+from unittest.mock import patch
+
+import pytest
+from flask import request
+
+from src.cache import ResponseCache
+from src.clients import DBClient
+from src.dtos import Rate, RatesQuery
+from src.rate_encoder import RateRowEncoder
+from src.rate_repository import RateRepository
+from src.partition_repository import PartitionRepository
+from src.rollup_repository import RollupRepository
+from src.server import PreforkServer
+from src.services import GetLatestRatesService, GetRatesService, HandlerPool
+from src.settings import get_settings
+from src.snapshot import LatestRatesSnapshot
+from src.tasks import bulk_rates, db_setup, maintenance, rate_puller
+
+
+def _add_rates(*rates: tuple[str, float, datetime.datetime]) -> None:
+    RateRepository().add_rates_batch([
+        Rate(baseCurrency='USD', currency=currency, rate=rate, addDate=add_date)
+        for currency, rate, add_date in rates
+    ])
+
+
+def test_get_all_rates(client):
+    # Arrange
+    _add_rates(('EUR', 0.93, datetime.datetime(2022, 5, 14, 10)), ('UAH', 36.8, datetime.datetime(2022, 5, 16, 10)))
+
+    # Act
+    response = client.get('/api/rates')
+
+    # Assert
+    assert response.status_code == 200
+    assert response.json['total'] == 2
+    assert {r['currency'] for r in response.json['rates']} == {'EUR', 'UAH'}
+    assert response.json['rates'][0]['addDate'] == '2022-05-14T10:00:00Z'
+
+
+def test_get_rates_by_query(client):
+    # Arrange
+    _add_rates(
+        ('UAH', 36.1, datetime.datetime(2022, 5, 14, 10)),
+        ('UAH', 36.8, datetime.datetime(2022, 5, 16, 10)),
+        ('EUR', 0.93, datetime.datetime(2022, 5, 16, 10)),
+    )
+
+    # Act
+    response = client.get('/api/rates?currencyName=UAH&startDate=2022-05-15')
+
+    # Assert
+    assert response.json['total'] == 1
+    assert response.json['rates'][0]['rate'] == 36.8
+
+
+def test_query_values_are_bound(db_client):
+    # Arrange
+    _add_rates(('EUR', 0.93, datetime.datetime(2022, 5, 16, 10)))
+
+    # Act
+    rates = RateRepository().get_rates_by_query(RatesQuery("EUR'--", None, None))
+
+    # Assert
+    assert rates == []
+
+
+def test_query_uses_currency_date_index(db_client):
+    # Act
+    plan = db_client.execute(
+        'EXPLAIN QUERY PLAN SELECT * FROM rates WHERE currency = ? AND addDate >= ?', ('EUR', 0),
+    )
+
+    # Assert
+    assert 'rates_currency_add_date_idx' in plan[0][-1]
+
+
+def test_unfiltered_pagination_uses_add_date_index(db_client):
+    # Act
+    plan = db_client.execute(
+        'EXPLAIN QUERY PLAN SELECT * FROM rates WHERE (addDate, rowid) > (?, ?) ORDER BY addDate, rowid', (0, 0),
+    )
+
+    # Assert
+    assert [step[-1] for step in plan] == ['SEARCH rates USING INDEX rates_add_date_idx (addDate>?)']
+
+
+def test_new_db_uses_incremental_auto_vacuum(db_client):
+    # Act
+    auto_vacuum = db_client.execute('PRAGMA auto_vacuum')
+    vacuumed_pages = PartitionRepository().incremental_vacuum()
+
+    # Assert
+    assert auto_vacuum == [(2,)]
+    assert vacuumed_pages is not None
+
+
+def test_legacy_iso_dates_are_migrated(tmp_path):
+    # Arrange
+    connection = sqlite3.connect(tmp_path / 'legacy.sqlite')
+    connection.execute(
+        'CREATE TABLE rates(id STRING PRIMARY KEY NOT NULL, baseCurrency char(3) NOT NULL, '
+        'currency char(3) NOT NULL, rate REAL NOT NULL, addDate TIMESTAMP NOT NULL)'
+    )
+    connection.execute(
+        "INSERT INTO rates VALUES "
+        "('96a16d23-0dbd-4473-a451-1e77fd684c3a', 'USD', 'UAH', 36.8019, '2022-12-28 01:27:53.458332')"
+    )
+
+    # Act
+    for migration in db_setup.MIGRATIONS:
+        migration(connection.cursor())
+    row = connection.execute('SELECT id, baseCurrency, currency, rate, addDate FROM rates').fetchone()
+
+    # Assert
+    assert connection.execute('PRAGMA auto_vacuum').fetchone() == (2,)
+    assert Rate.from_tuple(row) == Rate(
+        id='96a16d23-0dbd-4473-a451-1e77fd684c3a',
+        baseCurrency='USD',
+        currency='UAH',
+        rate=36.8019,
+        addDate=datetime.datetime(2022, 12, 28, 1, 27, 53),
+    )
+
+
+def test_keyset_pagination(client):
+    # Arrange
+    _add_rates(*[('EUR', 90 + i, datetime.datetime(2022, 5, 1 + i)) for i in range(5)])
+
+    # Act
+    first = client.get('/api/rates?currencyName=EUR&limit=2').json
+    second = client.get(f'/api/rates?currencyName=EUR&limit=2&after={first["next"]}').json
+    last = client.get(f'/api/rates?currencyName=EUR&limit=2&after={second["next"]}').json
+
+    # Assert
+    assert [r['rate'] for r in first['rates'] + second['rates'] + last['rates']] == [90, 91, 92, 93, 94]
+    assert last['next'] is None
+
+
+def test_invalid_page_params(client):
+    # Act
+    response = client.get('/api/rates?limit=abc')
+
+    # Assert
+    assert response.status_code == 400
+
+
+def test_streamed_rates_match_regular_response(client):
+    # Arrange
+    _add_rates(*[('UAH', 36 + i, datetime.datetime(2022, 5, 1, i)) for i in range(7)])
+
+    # Act
+    regular = client.get('/api/rates?currencyName=UAH&limit=5').json
+    streamed = client.get('/api/rates?currencyName=UAH&limit=5&stream=1')
+
+    # Assert
+    assert streamed.is_streamed
+    assert json.loads(streamed.data) == regular
+
+
+def test_responses_are_cached_until_next_batch(client):
+    # Arrange
+    _add_rates(('EUR', 0.93, datetime.datetime(2022, 5, 16, 10)))
+
+    # Act
+    first = client.get('/api/rates?currencyName=EUR')
+    second = client.get('/api/rates?currencyName= EUR ')
+    _add_rates(('EUR', 0.95, datetime.datetime(2022, 5, 17, 10)))
+    third = client.get('/api/rates?currencyName=EUR')
+
+    # Assert
+    assert first.headers['X-Cache'] == 'MISS'
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.data == first.data
+    assert third.headers['X-Cache'] == 'MISS'
+    assert third.json['total'] == 2
+    assert GetRatesService().response_cache.stats() == {'hits': 1, 'misses': 2, 'size': 1, 'bytes': len(third.data)}
+
+
+def test_response_cache_is_bounded_by_bytes():
+    # Arrange
+    cache = ResponseCache(max_size=10, ttl=60, max_bytes=10, max_entry_bytes=6)
+
+    # Act
+    cache.set('a', 0, b'aaaa')
+    cache.set('b', 0, b'bbbb')
+    cache.set('c', 0, b'cccc')
+    cache.set('huge', 0, b'x' * 7)
+
+    # Assert
+    assert cache.get('a', 0) is None
+    assert (cache.get('b', 0), cache.get('c', 0)) == (b'bbbb', b'cccc')
+    assert cache.get('huge', 0) is None
+    assert cache.stats()['bytes'] == 8
+
+
+def test_conditional_get_returns_not_modified_until_next_batch(client):
+    # Arrange
+    _add_rates(('EUR', 0.93, datetime.datetime(2022, 5, 16, 10)))
+    first = client.get('/api/rates?currencyName=EUR')
+    etag = first.headers['ETag']
+
+    # Act
+    with (
+        patch.object(DBClient, 'execute', side_effect=AssertionError('DB must not be queried')),
+        patch.object(DBClient, 'iterate', side_effect=AssertionError('DB must not be queried')),
+    ):
+        not_modified = client.get('/api/rates?currencyName=EUR', headers={'If-None-Match': etag})
+    other_query = client.get('/api/rates?currencyName=UAH', headers={'If-None-Match': etag})
+    streamed = client.get('/api/rates?currencyName=EUR&stream=1')
+    _add_rates(('EUR', 0.95, datetime.datetime(2022, 5, 17, 10)))
+    modified = client.get('/api/rates?currencyName=EUR', headers={'If-None-Match': etag})
+
+    # Assert
+    assert not_modified.status_code == 304
+    assert not_modified.data == b''
+    assert not_modified.headers['ETag'] == etag
+    assert other_query.status_code == 200
+    assert streamed.headers['ETag'] == etag
+    assert modified.status_code == 200
+    assert modified.json['total'] == 2
+    assert modified.headers['ETag'] != etag
+
+
+def test_matching_etag_does_not_query_db_after_write_by_another_process(client):
+    # Arrange
+    _add_rates(('EUR', 0.93, datetime.datetime(2022, 5, 16, 10)))
+    stale_etag = client.get('/api/rates?currencyName=EUR').headers['ETag']
+    pid = os.fork()
+    if pid == 0:
+        _add_rates(('EUR', 0.95, datetime.datetime(2022, 5, 17, 10)))
+        os._exit(0)
+    os.waitpid(pid, 0)
+    etag = client.get('/api/rates?currencyName=EUR').headers['ETag']
+
+    # Act
+    with (
+        patch.object(DBClient, 'execute', side_effect=AssertionError('DB must not be queried')),
+        patch.object(DBClient, 'iterate', side_effect=AssertionError('DB must not be queried')),
+    ):
+        not_modified = client.get('/api/rates?currencyName=EUR', headers={'If-None-Match': etag})
+
+    # Assert
+    assert etag != stale_etag
+    assert not_modified.status_code == 304
+
+
+def test_concurrent_identical_requests_share_one_query(client):
+    # Arrange
+    _add_rates(('EUR', 0.93, datetime.datetime(2022, 5, 16, 10)))
+    service = GetRatesService()
+    iter_rows, queries = RateRepository.iter_rows, []
+
+    def slow_iter_rows(self, query, page):
+        # hold the first query until the other requests are waiting for it
+        queries.append(query)
+        deadline = time.monotonic() + 5
+        while service._single_flight.coalesced < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return iter_rows(self, query, page)
+
+    responses = []
+
+    def get() -> None:
+        responses.append(client.application.test_client().get('/api/rates?currencyName=EUR'))
+
+    # Act
+    with patch.object(RateRepository, 'iter_rows', slow_iter_rows):
+        threads = [threading.Thread(target=get) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    # Assert
+    assert len(queries) == 1
+    assert sorted(r.headers['X-Cache'] for r in responses) == ['COALESCED'] * 3 + ['MISS']
+    assert len({r.data for r in responses}) == 1
+
+
+@patch('src.tasks.rate_puller.CurrencyClient')
+def test_latest_rates_are_served_from_snapshot(mock_currency_client, client):
+    # Arrange
+    _add_rates(('EUR', 0.91, datetime.datetime(2022, 5, 14, 10)), ('EUR', 0.92, datetime.datetime(2022, 5, 15, 10)))
+    LatestRatesSnapshot().refresh()
+    mock_currency_client.return_value.get_rates.return_value = {'rates': {'USD': 1.0, 'EUR': 0.95}}
+
+    # Act
+    before = client.get('/api/rates/latest?currencyName=EUR').json
+    with patch('src.tasks.rate_puller.get_settings', return_value=replace(get_settings(), CURRENCIES_TO_FIND=['EUR'])):
+        rate_puller.pull_rates()
+    with patch.object(DBClient, 'execute', side_effect=AssertionError('DB must not be queried')):
+        after = client.get('/api/rates/latest?currencyName=EUR,USD').json
+
+    # Assert
+    assert [r['rate'] for r in before['rates']] == [0.92]
+    assert {r['currency']: r['rate'] for r in after['rates']} == {'EUR': 0.95}
+
+
+def test_snapshot_sees_rates_written_by_another_process(client):
+    # Arrange
+    _add_rates(('EUR', 0.91, datetime.datetime(2022, 5, 14, 10)))
+    LatestRatesSnapshot().refresh()
+    etag = client.get('/api/rates').headers['ETag']
+
+    # Act
+    pid = os.fork()
+    if pid == 0:
+        _add_rates(('EUR', 0.95, datetime.datetime(2022, 5, 15, 10)), ('GBP', 0.8, datetime.datetime(2022, 5, 15, 10)))
+        os._exit(0)
+    os.waitpid(pid, 0)
+    response = client.get('/api/rates/latest').json
+    with patch.object(DBClient, 'execute', side_effect=AssertionError('DB must not be queried')):
+        caught_up = client.get('/api/rates/latest').json
+    rates = client.get('/api/rates', headers={'If-None-Match': etag})
+
+    # Assert
+    assert {r['currency']: r['rate'] for r in response['rates']} == {'EUR': 0.95, 'GBP': 0.8}
+    assert caught_up == response
+    assert rates.status_code == 200
+    assert rates.json['total'] == 3
+
+
+def test_async_handler_runs_on_handler_pool(client):
+    # Arrange
+    _add_rates(('EUR', 0.91, datetime.datetime(2022, 5, 14, 10)))
+    from main import app
+
+    # Act
+    with app.test_request_context('/api/rates/latest?currencyName=EUR'):
+        response = asyncio.run(GetLatestRatesService().handle_request_async(request))
+
+    # Assert
+    assert response.json['rates'][0]['rate'] == 0.91
+    assert HandlerPool()._executor is not None
+
+
+def test_prefork_worker_serves_on_its_own_db_pool(db_client):
+    # Arrange
+    _add_rates(('EUR', 0.91, datetime.datetime(2022, 5, 14, 10)))
+    # a warm connection idle in the supervisor's pool, a worker must not use it
+    parent_connection = db_client._pool.acquire()
+    db_client._pool.release(parent_connection)
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+
+    def app(environ, start_response):
+        pool = db_client._pool
+        state = {'pid': os.getpid(), 'pool_pid': pool._pid, 'idle': pool._idle.qsize(), 'created': pool._created}
+        state['rows'] = db_client.execute('SELECT count(*) from rates')[0][0]
+        start_response('200 OK', [('Content-Type', 'application/json')])
+        return [json.dumps(state).encode()]
+
+    # Act
+    supervisor = os.fork()
+    if supervisor == 0:
+        try:
+            PreforkServer(app, '127.0.0.1', port, 1).run()
+        finally:
+            os._exit(0)
+    try:
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1) as response:
+                    state = json.load(response)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+    finally:
+        os.kill(supervisor, signal.SIGTERM)
+        _, status = os.waitpid(supervisor, 0)
+
+    # Assert
+    assert state['pid'] not in (os.getpid(), supervisor)
+    assert state['pool_pid'] == state['pid']
+    assert (state['idle'], state['created']) == (0, 0)
+    assert state['rows'] == 1
+    assert os.waitstatus_to_exitcode(status) == 0
+
+
+def test_convert_cross_rate(client):
+    # Arrange
+    _add_rates(('EUR', 0.8, datetime.datetime(2022, 5, 14, 10)), ('GBP', 0.5, datetime.datetime(2022, 5, 14, 10)))
+    LatestRatesSnapshot().refresh()
+
+    # Act
+    single = client.get('/api/convert?fromCurrency=EUR&toCurrency=GBP&amount=100').json
+    batch = client.post('/api/convert', json={'conversions': [
+        {'fromCurrency': 'GBP', 'toCurrency': 'EUR', 'amount': 10},
+        {'fromCurrency': 'USD', 'toCurrency': 'GBP', 'amount': 3},
+    ]}).json
+
+    # Assert
+    assert single['conversions'][0]['result'] == pytest.approx(62.5)
+    assert [c['result'] for c in batch['conversions']] == pytest.approx([16.0, 1.5])
+
+
+def test_convert_at_historical_date(client):
+    # Arrange
+    _add_rates(
+        ('EUR', 0.8, datetime.datetime(2022, 5, 14, 10)),
+        ('EUR', 0.9, datetime.datetime(2022, 5, 16, 10)),
+        ('GBP', 0.5, datetime.datetime(2022, 5, 13, 10)),
+    )
+
+    # Act
+    response = client.get('/api/convert?fromCurrency=GBP&toCurrency=EUR&amount=1&date=2022-05-15').json
+
+    # Assert
+    assert response['conversions'][0]['rate'] == pytest.approx(1.6)
+
+
+def test_convert_unknown_currency(client):
+    # Act
+    response = client.get('/api/convert?fromCurrency=EUR&toCurrency=XXX')
+
+    # Assert
+    assert response.status_code == 400
+
+
+def test_rollups_are_maintained_on_insert_and_match_backfill(client):
+    # Arrange
+    utc = datetime.timezone.utc
+    _add_rates(
+        ('EUR', 0.92, datetime.datetime(2022, 5, 16, 10, tzinfo=utc)),
+        ('EUR', 0.90, datetime.datetime(2022, 5, 16, 11, tzinfo=utc)),
+    )
+    _add_rates(
+        ('EUR', 0.95, datetime.datetime(2022, 5, 16, 12, tzinfo=utc)),
+        ('EUR', 0.93, datetime.datetime(2022, 5, 17, 9, tzinfo=utc)),
+    )
+
+    # Act
+    incremental = client.get('/api/rates/aggregate?currencyName=EUR&interval=day&startDate=2022-05-16').json
+    RollupRepository().rebuild()
+    backfilled = client.get('/api/rates/aggregate?currencyName=EUR&interval=day&startDate=2022-05-16').json
+
+    # Assert
+    first_day = incremental['rollups'][0]
+    assert incremental['total'] == 2
+    assert first_day['bucket'] == '2022-05-16T00:00:00Z'
+    assert (first_day['open'], first_day['close'], first_day['min'], first_day['max']) == (0.92, 0.95, 0.90, 0.95)
+    assert first_day['avg'] == pytest.approx(0.9233, abs=1e-4)
+    assert first_day['count'] == 3
+    assert backfilled == incremental
+
+
+def test_week_rollups_start_on_monday(client):
+    # Arrange
+    _add_rates(('EUR', 0.92, datetime.datetime(2022, 5, 19, 10, tzinfo=datetime.timezone.utc)))
+
+    # Act
+    response = client.get('/api/rates/aggregate?currencyName=EUR&interval=week').json
+
+    # Assert
+    assert response['rollups'][0]['bucket'] == '2022-05-16T00:00:00Z'
+
+
+def test_row_encoder_matches_rate_dict():
+    # Arrange
+    rate = Rate(baseCurrency='USD', currency='UAH', rate=36.8019, addDate=datetime.datetime(2022, 12, 28, 1, 27, 53))
+    encoder = RateRowEncoder(get_settings().TIME_FORMAT)
+
+    base, currency, fixed_rate, timestamp, id_ = rate.to_tuple()
+
+    # Act
+    encoded = encoder.encode((id_, base, currency, fixed_rate, timestamp))
+
+    # Assert
+    assert json.loads(encoded) == rate.to_dict()
+
+
+def test_metrics_endpoint(client):
+    # Arrange
+    _add_rates(('EUR', 0.93, datetime.datetime(2022, 5, 16, 10)))
+    client.get('/api/rates?currencyName=EUR')
+    client.get('/api/rates?currencyName=EUR')
+
+    # Act
+    response = client.get('/metrics')
+    metrics = response.data.decode()
+
+    # Assert
+    assert response.mimetype == 'text/plain'
+    assert 'http_request_duration_seconds_count{endpoint="/api/rates",method="GET",status="200"}' in metrics
+    assert 'db_query_rows_total{operation="select"}' in metrics
+    assert 'db_query_duration_seconds_bucket{operation="insert",le="+Inf"}' in metrics
+    assert 'rates_serialization_duration_seconds_count' in metrics
+    assert 'rates_response_cache_hits_total 1.0' in metrics
+
+
+def test_maintenance_archives_old_months_and_queries_are_routed(client):
+    # Arrange
+    utc = datetime.timezone.utc
+    _add_rates(*[('EUR', 90 + day, datetime.datetime(2022, month, day, 10, tzinfo=utc))
+                 for month in (1, 2, 3) for day in (1, 2)])
+
+    # Act
+    stats = maintenance.run_maintenance(now=datetime.datetime(2022, 3, 15, tzinfo=utc))
+    february_tables = PartitionRepository().get_tables(
+        int(datetime.datetime(2022, 2, 1, tzinfo=utc).timestamp()), int(datetime.datetime(2022, 2, 2, tzinfo=utc).timestamp()),
+    )
+    everything = client.get('/api/rates').json
+    february = client.get('/api/rates?currencyName=EUR&startDate=2022-02-01&endDate=2022-02-28').json
+    first_page = client.get('/api/rates?currencyName=EUR&limit=3').json
+    second_page = client.get(f'/api/rates?currencyName=EUR&limit=3&after={first_page["next"]}').json
+    converted = client.get('/api/convert?fromCurrency=USD&toCurrency=EUR&date=2022-01-05').json
+
+    # Assert
+    assert stats['archived_rows'] == 4
+    assert february_tables == ['rates_202202', 'rates']
+    assert everything['total'] == 6
+    assert [r['rate'] for r in february['rates']] == [91, 92]
+    assert [r['rate'] for r in first_page['rates'] + second_page['rates']] == [91, 92, 91, 92, 91, 92]
+    assert converted['conversions'][0]['rate'] == 92
+
+
+def test_maintenance_downsamples_and_drops_old_partitions(client):
+    # Arrange
+    utc = datetime.timezone.utc
+    _add_rates(*[('EUR', 90 + hour, datetime.datetime(2022, month, 1, hour, tzinfo=utc))
+                 for month in (1, 2, 4) for hour in range(3)])
+    settings = replace(get_settings(), RATES_DOWNSAMPLE_AFTER_MONTHS=1, RATES_DOWNSAMPLE_RESOLUTION=86400,
+                       RATES_RETENTION_MONTHS=2)
+
+    # Act
+    with patch('src.tasks.maintenance.get_settings', return_value=settings):
+        stats = maintenance.run_maintenance(now=datetime.datetime(2022, 4, 15, tzinfo=utc))
+    rates = client.get('/api/rates?currencyName=EUR').json
+    january = client.get('/api/rates/aggregate?currencyName=EUR&interval=day&endDate=2022-01-31').json
+
+    # Assert
+    assert stats['dropped_partitions'] == 1
+    assert stats['downsampled_rows'] == 2
+    assert [(r['addDate'], r['rate']) for r in rates['rates']][:1] == [('2022-02-01T02:00:00Z', 92)]
+    assert rates['total'] == 4
+    assert january['rollups'][0]['count'] == 3
+
+
+def test_rates_archived_into_a_downsampled_partition_are_downsampled(client):
+    # Arrange
+    utc = datetime.timezone.utc
+    _add_rates(*[('EUR', 90 + hour, datetime.datetime(2022, month, 1, hour, tzinfo=utc))
+                 for month in (1, 3) for hour in range(3)])
+    settings = replace(get_settings(), RATES_DOWNSAMPLE_AFTER_MONTHS=1, RATES_DOWNSAMPLE_RESOLUTION=86400)
+    with patch('src.tasks.maintenance.get_settings', return_value=settings):
+        maintenance.run_maintenance(now=datetime.datetime(2022, 3, 15, tzinfo=utc))
+
+    # Act
+    _add_rates(*[('EUR', 80 + hour, datetime.datetime(2022, 1, 2, hour, tzinfo=utc)) for hour in range(3)])
+    _add_rates(('EUR', 99, datetime.datetime(2022, 3, 2, tzinfo=utc)))
+    with patch('src.tasks.maintenance.get_settings', return_value=settings):
+        stats = maintenance.run_maintenance(now=datetime.datetime(2022, 3, 15, tzinfo=utc))
+    january = client.get('/api/rates?currencyName=EUR&endDate=2022-01-31').json
+
+    # Assert
+    assert stats['archived_rows'] == 3
+    assert stats['downsampled_rows'] == 2
+    assert [(r['addDate'], r['rate']) for r in january['rates']] == [
+        ('2022-01-01T02:00:00Z', 92), ('2022-01-02T02:00:00Z', 82),
+    ]
+    assert [p.resolution for p in PartitionRepository().get_partitions()] == [86400]
+
+
+@pytest.mark.parametrize('fmt', ['ndjson', 'csv'])
+def test_export_import_round_trip(client, tmp_path, fmt):
+    # Arrange
+    _add_rates(('EUR', 0.93, datetime.datetime(2022, 5, 16, 10)), ('UAH', 36.8, datetime.datetime(2022, 5, 17, 10)))
+    path = str(tmp_path / f'rates.{fmt}')
+    before = client.get('/api/rates').json
+
+    # Act
+    exported = bulk_rates.export_rates(path)
+    db_client = DBClient(get_settings().DB_CONNECTION_URL)
+    db_client.execute('DELETE FROM rates')
+    imported = bulk_rates.import_rates(path, chunk_size=1)
+    imported_again = bulk_rates.import_rates(path, defer_indexes=False)
+    after = client.get('/api/rates').json
+
+    # Assert
+    assert (exported, imported, imported_again) == (2, 2, 0)
+    assert after == before
+    assert 'rates_currency_add_date_idx' in db_client.execute(
+        'EXPLAIN QUERY PLAN SELECT * FROM rates WHERE currency = ?', ('EUR',),
+    )[0][-1]
+
+
+def test_import_skips_rates_of_archived_months(client, tmp_path):
+    # Arrange
+    utc = datetime.timezone.utc
+    _add_rates(*[('EUR', 90 + day, datetime.datetime(2022, month, day, 10, tzinfo=utc))
+                 for month in (1, 2, 3) for day in (1, 2)])
+    path = str(tmp_path / 'rates.ndjson')
+    bulk_rates.export_rates(path)
+    now = datetime.datetime(2022, 3, 15, tzinfo=utc)
+    maintenance.run_maintenance(now=now)
+
+    # Act
+    imported = bulk_rates.import_rates(path)
+    stats = maintenance.run_maintenance(now=now)
+    rates = client.get('/api/rates').json
+
+    # Assert
+    assert imported == 0
+    assert stats['archived_rows'] == 0
+    assert rates['total'] == 6
+
+
+def test_import_keeps_rollups_of_dropped_months(client):
+    # Arrange
+    utc = datetime.timezone.utc
+    _add_rates(*[('EUR', 90 + hour, datetime.datetime(2022, month, 1, hour, tzinfo=utc))
+                 for month in (1, 2, 4) for hour in range(3)])
+    settings = replace(get_settings(), RATES_RETENTION_MONTHS=2)
+    with patch('src.tasks.maintenance.get_settings', return_value=settings):
+        maintenance.run_maintenance(now=datetime.datetime(2022, 4, 15, tzinfo=utc))
+    gbp = Rate(baseCurrency='USD', currency='GBP', rate=0.8, addDate=datetime.datetime(2022, 4, 2, tzinfo=utc))
+
+    # Act
+    imported = RateRepository().add_rates_bulk([gbp.to_tuple(), gbp.to_tuple()])
+    january = client.get('/api/rates/aggregate?currencyName=EUR&interval=day&endDate=2022-01-31').json
+    gbp_rollups = client.get('/api/rates/aggregate?currencyName=GBP&interval=day').json
+
+    # Assert
+    assert imported == 1
+    assert [rollup['count'] for rollup in january['rollups']] == [3]
+    assert [rollup['count'] for rollup in gbp_rollups['rollups']] == [1]
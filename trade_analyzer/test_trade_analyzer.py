@@ -0,0 +1,194 @@
+import csv
+import random
+from datetime import date
+from os import path
+from unittest.mock import patch
+
+from trade_analyzer import TradeAnalyzer, TradeColumns
+
+SAMPLE_PATH = path.join(path.dirname(__file__), 'files', 'trade_data.csv')
+FIELDS = ['trade_id', 'customer_id', 'trade_date', 'ticker', 'trade_type', 'quantity', 'price']
+
+
+def write_random_trades(file_path, count, seed=0):
+    rand = random.Random(seed)
+    with open(file_path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(FIELDS)
+        for trade_id in range(count):
+            writer.writerow([
+                trade_id,
+                f'C{rand.randint(1, 6)}',
+                f'2023-08-{rand.randint(1, 5):02d}',
+                rand.choice(['AAPL', 'GOOGL', 'MSFT', 'TSLA']),
+                rand.choice(['BUY', 'SELL', 'HOLD']),
+                rand.randint(0, 500),
+                round(rand.uniform(1, 3000), rand.randint(0, 3)),
+            ])
+
+
+def test_sample_file_results():
+    # Arrange
+    analyzer = TradeAnalyzer(SAMPLE_PATH)
+
+    # Act
+    volume_by_ticker = analyzer.calculate_volume_by_ticker()
+    discrepancies = analyzer.identify_potential_discrepancies()
+
+    # Assert
+    assert volume_by_ticker == {'AAPL': {'buy_volume': 460}, 'GOOGL': {'sell_volume': 260}}
+    assert volume_by_ticker['AAPL']['sell_volume'] == 0
+    assert discrepancies == [
+        {'customer_id': 'C123', 'date': date(2023, 8, 1), 'trade_count': 4},
+        {'customer_id': 'C124', 'date': date(2023, 8, 2), 'trade_count': 4},
+    ]
+    assert analyzer.calculate_average_price('AAPL') == 165.0
+    assert analyzer.calculate_average_price('MSFT') == 0
+    assert [trade.quantity for trade in analyzer.get_trades_by_ticker_and_date('GOOGL', '2023-08-02')] == [50, 60, 70, 80]
+
+
+def read_rows(file_path):
+    with open(file_path) as csv_file:
+        return list(csv.DictReader(csv_file))
+
+
+def test_results_match_a_loop_over_the_csv_rows(tmp_path):
+    # Arrange
+    file_path = str(tmp_path / 'trades.csv')
+    write_random_trades(file_path, 2000)
+    rows = read_rows(file_path)
+    analyzer = TradeAnalyzer(file_path)
+
+    # Act
+    volume_by_ticker = analyzer.calculate_volume_by_ticker()
+    discrepancies = analyzer.identify_potential_discrepancies()
+
+    # Assert
+    expected_volumes = {}
+    for row in rows:
+        if row['trade_type'] in ('BUY', 'SELL'):
+            volume = expected_volumes.setdefault(row['ticker'], {})
+            key = f"{row['trade_type'].lower()}_volume"
+            volume[key] = volume.get(key, 0) + int(row['quantity'])
+    assert [(ticker, list(volume.items())) for ticker, volume in volume_by_ticker.items()] == \
+           [(ticker, list(volume.items())) for ticker, volume in expected_volumes.items()]
+
+    trade_counts = {}
+    for row in rows:
+        customer_counts = trade_counts.setdefault(row['customer_id'], {})
+        customer_counts[row['trade_date']] = customer_counts.get(row['trade_date'], 0) + 1
+    assert [(d['customer_id'], d['date'].isoformat(), d['trade_count']) for d in discrepancies] == [
+        (customer_id, day, count)
+        for customer_id, customer_counts in trade_counts.items()
+        for day, count in customer_counts.items() if count > 3
+    ]
+
+    for ticker in ('AAPL', 'GOOGL', 'MSFT', 'TSLA'):
+        total, count = 0, 0
+        for row in rows:
+            if row['ticker'] == ticker:
+                total += float(row['price'])
+                count += 1
+        assert analyzer.calculate_average_price(ticker) == total / count
+
+    trades = analyzer.get_trades_by_ticker_and_date('MSFT', '2023-08-03')
+    assert [(trade.trade_id, trade.customer_id, trade.trade_type, trade.quantity, trade.price) for trade in trades] == [
+        (int(row['trade_id']), row['customer_id'], row['trade_type'], int(row['quantity']), float(row['price']))
+        for row in rows if row['ticker'] == 'MSFT' and row['trade_date'] == '2023-08-03'
+    ]
+
+
+def test_blank_lines_are_skipped(tmp_path):
+    # Arrange
+    file_path = tmp_path / 'trades.csv'
+    with open(SAMPLE_PATH) as sample:
+        file_path.write_text(sample.read().replace('\n', '\n\n', 1) + '\n\n')
+
+    # Act
+    analyzer = TradeAnalyzer(str(file_path))
+
+    # Assert
+    assert len(analyzer.trades) == 8
+    assert analyzer.calculate_average_price('AAPL') == 165.0
+
+
+def test_results_follow_changes_to_the_trades():
+    # Arrange
+    analyzer = TradeAnalyzer(SAMPLE_PATH)
+    googl_trades = analyzer.get_trades_by_ticker_and_date('GOOGL', '2023-08-02')
+
+    # Act
+    analyzer.trades[0].quantity = 1000
+    analyzer.trades.pop()
+    analyzer.invalidate()
+    changed_volumes = analyzer.calculate_volume_by_ticker()
+    analyzer.trades = analyzer.trades[:4]
+    replaced_volumes = analyzer.calculate_volume_by_ticker()
+
+    # Assert
+    assert len(googl_trades) == 4
+    assert changed_volumes == {'AAPL': {'buy_volume': 1360}, 'GOOGL': {'sell_volume': 180}}
+    assert replaced_volumes == {'AAPL': {'buy_volume': 1360}}
+    assert analyzer.identify_potential_discrepancies() == [
+        {'customer_id': 'C123', 'date': date(2023, 8, 1), 'trade_count': 4},
+    ]
+
+
+def test_results_come_from_cached_columns():
+    # Arrange
+    analyzer = TradeAnalyzer(SAMPLE_PATH)
+
+    # Act
+    with patch.object(TradeColumns, 'from_trades', side_effect=TradeColumns.from_trades) as from_trades:
+        trade_count = len(analyzer.trades)
+        loaded_volumes = analyzer.calculate_volume_by_ticker()
+        loaded_rebuilds = from_trades.call_count
+        analyzer.trades = analyzer.trades[:4]
+        for _ in range(3):
+            replaced_volumes = analyzer.calculate_volume_by_ticker()
+            analyzer.calculate_average_price('AAPL')
+
+    # Assert
+    assert trade_count == 8
+    assert loaded_rebuilds == 0
+    assert from_trades.call_count == 1
+    assert loaded_volumes == {'AAPL': {'buy_volume': 460}, 'GOOGL': {'sell_volume': 260}}
+    assert replaced_volumes == {'AAPL': {'buy_volume': 460}}
+
+
+def test_customer_trades_can_be_changed():
+    # Arrange
+    analyzer = TradeAnalyzer(SAMPLE_PATH)
+    customer_trades = analyzer.customer_trades
+
+    # Act
+    customer_trades['C125'].extend(customer_trades['C124'])
+    analyzer.customer_trades = customer_trades
+    changed_discrepancies = analyzer.identify_potential_discrepancies()
+    analyzer.customer_trades = {}
+
+    # Assert
+    assert [(customer_id, len(trades)) for customer_id, trades in customer_trades.items()] == [
+        ('C123', 4), ('C124', 4), ('C125', 4),
+    ]
+    assert changed_discrepancies == [
+        {'customer_id': 'C123', 'date': date(2023, 8, 1), 'trade_count': 4},
+        {'customer_id': 'C124', 'date': date(2023, 8, 2), 'trade_count': 4},
+        {'customer_id': 'C125', 'date': date(2023, 8, 2), 'trade_count': 4},
+    ]
+    assert analyzer.customer_trades == {}
+    assert analyzer.identify_potential_discrepancies() == []
+
+
+def test_missing_file_has_no_trades(tmp_path):
+    # Arrange
+    analyzer = TradeAnalyzer(str(tmp_path / 'missing.csv'))
+
+    # Act
+    volume_by_ticker = analyzer.calculate_volume_by_ticker()
+
+    # Assert
+    assert volume_by_ticker == {}
+    assert analyzer.identify_potential_discrepancies() == []
+    assert analyzer.calculate_average_price('AAPL') == 0
+    assert analyzer.trades == []
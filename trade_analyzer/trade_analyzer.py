@@ -1,8 +1,11 @@
 import csv
+from array import array
 from collections import defaultdict
-from datetime import datetime
+from datetime import date, datetime
 from os import path
-from typing import List, Dict, Union
+from typing import Dict, Iterable, Iterator, List, Union
+
+import numpy as np
 
 
 class Trade:
@@ -38,10 +41,204 @@ class Trade:
         self.price = price
 
 
+class TradeColumns:
+    """
+    Trades stored column by column in NumPy arrays, a few dozen bytes per trade.
+
+    Customers, tickers and trade types are dictionary-encoded: each column holds the index of the value
+    in its list of distinct values, in the order they first appear. Dates are held as day ordinals.
+
+    Attributes:
+        trade_ids (np.ndarray): Trade identifiers.
+        customers (np.ndarray): Customer codes, indexes of customer_ids.
+        dates (np.ndarray): Trade dates as proleptic Gregorian ordinals.
+        tickers (np.ndarray): Ticker codes, indexes of ticker_symbols.
+        trade_types (np.ndarray): Trade type codes, indexes of trade_type_names.
+        quantities (np.ndarray): Number of shares traded.
+        prices (np.ndarray): Price of the stock at the time of the trade.
+    """
+
+    def __init__(self):
+        self.customer_ids: List[str] = []
+        self.ticker_symbols: List[str] = []
+        self.trade_type_names: List[str] = []
+        self.trade_ids = np.zeros(0, dtype=np.int64)
+        self.customers = np.zeros(0, dtype=np.intc)
+        self.dates = np.zeros(0, dtype=np.int64)
+        self.tickers = np.zeros(0, dtype=np.intc)
+        self.trade_types = np.zeros(0, dtype=np.intc)
+        self.quantities = np.zeros(0, dtype=np.int64)
+        self.prices = np.zeros(0, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.trade_ids)
+
+    @classmethod
+    def from_csv(cls, file_path: str) -> 'TradeColumns':
+        """
+        Loads trade data from a CSV file.
+
+        Args:
+            file_path (str): The path to the CSV file containing trade data.
+
+        Returns:
+            TradeColumns: The trades, no trades if the file does not exist.
+        """
+        columns = cls()
+        try:
+            with open(file_path, newline='') as csv_file:
+                columns._load(cls._read_rows(csv.reader(csv_file)))
+        except FileNotFoundError as err:
+            print(err)
+        return columns
+
+    @classmethod
+    def from_trades(cls, trades: List[Trade]) -> 'TradeColumns':
+        columns = cls()
+        columns._load(_trade_row(trade, trade.customer_id) for trade in trades)
+        return columns
+
+    @classmethod
+    def from_customer_trades(cls, customer_trades: Dict[str, List[Trade]]) -> 'TradeColumns':
+        # each trade as a trade of the customer it is listed under, customers in the order of the mapping
+        columns = cls()
+        columns._load(
+            _trade_row(trade, customer_id) for customer_id, trades in customer_trades.items() for trade in trades
+        )
+        return columns
+
+    def trade(self, index: int) -> Trade:
+        return Trade(
+            int(self.trade_ids[index]),
+            self.customer_ids[self.customers[index]],
+            date.fromordinal(int(self.dates[index])).isoformat(),
+            self.ticker_symbols[self.tickers[index]],
+            self.trade_type_names[self.trade_types[index]],
+            int(self.quantities[index]),
+            float(self.prices[index])
+        )
+
+    def to_trades(self) -> List[Trade]:
+        return [self.trade(index) for index in range(len(self))]
+
+    @staticmethod
+    def _read_rows(csv_reader) -> Iterator[tuple]:
+        # (trade_id, customer_id, date ordinal, ticker, trade_type, quantity, price) of each CSV row
+        header = next(csv_reader, None)
+        if header is None:
+            return
+        fields = [header.index(name) for name in (
+            'trade_id', 'customer_id', 'trade_date', 'ticker', 'trade_type', 'quantity', 'price'
+        )]
+        # a file holds few distinct dates, each one is parsed once
+        ordinals = {}
+        for row in csv_reader:
+            # blank lines are skipped, like csv.DictReader does
+            if not row:
+                continue
+            trade_id, customer_id, trade_date, ticker, trade_type, quantity, price = (row[i] for i in fields)
+            ordinal = ordinals.get(trade_date)
+            if ordinal is None:
+                ordinal = ordinals[trade_date] = datetime.strptime(trade_date, '%Y-%m-%d').toordinal()
+            yield int(trade_id), customer_id, ordinal, ticker, trade_type, int(quantity), float(price)
+
+    def _load(self, rows: Iterable[tuple]) -> None:
+        trade_ids, dates, quantities = array('q'), array('q'), array('q')
+        customers, tickers, trade_types = array('i'), array('i'), array('i')
+        prices = array('d')
+        customer_codes, ticker_codes, trade_type_codes = {}, {}, {}
+        for trade_id, customer_id, ordinal, ticker, trade_type, quantity, price in rows:
+            trade_ids.append(trade_id)
+            customers.append(customer_codes.setdefault(customer_id, len(customer_codes)))
+            dates.append(ordinal)
+            tickers.append(ticker_codes.setdefault(ticker, len(ticker_codes)))
+            trade_types.append(trade_type_codes.setdefault(trade_type, len(trade_type_codes)))
+            quantities.append(quantity)
+            prices.append(price)
+
+        self.customer_ids = list(customer_codes)
+        self.ticker_symbols = list(ticker_codes)
+        self.trade_type_names = list(trade_type_codes)
+        self.trade_ids = np.frombuffer(trade_ids, dtype=np.int64)
+        self.customers = np.frombuffer(customers, dtype=np.intc)
+        self.dates = np.frombuffer(dates, dtype=np.int64)
+        self.tickers = np.frombuffer(tickers, dtype=np.intc)
+        self.trade_types = np.frombuffer(trade_types, dtype=np.intc)
+        self.quantities = np.frombuffer(quantities, dtype=np.int64)
+        self.prices = np.frombuffer(prices, dtype=np.float64)
+
+
+def _trade_row(trade: Trade, customer_id: str) -> tuple:
+    # a row as TradeColumns._load takes it
+    return (
+        trade.trade_id, customer_id, trade.trade_date.toordinal(), trade.ticker,
+        trade.trade_type, trade.quantity, trade.price
+    )
+
+
+def _code(values: List[str], value: str) -> int:
+    # the code of a dictionary-encoded value, -1 if no trade has it
+    try:
+        return values.index(value)
+    except ValueError:
+        return -1
+
+
 class TradeAnalyzer:
+    """
+    Analyzes the trades of a CSV file.
+
+    Results are computed on columns (see TradeColumns). `trades` is built from them when first read and can be
+    replaced: the columns are then rebuilt once, on the next call. After changing the trades in place,
+    call invalidate(). `customer_trades` is a view of `trades` grouped by customer until a mapping is assigned
+    to it, potential discrepancies are then counted on that mapping.
+    """
+
     def __init__(self, file_path: str):
-        self.trades = self.load_trades(file_path)
-        self.customer_trades = defaultdict(list)
+        self.columns = TradeColumns.from_csv(file_path)
+        self._trades = None
+        self._trades_columns = None
+        self._customer_trades = None
+        self._customer_trades_assigned = False
+        self._customer_columns = None
+
+    @property
+    def trades(self) -> List[Trade]:
+        # built from the columns when first asked for, the columns stay valid until the trades are changed
+        if self._trades is None:
+            self._trades = self.columns.to_trades()
+            self._trades_columns = self.columns
+        return self._trades
+
+    @trades.setter
+    def trades(self, trades: List[Trade]) -> None:
+        self._trades = trades
+        self.invalidate()
+
+    @property
+    def customer_trades(self) -> Dict[str, List[Trade]]:
+        # the trades grouped by customer, regrouped after the trades change unless a mapping was assigned
+        if self._customer_trades is None:
+            self._customer_trades = defaultdict(list)
+            for trade in self.trades:
+                self._customer_trades[trade.customer_id].append(trade)
+        return self._customer_trades
+
+    @customer_trades.setter
+    def customer_trades(self, customer_trades: Dict[str, List[Trade]]) -> None:
+        # from then on potential discrepancies are counted on this mapping, see identify_potential_discrepancies
+        self._customer_trades = customer_trades
+        self._customer_trades_assigned = True
+        self._customer_columns = None
+
+    def invalidate(self) -> None:
+        """
+        Drops the columns built from `trades` and `customer_trades`, to be called after changing either in place.
+        """
+        self._trades_columns = None
+        self._customer_columns = None
+        if not self._customer_trades_assigned:
+            self._customer_trades = None
 
     @staticmethod
     def load_trades(file_path: str) -> List[Trade]:
@@ -54,24 +251,7 @@ class TradeAnalyzer:
         Returns:
             List[Trade]: A list of Trade objects.
         """
-        trades = []
-        try:
-            with open(file_path) as csv_file:
-                csv_reader = csv.DictReader(csv_file)
-                for row in csv_reader:
-                    trade = Trade(
-                        int(row['trade_id']),
-                        row['customer_id'],
-                        row['trade_date'],
-                        row['ticker'],
-                        row['trade_type'],
-                        int(row['quantity']),
-                        float(row['price'])
-                    )
-                    trades.append(trade)
-        except FileNotFoundError as err:
-            print(err)
-        return trades
+        return TradeColumns.from_csv(file_path).to_trades()
 
     def calculate_volume_by_ticker(self) -> Dict[str, Dict[str, int]]:
         """
@@ -80,36 +260,70 @@ class TradeAnalyzer:
         Returns:
             Dict[str, Dict[str, int]]: A dictionary mapping ticker symbols to buy and sell volumes.
         """
-        volume_by_ticker = defaultdict(lambda: defaultdict(int))
-        for trade in self.trades:
-            if trade.trade_type == 'BUY':
-                volume_by_ticker[trade.ticker]['buy_volume'] += trade.quantity
-            elif trade.trade_type == 'SELL':
-                volume_by_ticker[trade.ticker]['sell_volume'] += trade.quantity
-        return dict(volume_by_ticker)
+        columns = self._get_columns()
+        trade_count, ticker_count = len(columns), len(columns.ticker_symbols)
+        positions = np.arange(trade_count)
+        volumes = {}
+        for trade_type, key in (('BUY', 'buy_volume'), ('SELL', 'sell_volume')):
+            mask = columns.trade_types == _code(columns.trade_type_names, trade_type)
+            # the trades grouped by ticker, in their original order within a group
+            order = np.argsort(columns.tickers[mask], kind='stable')
+            tickers = columns.tickers[mask][order]
+            starts = np.flatnonzero(np.diff(tickers, prepend=-1))
+            totals = np.zeros(ticker_count, dtype=np.int64)
+            # the position of the first trade of each ticker, trade_count if it has none
+            first_trades = np.full(ticker_count, trade_count)
+            if starts.size:
+                totals[tickers[starts]] = np.add.reduceat(columns.quantities[mask][order], starts)
+                first_trades[tickers[starts]] = positions[mask][order][starts]
+            volumes[key] = (first_trades, totals)
+
+        # tickers and their volumes in the order of their first trade, as a loop over the trades would add them
+        first_trades = np.minimum(volumes['buy_volume'][0], volumes['sell_volume'][0])
+        volume_by_ticker = {}
+        for code in np.argsort(first_trades, kind='stable').tolist():
+            if first_trades[code] == trade_count:
+                break
+            volume = volume_by_ticker[columns.ticker_symbols[code]] = defaultdict(int)
+            for key, (key_first_trades, totals) in sorted(volumes.items(), key=lambda item: item[1][0][code]):
+                if key_first_trades[code] < trade_count:
+                    volume[key] = int(totals[code])
+        return volume_by_ticker
 
     def identify_potential_discrepancies(self) -> List[Dict[str, Union[str, datetime.date, int]]]:
         """
         Identify customers with more than 3 trades in a single day.
 
+        Once `customer_trades` has been assigned, the trades are counted as grouped there: under the customer
+        each one is listed for, in the order of the mapping.
+
         Returns:
             List[Dict[str, Union[str, datetime.date, int]]]: List of potential discrepancies.
         """
-        for trade in self.trades:
-            self.customer_trades[trade.customer_id].append(trade)
-
-        potential_discrepancies = []
-        for customer_id, trades in self.customer_trades.items():
-            trade_dates = [trade.trade_date for trade in trades]
-            date_counts = {date: trade_dates.count(date) for date in trade_dates}
-            for date, count in date_counts.items():
-                if count > 3:
-                    potential_discrepancies.append({
-                        'customer_id': customer_id,
-                        'date': date.date(),
-                        'trade_count': count
-                    })
-        return potential_discrepancies
+        columns = self._get_columns(by_customer=self._customer_trades_assigned)
+        if not len(columns):
+            return []
+        # one key per (customer, day), counted in a single pass
+        first_day = int(columns.dates.min())
+        days = int(columns.dates.max()) - first_day + 1
+        keys = columns.customers.astype(np.int64) * days + (columns.dates - first_day)
+        unique_keys, first_trades, counts = np.unique(keys, return_index=True, return_counts=True)
+        busy = counts > 3
+        unique_keys, first_trades, counts = unique_keys[busy], first_trades[busy], counts[busy]
+        customers, day_offsets = np.divmod(unique_keys, days)
+
+        # customers in the order of their first trade, and their days in the order they first traded
+        order = np.lexsort((first_trades, customers))
+        return [
+            {
+                'customer_id': columns.customer_ids[customer],
+                'date': date.fromordinal(first_day + day_offset),
+                'trade_count': count
+            }
+            for customer, day_offset, count in zip(
+                customers[order].tolist(), day_offsets[order].tolist(), counts[order].tolist()
+            )
+        ]
 
     def calculate_average_price(self, ticker: str) -> float:
         """
@@ -121,14 +335,11 @@ class TradeAnalyzer:
         Returns:
             float: Average price.
         """
-        total_price = 0
-        total_trades = 0
-        for trade in self.trades:
-            if trade.ticker == ticker:
-                total_price += trade.price
-                total_trades += 1
-        if total_trades > 0:
-            return total_price / total_trades
+        columns = self._get_columns()
+        prices = columns.prices[columns.tickers == _code(columns.ticker_symbols, ticker)]
+        if prices.size > 0:
+            # cumsum adds the prices one after the other, the same total as a loop, unlike np.sum
+            return float(np.cumsum(prices)[-1]) / prices.size
         else:
             return 0
 
@@ -143,8 +354,25 @@ class TradeAnalyzer:
         Returns:
             List[Dict[str, Union[int, str, float, datetime.date]]]: List of trades.
         """
-        target_date = datetime.strptime(date, '%Y-%m-%d')
-        return [trade for trade in self.trades if trade.ticker == ticker and trade.trade_date == target_date]
+        target_date = datetime.strptime(date, '%Y-%m-%d').toordinal()
+        columns = self._get_columns()
+        mask = (columns.tickers == _code(columns.ticker_symbols, ticker)) & (columns.dates == target_date)
+        if self._trades is not None:
+            return [self._trades[index] for index in np.flatnonzero(mask)]
+        return [columns.trade(index) for index in np.flatnonzero(mask)]
+
+    def _get_columns(self, by_customer: bool = False) -> TradeColumns:
+        # the loaded columns until the trades are assigned or invalidated, then the columns rebuilt once from
+        # `trades`, or from an assigned `customer_trades` if `by_customer`
+        if by_customer:
+            if self._customer_columns is None:
+                self._customer_columns = TradeColumns.from_customer_trades(self._customer_trades)
+            return self._customer_columns
+        if self._trades is None:
+            return self.columns
+        if self._trades_columns is None:
+            self._trades_columns = TradeColumns.from_trades(self._trades)
+        return self._trades_columns
 
 
 # Example Usage: